@@ -0,0 +1,122 @@
+import os
+import gzip
+import json
+import zlib
+import threading
+from datetime import datetime
+from typing import Optional, Any, Dict, List, Iterator
+import logging
+
+from activity_store import ActivityStore, TIMESTAMP_FORMAT, parse_timestamp
+
+logger = logging.getLogger(__name__)
+
+
+class ActivityArchive(ActivityStore):
+    """Monthly gzip JSONL files for activities that were moved out of the live store.
+
+    ``activity_log_archive/activity_2025-08.jsonl.gz`` holds one JSON array per
+    row in ``ACTIVITY_COLUMNS`` order, and ``index.json`` records each month's
+    first/last timestamp and row count. Every ``append_many`` adds a new gzip
+    member, so archive files are only ever appended to. Reads only open the
+    months whose range overlaps the request.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.index_path = os.path.join(directory, "index.json")
+        self._lock = threading.Lock()
+
+    def _load_index(self) -> Dict[str, Any]:
+        if not os.path.exists(self.index_path):
+            return {"months": {}, "checkpoint": None}
+        with open(self.index_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _save_index(self, index: Dict[str, Any]):
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(index, f, indent=2, sort_keys=True)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.index_path)
+
+    def month_path(self, month: str) -> str:
+        return os.path.join(self.directory, f"activity_{month}.jsonl.gz")
+
+    def months(self) -> Dict[str, Dict[str, Any]]:
+        """Snapshot of the index: month -> {file, first, last, rows}."""
+        with self._lock:
+            return self._load_index()["months"]
+
+    @property
+    def checkpoint(self) -> Optional[Any]:
+        """Opaque marker a store saved with its last archived batch (e.g. the last row id)."""
+        with self._lock:
+            return self._load_index().get("checkpoint")
+
+    def append_many(self, rows: List[list], checkpoint: Any = None):
+        """Append rows to their monthly files, then record them (and ``checkpoint``) in the index."""
+        grouped: Dict[str, List[list]] = {}
+        for row in rows:
+            timestamp = parse_timestamp(row[0]) or datetime.now()
+            row = [timestamp.strftime(TIMESTAMP_FORMAT)] + list(row[1:])
+            grouped.setdefault(timestamp.strftime("%Y-%m"), []).append(row)
+
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            index = self._load_index()
+            for month, month_rows in sorted(grouped.items()):
+                path = self.month_path(month)
+                data = "".join(json.dumps(row, ensure_ascii=False, default=str) + "\n" for row in month_rows)
+                with open(path, "ab") as f:
+                    f.write(gzip.compress(data.encode("utf-8")))
+                    f.flush()
+                    os.fsync(f.fileno())
+
+                timestamps = [row[0] for row in month_rows]
+                meta = index["months"].setdefault(
+                    month, {"file": os.path.basename(path), "first": min(timestamps), "last": max(timestamps), "rows": 0}
+                )
+                meta["first"] = min(meta["first"], min(timestamps))
+                meta["last"] = max(meta["last"], max(timestamps))
+                meta["rows"] += len(month_rows)
+            if checkpoint is not None:
+                index["checkpoint"] = checkpoint
+            self._save_index(index)
+
+    def _read_month(self, month: str) -> Iterator[list]:
+        path = self.month_path(month)
+        if not os.path.exists(path):
+            logger.warning(f"Archive month {month} listed in index but missing: {path}")
+            return
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                for line in f:
+                    if not line.endswith("\n"):
+                        break
+                    yield json.loads(line)
+        except (EOFError, OSError, zlib.error) as e:
+            # A crash mid-append leaves a truncated last member; everything before it is intact
+            logger.warning(f"Stopped reading damaged archive {path}: {e}")
+
+    def iter_rows(self, start: datetime = None, end: datetime = None,
+                  phone_number: str = None) -> Iterator[list]:
+        start_str = start.strftime(TIMESTAMP_FORMAT) if start else None
+        end_str = end.strftime(TIMESTAMP_FORMAT) if end else None
+        for month, meta in sorted(self.months().items()):
+            if start_str and meta["last"] < start_str:
+                continue
+            if end_str and meta["first"] >= end_str:
+                continue
+            for row in self._read_month(month):
+                if phone_number and row[1] != phone_number:
+                    continue
+                if start_str and row[0] < start_str:
+                    continue
+                if end_str and row[0] >= end_str:
+                    continue
+                yield row
+
+    def is_empty(self) -> bool:
+        return not self.months()
@@ -1,47 +1,152 @@
 import os
+import glob
 import json
+import time
+import asyncio
+import functools
+import threading
+import contextvars
+from collections import deque
+from itertools import chain, count, islice
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, asynccontextmanager, nullcontext
 from datetime import datetime, timedelta
-from typing import Optional, Dict, Any, List, Tuple
-from openpyxl import Workbook, load_workbook
-from openpyxl.styles import Font, PatternFill, Alignment
+from typing import Optional, Dict, Any, List, Tuple, Iterator, AsyncIterator
+from openpyxl import Workbook
 import logging
 
+from activity_store import (
+    ACTIVITY_COLUMNS, ActivityRecord, ActivityStore, ExcelActivityStore, open_activity_store, parse_timestamp,
+    styled_header_cells, to_epoch
+)
+from activity_archive import ActivityArchive
+from export_formats import FORMAT_LABELS, write_rows, write_summary
+from journal import GroupCommitWriter, Journal
+
 logger = logging.getLogger(__name__)
 
+# Legacy spreadsheet log; imported into the SQLite store the first time it is created
 ACTIVITY_LOG_FILE = "activity_log.xlsx"
+# Live store: a .db path selects SQLite, a .xlsx path keeps the spreadsheet backend
+ACTIVITY_STORE_PATH = os.getenv("ACTIVITY_STORE_PATH", "activity_log.db")
+# "month" or "day" splits a spreadsheet store into time partitions; ignored for SQLite
+ACTIVITY_PARTITION = os.getenv("ACTIVITY_PARTITION") or None
+
+# Group-commit thresholds: pending events are written once either limit is hit
+ACTIVITY_FLUSH_MAX_EVENTS = int(os.getenv("ACTIVITY_FLUSH_MAX_EVENTS", "50"))
+ACTIVITY_FLUSH_INTERVAL_SECONDS = float(os.getenv("ACTIVITY_FLUSH_INTERVAL_SECONDS", "2.0"))
+# Most recent activities kept in memory for the admin dashboard
+ACTIVITY_RECENT_BUFFER_SIZE = int(os.getenv("ACTIVITY_RECENT_BUFFER_SIZE", "100"))
+
+# Retention: older rows (by age and/or beyond a row budget) move to gzip archives; 0 disables a limit.
+# Off unless configured: user timelines and recent activities only read the live store
+ACTIVITY_RETENTION_DAYS = int(os.getenv("ACTIVITY_RETENTION_DAYS", "0"))
+ACTIVITY_RETENTION_MAX_ROWS = int(os.getenv("ACTIVITY_RETENTION_MAX_ROWS", "0"))
+ACTIVITY_RETENTION_CHECK_SECONDS = float(os.getenv("ACTIVITY_RETENTION_CHECK_SECONDS", "3600"))
+
+# Numbers the journals of loggers opened in this process (see ActivityLogger.journal_path)
+_journal_ids = count()
+
+
+class _ActivityBatch:
+    """Rows collected while one unit of work (e.g. a webhook) is being handled."""
+
+    def __init__(self):
+        self.rows: List[list] = []
+        self.closed = False
+
+
+_current_batch: contextvars.ContextVar[Optional[_ActivityBatch]] = contextvars.ContextVar(
+    "activity_batch", default=None
+)
+
 
 class ActivityLogger:
-    def __init__(self, file_path: str = ACTIVITY_LOG_FILE):
+    def __init__(self, file_path: str = ACTIVITY_STORE_PATH,
+                 flush_max_events: int = ACTIVITY_FLUSH_MAX_EVENTS,
+                 flush_interval: float = ACTIVITY_FLUSH_INTERVAL_SECONDS,
+                 store: Optional[ActivityStore] = None,
+                 legacy_file: Optional[str] = None,
+                 partition: Optional[str] = ACTIVITY_PARTITION,
+                 journal_path: Optional[str] = None,
+                 recent_buffer_size: int = ACTIVITY_RECENT_BUFFER_SIZE,
+                 retention_days: int = ACTIVITY_RETENTION_DAYS,
+                 retention_max_rows: int = ACTIVITY_RETENTION_MAX_ROWS,
+                 archive_dir: Optional[str] = None):
         self.file_path = file_path
-        self.ensure_log_file_exists()
+        self.store = store or open_activity_store(file_path, partition)
+        self.archive = ActivityArchive(archive_dir or os.path.splitext(file_path)[0] + "_archive")
+        self.retention_days = retention_days
+        self.retention_max_rows = retention_max_rows
+        self._next_retention_check = 0.0
+        # Serializes batch commits with retention for the spreadsheet stores, which rewrite
+        # whole workbooks; SQLite interleaves commits between the chunks of an archive run
+        self._store_lock = nullcontext() if self.store.CONCURRENT_WRITES else threading.Lock()
+        if legacy_file:
+            self.import_legacy_log(legacy_file)
+        # Single worker keeps async log calls in submission order and off the event loop
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="activity-log-io")
+        # Retention gets its own thread so a long archive run never delays webhook log calls
+        self._retention_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="activity-retention")
+        self._retention_run = None
+        # Rows hit the append-only journal first; the writer materializes them into the store.
+        # Each logger (one per uvicorn worker) writes its own journal, and takes over the journals
+        # of workers that exited before committing theirs
+        base = os.path.splitext(file_path)[0]
+        self.journal_path = journal_path or f"{base}.journal.{os.getpid()}-{next(_journal_ids)}.jsonl"
+        journal = Journal(self.journal_path, owned=True)
+        if not journal_path:
+            journal.adopt(glob.escape(base) + ".journal*.jsonl")
+        self._writer = GroupCommitWriter(
+            self._commit_rows,
+            max_events=flush_max_events,
+            interval=flush_interval,
+            name="activity-log-writer",
+            journal=journal,
+            keyed=True,
+        )
+        # Ring buffer of the latest rows, seeded from the store plus anything recovered from the journal
+        self._recent_lock = threading.Lock()
+        self._recent: deque = deque(maxlen=max(1, recent_buffer_size))
+        try:
+            self._recent.extend(self._to_records(reversed(self.store.tail(self._recent.maxlen))))
+        except Exception as e:
+            logger.exception(f"Failed to load recent activities: {e}")
+        self._recent.extend(self._to_records(self._writer.pending_entries()))
     
-    def ensure_log_file_exists(self):
-        """Create the activity log Excel file if it doesn't exist."""
-        if not os.path.exists(self.file_path):
-            wb = Workbook()
-            ws = wb.active
-            ws.title = "Activity_Log"
-            
-            # Add headers with styling
-            headers = [
-                "timestamp", "phone_number", "user_name", "activity_type", 
-                "message_type", "user_input", "bot_response", "button_id",
-                "admin_flag", "session_id", "additional_data"
-            ]
-            ws.append(headers)
-            
-            # Style the header row
-            header_font = Font(bold=True, color="FFFFFF")
-            header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-            
-            for col_num, header in enumerate(headers, 1):
-                cell = ws.cell(row=1, column=col_num)
-                cell.font = header_font
-                cell.fill = header_fill
-                cell.alignment = Alignment(horizontal='center')
-            
-            wb.save(self.file_path)
-            logger.info(f"Created activity log file: {self.file_path}")
+    @staticmethod
+    def _to_records(rows) -> List[ActivityRecord]:
+        records = []
+        for row in rows:
+            try:
+                records.append(ActivityRecord.from_row(row))
+            except (TypeError, ValueError) as e:
+                logger.warning(f"Error parsing activity row: {e}")
+        return records
+    
+    def import_legacy_log(self, legacy_file: str) -> int:
+        """Copy rows from an old activity_log.xlsx into a new store, once.
+
+        The store records the import, so a store emptied by retention is not
+        refilled on the next start. Stores that already hold rows (including
+        ones that imported before the flag existed) are just marked.
+        """
+        if isinstance(self.store, ExcelActivityStore) or not os.path.exists(legacy_file):
+            return 0
+        try:
+            if self.store.get_meta("legacy_imported"):
+                return 0
+            if not self.store.is_empty():
+                self.store.set_meta("legacy_imported", "1")
+                return 0
+            rows = list(ExcelActivityStore(legacy_file).iter_rows())
+            self.store.append_many(rows)
+            self.store.set_meta("legacy_imported", "1")
+            logger.info(f"Imported {len(rows)} activities from {legacy_file}")
+            return len(rows)
+        except Exception as e:
+            logger.exception(f"Failed to import legacy activity log: {e}")
+            return 0
     
     def log_activity(
         self,
@@ -56,23 +161,18 @@ class ActivityLogger:
         session_id: str = None,
         additional_data: Dict[str, Any] = None
     ):
-        """Log an activity to the Excel file."""
+        """Queue an activity for the next batched write to the store."""
         try:
-            # Load existing workbook
-            wb = load_workbook(self.file_path)
-            ws = wb.active
-            
             # Prepare data
-            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
             additional_data_json = json.dumps(additional_data) if additional_data else None
             
             # Truncate long text fields for Excel compatibility
             user_input = (user_input[:500] + "...") if user_input and len(user_input) > 500 else user_input
             bot_response = (bot_response[:500] + "...") if bot_response and len(bot_response) > 500 else bot_response
             
-            # Add row
-            row_data = [
-                timestamp,
+            # Parsed once here; the row form is what the journal and store persist
+            record = ActivityRecord(
+                to_epoch(datetime.now()),
                 phone_number,
                 user_name,
                 activity_type,
@@ -83,87 +183,149 @@ class ActivityLogger:
                 admin_flag,
                 session_id,
                 additional_data_json
-            ]
-            
-            ws.append(row_data)
-            wb.save(self.file_path)
-            
+            )
+            row_data = record.to_row()
+            
+            batch = _current_batch.get()
+            if batch is not None and not batch.closed:
+                batch.rows.append(row_data)
+            else:
+                self._writer.submit(row_data)
+            with self._recent_lock:
+                self._recent.append(record)
             logger.info(f"Logged activity: {activity_type} for {phone_number}")
             
         except Exception as e:
             logger.exception(f"Failed to log activity: {e}")
     
+    def _commit_rows(self, rows: List[list], keys: List[Optional[str]]):
+        """Write one batch of queued rows to the store, skipping journal keys it already applied."""
+        with self._store_lock:
+            self.store.append_many(rows, keys=keys)
+        logger.info(f"Committed {len(rows)} activities to {self.file_path}")
+        if time.monotonic() >= self._next_retention_check:
+            self._next_retention_check = time.monotonic() + ACTIVITY_RETENTION_CHECK_SECONDS
+            # Runs on the retention thread, never inline in a reader's flush on the event loop
+            # and never queued ahead of alog_activity on the log I/O executor
+            if self._retention_run is None or self._retention_run.done():
+                try:
+                    self._retention_run = self._retention_executor.submit(self.apply_retention)
+                except RuntimeError:
+                    pass  # shutting down; the next start checks again
+    
+    def apply_retention(self) -> int:
+        """Move activities past the retention limits from the live store into the archive."""
+        if not self.retention_days and not self.retention_max_rows:
+            return 0
+        try:
+            before = datetime.now() - timedelta(days=self.retention_days) if self.retention_days else None
+            with self._store_lock:
+                archived = self.store.expire(self.archive, before=before, keep_rows=self.retention_max_rows or None)
+            if archived:
+                logger.info(f"Archived {archived} activities to {self.archive.directory}")
+            return archived
+        except Exception as e:
+            logger.exception(f"Failed to apply activity retention: {e}")
+            return 0
+    
+    @contextmanager
+    def batch(self) -> Iterator[None]:
+        """Collect every activity logged inside the block and commit them together.
+
+        The rows are handed to the writer as one unit when the block exits (even
+        on error), so they land in the store in a single write. Nested blocks
+        join the outermost batch. Tasks spawned inside the block that outlive it
+        (e.g. ``asyncio.create_task``) fall back to the normal queue.
+        """
+        current = _current_batch.get()
+        if current is not None and not current.closed:
+            yield
+            return
+        batch = _ActivityBatch()
+        token = _current_batch.set(batch)
+        try:
+            yield
+        finally:
+            batch.closed = True
+            _current_batch.reset(token)
+            self._writer.submit_many(batch.rows)
+    
+    async def alog_activity(self, phone_number: str, activity_type: str, **kwargs):
+        """Awaitable ``log_activity`` whose file I/O runs on the logger's executor, never on the event loop.
+
+        Inside ``abatch()`` logging only appends to the in-memory batch, so it
+        happens inline; the batch's single journal write is offloaded on exit.
+        """
+        batch = _current_batch.get()
+        if batch is not None and not batch.closed:
+            self.log_activity(phone_number=phone_number, activity_type=activity_type, **kwargs)
+            return
+        loop = asyncio.get_running_loop()
+        call = functools.partial(self.log_activity, phone_number=phone_number, activity_type=activity_type, **kwargs)
+        await loop.run_in_executor(self._executor, contextvars.copy_context().run, call)
+    
+    @asynccontextmanager
+    async def abatch(self) -> AsyncIterator[None]:
+        """Async ``batch()``: the closing hand-off to the journal runs on the executor."""
+        current = _current_batch.get()
+        if current is not None and not current.closed:
+            yield
+            return
+        batch = _ActivityBatch()
+        token = _current_batch.set(batch)
+        try:
+            yield
+        finally:
+            batch.closed = True
+            _current_batch.reset(token)
+            if batch.rows:
+                loop = asyncio.get_running_loop()
+                await loop.run_in_executor(self._executor, self._writer.submit_many, batch.rows)
+    
+    def flush(self) -> int:
+        """Materialize all journaled activities into the store now. Returns the number written."""
+        try:
+            return self._writer.flush()
+        except Exception as e:
+            logger.exception(f"Failed to flush activities: {e}")
+            return 0
+    
+    def close(self):
+        """Stop the background writer, flushing anything still queued."""
+        self._executor.shutdown(wait=True)
+        self._retention_executor.shutdown(wait=True)
+        self._writer.close()
+    
     def get_analytics_summary(self, days: int = 7) -> Dict[str, Any]:
         """Get comprehensive analytics summary for the last N days."""
         try:
-            if not os.path.exists(self.file_path):
-                return {"error": "No activity data found"}
-            
-            wb = load_workbook(self.file_path, read_only=True)
-            ws = wb.active
+            self.flush()  # make queued activities visible to readers
             
             # Calculate date threshold
             threshold_date = datetime.now() - timedelta(days=days)
             
-            activities = []
-            unique_users = set()
-            admin_activities = 0
-            total_conversations = 0
-            activity_types = {}
-            hourly_activity = {str(i): 0 for i in range(24)}
-            daily_activity = {}
-            
-            for row in ws.iter_rows(min_row=2, values_only=True):
-                if not row[0]:  # timestamp
-                    continue
-                
-                try:
-                    timestamp_str = str(row[0])
-                    if len(timestamp_str) > 19:  # Handle datetime objects
-                        timestamp_str = timestamp_str[:19]
-                    
-                    activity_time = datetime.strptime(timestamp_str, "%Y-%m-%d %H:%M:%S")
-                    
-                    if activity_time >= threshold_date:
-                        activities.append(row)
-                        unique_users.add(row[1])  # phone_number
-                        
-                        if row[8]:  # admin_flag
-                            admin_activities += 1
-                        
-                        # Activity type counting
-                        activity_type = row[3] or "unknown"
-                        activity_types[activity_type] = activity_types.get(activity_type, 0) + 1
-                        
-                        # Hourly distribution
-                        hour = str(activity_time.hour)
-                        hourly_activity[hour] += 1
-                        
-                        # Daily distribution
-                        day = activity_time.strftime("%Y-%m-%d")
-                        daily_activity[day] = daily_activity.get(day, 0) + 1
-                        
-                except Exception as e:
-                    logger.warning(f"Error parsing activity row: {e}")
-                    continue
+            # Counts come from the store's rollups (or a scan for backends without them)
+            summary = self.store.summarize(start=threshold_date)
+            total_activities = summary["total"]
+            unique_users = summary["unique_users"]
+            hourly_activity = summary["hourly"]
+            daily_activity = dict(sorted(summary["daily"].items()))
             
-            # Calculate conversation metrics
-            session_ids = set(row[9] for row in activities if row[9])
-            avg_activities_per_user = len(activities) / len(unique_users) if unique_users else 0
+            avg_activities_per_user = total_activities / unique_users if unique_users else 0
             
             # Top activity types
-            top_activities = sorted(activity_types.items(), key=lambda x: x[1], reverse=True)[:5]
+            top_activities = sorted(summary["activity_types"].items(), key=lambda x: x[1], reverse=True)[:5]
             
             # Peak hours
             peak_hours = sorted(hourly_activity.items(), key=lambda x: x[1], reverse=True)[:3]
             
             return {
                 "period_days": days,
-                "total_activities": len(activities),
-                "unique_users": len(unique_users),
-                "admin_activities": admin_activities,
-                "user_activities": len(activities) - admin_activities,
-                "total_sessions": len(session_ids),
+                "total_activities": total_activities,
+                "unique_users": unique_users,
+                "admin_activities": summary["admin"],
+                "user_activities": total_activities - summary["admin"],
+                "total_sessions": summary["sessions"],
                 "avg_activities_per_user": round(avg_activities_per_user, 2),
                 "top_activity_types": top_activities,
                 "peak_hours": peak_hours,
@@ -178,97 +340,31 @@ class ActivityLogger:
     def get_conversation_analytics(self, phone_number: str = None) -> Dict[str, Any]:
         """Get detailed conversation analytics for a specific user or all users."""
         try:
-            if not os.path.exists(self.file_path):
-                return {"error": "No activity data found"}
-            
-            wb = load_workbook(self.file_path, read_only=True)
-            ws = wb.active
+            self.flush()
             
-            conversations = {}
-            user_stats = {}
-            
-            for row in ws.iter_rows(min_row=2, values_only=True):
-                if not row[0]:  # timestamp
-                    continue
-                
-                user_phone = row[1]
-                session_id = row[9]
-                timestamp_str = str(row[0])[:19]
-                
-                # Filter by phone number if specified
-                if phone_number and user_phone != phone_number:
-                    continue
-                
-                try:
-                    activity_time = datetime.strptime(timestamp_str, "%Y-%m-%d %H:%M:%S")
-                    
-                    # Track by session
-                    if session_id:
-                        if session_id not in conversations:
-                            conversations[session_id] = {
-                                "user": user_phone,
-                                "start_time": activity_time,
-                                "end_time": activity_time,
-                                "activity_count": 0,
-                                "activities": []
-                            }
-                        
-                        conv = conversations[session_id]
-                        conv["end_time"] = max(conv["end_time"], activity_time)
-                        conv["activity_count"] += 1
-                        conv["activities"].append(row[3])  # activity_type
-                    
-                    # Track by user
-                    if user_phone not in user_stats:
-                        user_stats[user_phone] = {
-                            "total_activities": 0,
-                            "sessions": set(),
-                            "first_activity": activity_time,
-                            "last_activity": activity_time,
-                            "activity_types": {}
-                        }
-                    
-                    user_stat = user_stats[user_phone]
-                    user_stat["total_activities"] += 1
-                    user_stat["last_activity"] = max(user_stat["last_activity"], activity_time)
-                    if session_id:
-                        user_stat["sessions"].add(session_id)
-                    
-                    activity_type = row[3] or "unknown"
-                    user_stat["activity_types"][activity_type] = user_stat["activity_types"].get(activity_type, 0) + 1
-                    
-                except Exception as e:
-                    logger.warning(f"Error parsing conversation row: {e}")
-                    continue
-            
-            # Calculate conversation durations
-            conversation_durations = []
-            for conv in conversations.values():
-                duration = (conv["end_time"] - conv["start_time"]).total_seconds() / 60  # minutes
-                conversation_durations.append(duration)
+            # Session and user aggregates are maintained by the store as activities are written
+            stats = self.store.conversation_stats(phone_number)
+            sessions = stats["sessions"]
             
             # Calculate user engagement metrics
             engagement_metrics = {}
-            for phone, stats in user_stats.items():
-                total_time = (stats["last_activity"] - stats["first_activity"]).total_seconds() / 60
+            for phone, user in stats["users"].items():
+                total_time = (user["last_ts"] - user["first_ts"]) / 60
                 engagement_metrics[phone] = {
-                    "total_activities": stats["total_activities"],
-                    "session_count": len(stats["sessions"]),
+                    "total_activities": user["total_activities"],
+                    "session_count": user["session_count"],
                     "total_engagement_minutes": round(total_time, 2),
-                    "avg_activities_per_session": round(stats["total_activities"] / max(len(stats["sessions"]), 1), 2),
-                    "top_activity": max(stats["activity_types"].items(), key=lambda x: x[1])[0] if stats["activity_types"] else "none"
+                    "avg_activities_per_session": round(user["total_activities"] / max(user["session_count"], 1), 2),
+                    "top_activity": user["top_activity"]
                 }
             
-            avg_duration = sum(conversation_durations) / len(conversation_durations) if conversation_durations else 0
-            
             return {
-                "total_conversations": len(conversations),
-                "total_users": len(user_stats),
-                "avg_conversation_duration_minutes": round(avg_duration, 2),
-                "conversation_durations": conversation_durations,
+                "total_conversations": sessions["count"],
+                "total_users": len(stats["users"]),
+                "avg_conversation_duration_minutes": round(sessions["avg_seconds"] / 60, 2),
                 "user_engagement": engagement_metrics,
-                "longest_conversation_minutes": max(conversation_durations) if conversation_durations else 0,
-                "shortest_conversation_minutes": min(conversation_durations) if conversation_durations else 0
+                "longest_conversation_minutes": sessions["max_seconds"] / 60,
+                "shortest_conversation_minutes": sessions["min_seconds"] / 60
             }
             
         except Exception as e:
@@ -280,33 +376,18 @@ class ActivityLogger:
                            end_date: str = None, 
                            activity_types: List[str] = None,
                            admin_only: bool = False,
-                           output_file: str = "filtered_activity_export.xlsx") -> bool:
-        """Export filtered activity data to a new Excel file."""
+                           output_file: str = "filtered_activity_export.xlsx",
+                           output_format: str = "xlsx") -> bool:
+        """Export filtered activity data to a new file.
+        
+        ``output_format`` is one of ``export_formats.EXPORT_FORMATS``. Rows are
+        streamed from the store into a write-only workbook (or the gzip/Parquet
+        encoder), so memory stays flat however many rows match.
+        """
         try:
-            if not os.path.exists(self.file_path):
-                return False
-            
-            wb_source = load_workbook(self.file_path, read_only=True)
-            ws_source = wb_source.active
-            
-            # Create new workbook for export
-            wb_export = Workbook()
-            ws_export = wb_export.active
-            ws_export.title = "Filtered_Activity_Log"
-            
-            # Copy headers
-            headers = [cell.value for cell in ws_source[1]]
-            ws_export.append(headers)
+            self.flush()
             
-            # Style headers
-            header_font = Font(bold=True, color="FFFFFF")
-            header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-            
-            for col_num, header in enumerate(headers, 1):
-                cell = ws_export.cell(row=1, column=col_num)
-                cell.font = header_font
-                cell.fill = header_fill
-                cell.alignment = Alignment(horizontal='center')
+            headers = list(ACTIVITY_COLUMNS)
             
             # Parse date filters
             start_dt = None
@@ -316,39 +397,32 @@ class ActivityLogger:
             if end_date:
                 end_dt = datetime.strptime(end_date, "%Y-%m-%d") + timedelta(days=1)  # Include end date
             
-            # Filter and copy data
-            exported_rows = 0
-            for row in ws_source.iter_rows(min_row=2, values_only=True):
-                if not row[0]:  # timestamp
-                    continue
+            # Date, activity type and admin filters are applied by the store; archived
+            # months are only opened when the range reaches into them
+            filters = dict(start=start_dt, end=end_dt, activity_types=activity_types, admin_only=admin_only)
+            records = chain(self.archive.iter_records(**filters), self.store.iter_records(**filters))
+            
+            if output_format == "xlsx":
+                # Create new write-only workbook for export
+                wb_export = Workbook(write_only=True)
+                ws_export = wb_export.create_sheet("Filtered_Activity_Log")
+                ws_export.append(styled_header_cells(ws_export, headers))
                 
-                try:
-                    # Date filtering
-                    timestamp_str = str(row[0])[:19]
-                    activity_time = datetime.strptime(timestamp_str, "%Y-%m-%d %H:%M:%S")
-                    
-                    if start_dt and activity_time < start_dt:
-                        continue
-                    if end_dt and activity_time >= end_dt:
-                        continue
-                    
-                    # Activity type filtering
-                    if activity_types and row[3] not in activity_types:
+                exported_rows = 0
+                for record in records:
+                    try:
+                        ws_export.append(record.to_row())
+                        exported_rows += 1
+                    except Exception as e:
+                        logger.warning(f"Error filtering row: {e}")
                         continue
-                    
-                    # Admin filtering
-                    if admin_only and not row[8]:  # admin_flag
-                        continue
-                    
-                    ws_export.append(row)
-                    exported_rows += 1
-                    
-                except Exception as e:
-                    logger.warning(f"Error filtering row: {e}")
-                    continue
+            else:
+                exported_rows = write_rows(
+                    output_file, output_format, headers,
+                    (record.to_row() for record in records),
+                    column_types={"admin_flag": "bool"},
+                )
             
-            # Add summary sheet
-            ws_summary = wb_export.create_sheet("Export_Summary")
             summary_data = [
                 ["Export Summary", ""],
                 ["Export Date", datetime.now().strftime("%Y-%m-%d %H:%M:%S")],
@@ -356,80 +430,87 @@ class ActivityLogger:
                 ["Date Range", f"{start_date or 'All'} to {end_date or 'All'}"],
                 ["Activity Types", ", ".join(activity_types) if activity_types else "All"],
                 ["Admin Only", "Yes" if admin_only else "No"],
+                ["Format", FORMAT_LABELS.get(output_format, output_format)],
             ]
             
-            for row_data in summary_data:
-                ws_summary.append(row_data)
+            if output_format == "xlsx":
+                # Add summary sheet
+                ws_summary = wb_export.create_sheet("Export_Summary")
+                for row_data in summary_data:
+                    ws_summary.append(row_data)
+                wb_export.save(output_file)
+            else:
+                write_summary(output_file, summary_data)
             
-            wb_export.save(output_file)
             logger.info(f"Exported {exported_rows} rows to {output_file}")
             return True
             
         except Exception as e:
             logger.exception(f"Failed to export filtered data: {e}")
             return False
+    
+    def get_user_activity_count(self, phone_number: str) -> int:
         """Get total activity count for a user."""
         try:
-            if not os.path.exists(self.file_path):
-                return 0
-                
-            wb = load_workbook(self.file_path, read_only=True)
-            ws = wb.active
-            
-            count = 0
-            for row in ws.iter_rows(min_row=2, values_only=True):  # Skip header
-                if row[1] == phone_number:  # phone_number column
-                    count += 1
-            
-            return count
+            self.flush()
+            return self.store.count_for_phone(phone_number)
         except Exception as e:
             logger.exception(f"Failed to get activity count: {e}")
             return 0
     
-    def get_user_activity_count(self, phone_number: str) -> int:
-        """Get total activity count for a user."""
+    def get_user_timeline(self, phone_number: str, limit: int = 20, before: Any = None) -> List[Dict[str, Any]]:
+        """Get one user's activities, most recent first, for admin drill-downs.
+
+        Each activity carries a ``cursor``; pass the last one of a page as
+        ``before`` to get the activities logged before it, including others
+        from the same second. A datetime or timestamp string also works and
+        returns only activities from earlier seconds.
+        """
         try:
-            if not os.path.exists(self.file_path):
-                return 0
-                
-            wb = load_workbook(self.file_path, read_only=True)
-            ws = wb.active
-            
-            count = 0
-            for row in ws.iter_rows(min_row=2, values_only=True):  # Skip header
-                if row[1] == phone_number:  # phone_number column
-                    count += 1
-            
-            return count
+            self.flush()
+            before_seq = None
+            if isinstance(before, str) and "#" in before:
+                before, _, seq = before.rpartition("#")
+                before_seq = int(seq)
+            rows = self.store.timeline(phone_number, limit, before=parse_timestamp(before), before_seq=before_seq)
+            activities = []
+            for seq, row in rows:
+                activity = dict(zip(ACTIVITY_COLUMNS, row))
+                activity["cursor"] = f"{activity['timestamp']}#{seq}"
+                activities.append(activity)
+            return activities
         except Exception as e:
-            logger.exception(f"Failed to get activity count: {e}")
-            return 0
+            logger.exception(f"Failed to get user timeline: {e}")
+            return []
+    
+    def get_recent_activities(self, limit: int = 10) -> List[Dict[str, Any]]:
         """Get recent activities for admin dashboard."""
         try:
-            if not os.path.exists(self.file_path):
-                return []
-                
-            wb = load_workbook(self.file_path, read_only=True)
-            ws = wb.active
+            with self._recent_lock:
+                # A buffer that never filled up holds the whole history
+                if limit <= len(self._recent) or len(self._recent) < self._recent.maxlen:
+                    records = list(islice(reversed(self._recent), limit))
+                else:
+                    records = None
+            if records is None:
+                # More than the buffer holds: fall back to the store
+                self.flush()
+                records = self._to_records(self.store.tail(limit))
             
             activities = []
-            rows = list(ws.iter_rows(min_row=2, values_only=True))  # Skip header
-            
-            # Get last N rows (most recent)
-            for row in rows[-limit:]:
-                if row[0]:  # timestamp exists
-                    activities.append({
-                        'timestamp': row[0],
-                        'phone_number': row[1],
-                        'user_name': row[2],
-                        'activity_type': row[3],
-                        'admin_flag': row[8]
-                    })
-            
-            return list(reversed(activities))  # Most recent first
+            for record in records:
+                activities.append({
+                    'timestamp': record.timestamp,
+                    'phone_number': record.phone_number,
+                    'user_name': record.user_name,
+                    'activity_type': record.activity_type,
+                    'admin_flag': record.admin_flag
+                })
+            
+            return activities  # Most recent first
         except Exception as e:
             logger.exception(f"Failed to get recent activities: {e}")
             return []
 
 # Global activity logger instance
-activity_logger = ActivityLogger()
+activity_logger = ActivityLogger(legacy_file=ACTIVITY_LOG_FILE)
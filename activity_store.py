@@ -0,0 +1,1096 @@
+import os
+import json
+import uuid
+import sqlite3
+import threading
+import calendar
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Optional, Any, Dict, List, Iterator, Iterable
+from openpyxl import Workbook, load_workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, PatternFill, Alignment
+import logging
+
+from journal import atomic_save_workbook
+
+logger = logging.getLogger(__name__)
+
+ACTIVITY_COLUMNS = [
+    "timestamp", "phone_number", "user_name", "activity_type",
+    "message_type", "user_input", "bot_response", "button_id",
+    "admin_flag", "session_id", "additional_data"
+]
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+_EPOCH = datetime(1970, 1, 1)
+
+
+def to_epoch(value: datetime) -> int:
+    """Convert a naive wall-clock datetime to whole seconds since 1970-01-01."""
+    return calendar.timegm(value.timetuple())
+
+
+def from_epoch(ts: int) -> datetime:
+    """Inverse of ``to_epoch``."""
+    return _EPOCH + timedelta(seconds=ts)
+
+
+def parse_timestamp(value: Any) -> Optional[datetime]:
+    """Parse a timestamp cell (string or datetime) as written by the loggers."""
+    if value is None or value == "":
+        return None
+    if isinstance(value, datetime):
+        return value.replace(microsecond=0)
+    return datetime.strptime(str(value)[:19], TIMESTAMP_FORMAT)
+
+
+HEADER_FONT = Font(bold=True, color="FFFFFF")
+HEADER_FILL = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
+HEADER_ALIGNMENT = Alignment(horizontal='center')
+
+
+def style_header_row(ws, headers: List[str]):
+    """Apply the activity log header styling to the first row of a sheet."""
+    for col_num, header in enumerate(headers, 1):
+        cell = ws.cell(row=1, column=col_num)
+        cell.font = HEADER_FONT
+        cell.fill = HEADER_FILL
+        cell.alignment = HEADER_ALIGNMENT
+
+
+def styled_header_cells(ws, headers: List[str]) -> List[WriteOnlyCell]:
+    """Header row for a write-only sheet, where cells must be styled before they are appended."""
+    cells = []
+    for header in headers:
+        cell = WriteOnlyCell(ws, value=header)
+        cell.font = HEADER_FONT
+        cell.fill = HEADER_FILL
+        cell.alignment = HEADER_ALIGNMENT
+        cells.append(cell)
+    return cells
+
+
+class CodeTable:
+    """Dictionary encoding for low-cardinality strings: each distinct value gets a small int.
+
+    Code 0 is reserved for ``None``. Codes are only meaningful within one
+    process and are never persisted.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._codes: Dict[str, int] = {}
+        self._names: List[Optional[str]] = [None]
+
+    def code(self, name: Optional[str]) -> int:
+        if name is None:
+            return 0
+        code = self._codes.get(name)
+        if code is None:
+            with self._lock:
+                code = self._codes.get(name)
+                if code is None:
+                    code = len(self._names)
+                    self._names.append(name)
+                    self._codes[name] = code
+        return code
+
+    def name(self, code: int) -> Optional[str]:
+        return self._names[code]
+
+
+ACTIVITY_TYPES = CodeTable()
+MESSAGE_TYPES = CodeTable()
+
+
+class ActivityRecord:
+    """One activity parsed once at ingest.
+
+    The timestamp is kept as epoch seconds (see ``to_epoch``) and
+    ``activity_type`` / ``message_type`` as ``CodeTable`` codes, so in-memory
+    analytics compare ints instead of re-parsing strings. ``to_row`` gives the
+    ``ACTIVITY_COLUMNS`` row used by storage, journals and exports.
+    """
+
+    __slots__ = ("ts", "phone_number", "user_name", "type_code", "message_type_code", "user_input",
+                 "bot_response", "button_id", "admin_flag", "session_id", "additional_data")
+
+    def __init__(self, ts: int, phone_number: str = None, user_name: str = None, activity_type: str = None,
+                 message_type: str = None, user_input: str = None, bot_response: str = None,
+                 button_id: str = None, admin_flag: bool = False, session_id: str = None,
+                 additional_data: str = None):
+        self.ts = ts
+        self.phone_number = phone_number
+        self.user_name = user_name
+        self.type_code = ACTIVITY_TYPES.code(activity_type)
+        self.message_type_code = MESSAGE_TYPES.code(message_type)
+        self.user_input = user_input
+        self.bot_response = bot_response
+        self.button_id = button_id
+        self.admin_flag = bool(admin_flag)
+        self.session_id = session_id
+        self.additional_data = additional_data
+
+    @classmethod
+    def from_row(cls, row) -> "ActivityRecord":
+        """Build a record from an ``ACTIVITY_COLUMNS`` row; raises ValueError on a bad timestamp."""
+        timestamp = parse_timestamp(row[0])
+        if timestamp is None:
+            raise ValueError("activity row has no timestamp")
+        return cls(to_epoch(timestamp), *row[1:11])
+
+    @property
+    def activity_type(self) -> Optional[str]:
+        return ACTIVITY_TYPES.name(self.type_code)
+
+    @property
+    def message_type(self) -> Optional[str]:
+        return MESSAGE_TYPES.name(self.message_type_code)
+
+    @property
+    def timestamp(self) -> str:
+        return from_epoch(self.ts).strftime(TIMESTAMP_FORMAT)
+
+    def data(self) -> Dict[str, Any]:
+        """Decoded ``additional_data``."""
+        return json.loads(self.additional_data) if self.additional_data else {}
+
+    def to_row(self) -> list:
+        return [self.timestamp, self.phone_number, self.user_name, self.activity_type, self.message_type,
+                self.user_input, self.bot_response, self.button_id, self.admin_flag, self.session_id,
+                self.additional_data]
+
+
+def empty_summary() -> Dict[str, Any]:
+    return {
+        "total": 0,
+        "admin": 0,
+        "activity_types": {},
+        "hourly": {str(i): 0 for i in range(24)},
+        "daily": {},
+        "unique_users": 0,
+        "sessions": 0,
+    }
+
+
+def add_to_summary(summary: Dict[str, Any], hour: int, activity_type: str, admin_flag: Any, count: int):
+    """Fold ``count`` activities of one hour bucket (hours since the epoch) into a summary."""
+    summary["total"] += count
+    if admin_flag:
+        summary["admin"] += count
+    summary["activity_types"][activity_type] = summary["activity_types"].get(activity_type, 0) + count
+    summary["hourly"][str(hour % 24)] += count
+    day = from_epoch(hour * 3600).strftime("%Y-%m-%d")
+    summary["daily"][day] = summary["daily"].get(day, 0) + count
+
+
+class ActivityStore:
+    """Storage backend for activity rows.
+
+    Rows are lists/tuples in ``ACTIVITY_COLUMNS`` order with the timestamp
+    formatted as ``TIMESTAMP_FORMAT``. Backends only have to implement
+    ``append_many`` and ``iter_rows``; the other queries have scan-based
+    defaults that faster backends override.
+    """
+
+    # True when the backend itself serializes concurrent writers, so callers need no lock
+    # around ``append_many`` / ``expire``
+    CONCURRENT_WRITES = False
+
+    def append_many(self, rows: List[list], keys: List[Optional[str]] = None):
+        """Append rows; ``keys`` are their journal keys (see ``journal.Journal``).
+
+        Backends that record keys in the same write skip rows whose key they
+        already applied; the spreadsheet backends ignore them.
+        """
+        raise NotImplementedError
+
+    def iter_rows(self, start: datetime = None, end: datetime = None,
+                  phone_number: str = None) -> Iterator[tuple]:
+        """Yield rows in insertion order with ``start <= timestamp < end``."""
+        raise NotImplementedError
+
+    def iter_records(self, start: datetime = None, end: datetime = None, phone_number: str = None,
+                     activity_types: List[str] = None, admin_only: bool = False) -> Iterator[ActivityRecord]:
+        """``iter_rows`` as ``ActivityRecord`` objects; unparseable rows are skipped.
+
+        ``activity_types`` and ``admin_only`` narrow the result further; backends
+        that can evaluate them in their query do so instead of filtering here.
+        """
+        type_codes = {ACTIVITY_TYPES.code(activity_type) for activity_type in activity_types or []}
+        for row in self.iter_rows(start=start, end=end, phone_number=phone_number):
+            try:
+                record = ActivityRecord.from_row(row)
+            except (TypeError, ValueError) as e:
+                logger.warning(f"Error parsing activity row: {e}")
+                continue
+            if type_codes and record.type_code not in type_codes:
+                continue
+            if admin_only and not record.admin_flag:
+                continue
+            yield record
+
+    def count_for_phone(self, phone_number: str) -> int:
+        return sum(1 for _ in self.iter_rows(phone_number=phone_number))
+
+    def timeline(self, phone_number: str, limit: int, before: datetime = None,
+                 before_seq: int = None) -> List[tuple]:
+        """Return up to ``limit`` ``(seq, row)`` pairs of one phone, most recent first.
+
+        ``seq`` orders rows logged in the same second (insertion order). Only
+        rows with ``timestamp < before`` are returned, or with ``before_seq``,
+        also the rows in the second of ``before`` whose seq is lower; passing
+        the last pair of a page continues right after it. Here seq counts the
+        phone's earlier rows with the same timestamp.
+        """
+        end, boundary = before, None
+        if before is not None and before_seq is not None:
+            end = before.replace(microsecond=0) + timedelta(seconds=1)
+            boundary = before.strftime(TIMESTAMP_FORMAT)
+        seen: Dict[str, int] = {}
+        page = deque(maxlen=max(limit, 0))
+        for row in self.iter_rows(end=end, phone_number=phone_number):
+            seq = seen.get(row[0], 0)
+            seen[row[0]] = seq + 1
+            if row[0] == boundary and seq >= before_seq:
+                continue
+            page.append((seq, row))
+        return list(reversed(page))
+
+    def tail(self, limit: int) -> List[tuple]:
+        """Return the last ``limit`` rows, most recent first."""
+        rows: List[tuple] = []
+        for row in self.iter_rows():
+            rows.append(row)
+            if len(rows) > limit:
+                rows.pop(0)
+        return list(reversed(rows))
+
+    def is_empty(self) -> bool:
+        return next(iter(self.iter_rows()), None) is None
+
+    def get_meta(self, key: str) -> Optional[str]:
+        """Value of a store-level flag, or None when unset or the backend keeps none."""
+        return None
+
+    def set_meta(self, key: str, value: str):
+        pass
+
+    def expire(self, archive: "ActivityStore", before: datetime = None, keep_rows: int = None) -> int:
+        """Move the oldest rows into ``archive`` and return how many left the live store.
+
+        Rows go if they are older than ``before`` or fall outside the newest
+        ``keep_rows``; either limit may be None.
+        """
+        raise NotImplementedError
+
+    def summarize(self, start: datetime = None, end: datetime = None) -> Dict[str, Any]:
+        """Aggregate counts for ``start <= timestamp < end`` as used by the analytics summary.
+
+        Returns ``total``, ``admin``, ``activity_types``, ``hourly`` (hour of day
+        -> count), ``daily`` (YYYY-mm-dd -> count), ``unique_users`` and
+        ``sessions``. The default scans ``iter_records``.
+        """
+        buckets: Dict[tuple, int] = {}
+        users, sessions = set(), set()
+        for record in self.iter_records(start=start, end=end):
+            key = (record.ts // 3600, record.type_code, record.admin_flag)
+            buckets[key] = buckets.get(key, 0) + 1
+            users.add(record.phone_number)
+            if record.session_id:
+                sessions.add(record.session_id)
+
+        summary = empty_summary()
+        for (hour, type_code, admin_flag), count in buckets.items():
+            add_to_summary(summary, hour, ACTIVITY_TYPES.name(type_code) or "unknown", admin_flag, count)
+        summary["unique_users"] = len(users)
+        summary["sessions"] = len(sessions)
+        return summary
+
+    def conversation_stats(self, phone_number: str = None) -> Dict[str, Any]:
+        """Per-session and per-user aggregates behind the conversation analytics.
+
+        Returns ``sessions`` (count plus average/longest/shortest duration in
+        seconds) and ``users`` (phone -> first_ts, last_ts, total_activities,
+        session_count, top_activity). The default scans ``iter_records``.
+        """
+        sessions: Dict[str, List[int]] = {}
+        users: Dict[str, Dict[str, Any]] = {}
+        for record in self.iter_records(phone_number=phone_number):
+            ts, session_id = record.ts, record.session_id
+            if session_id:
+                span = sessions.setdefault(session_id, [ts, ts])
+                span[0], span[1] = min(span[0], ts), max(span[1], ts)
+            user = users.setdefault(record.phone_number, {
+                "first_ts": ts, "last_ts": ts, "total_activities": 0, "sessions": set(), "activity_types": {}
+            })
+            user["first_ts"], user["last_ts"] = min(user["first_ts"], ts), max(user["last_ts"], ts)
+            user["total_activities"] += 1
+            if session_id:
+                user["sessions"].add(session_id)
+            user["activity_types"][record.type_code] = user["activity_types"].get(record.type_code, 0) + 1
+
+        durations = [end - start for start, end in sessions.values()]
+        return {
+            "sessions": {
+                "count": len(durations),
+                "avg_seconds": sum(durations) / len(durations) if durations else 0,
+                "max_seconds": max(durations) if durations else 0,
+                "min_seconds": min(durations) if durations else 0,
+            },
+            "users": {
+                phone: {
+                    "first_ts": user["first_ts"],
+                    "last_ts": user["last_ts"],
+                    "total_activities": user["total_activities"],
+                    "session_count": len(user["sessions"]),
+                    "top_activity": ACTIVITY_TYPES.name(
+                        max(user["activity_types"].items(), key=lambda x: x[1])[0]
+                    ) or "unknown",
+                }
+                for phone, user in users.items()
+            },
+        }
+
+
+class ExcelActivityStore(ActivityStore):
+    """Single-workbook backend; every batch is a full load/save of the file."""
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        self.ensure_log_file_exists()
+
+    def ensure_log_file_exists(self):
+        """Create the activity log Excel file if it doesn't exist."""
+        if not os.path.exists(self.file_path):
+            wb = Workbook()
+            ws = wb.active
+            ws.title = "Activity_Log"
+            ws.append(ACTIVITY_COLUMNS)
+            style_header_row(ws, ACTIVITY_COLUMNS)
+            atomic_save_workbook(wb, self.file_path)
+            logger.info(f"Created activity log file: {self.file_path}")
+
+    def append_many(self, rows: List[list], keys: List[Optional[str]] = None):
+        """Append a batch of rows with a single load/save of the workbook."""
+        wb = load_workbook(self.file_path)
+        ws = wb.active
+        for row_data in rows:
+            ws.append(row_data)
+        atomic_save_workbook(wb, self.file_path)
+
+    def expire(self, archive: ActivityStore, before: datetime = None, keep_rows: int = None) -> int:
+        """Archive the leading rows past the retention limits and rewrite the workbook without them."""
+        wb = load_workbook(self.file_path)
+        ws = wb.active
+        rows = [row for row in ws.iter_rows(min_row=2, values_only=True)]
+        expired = max(0, len(rows) - keep_rows) if keep_rows is not None else 0
+        if before:
+            for index, row in enumerate(rows):
+                try:
+                    timestamp = parse_timestamp(row[0])
+                except ValueError:
+                    timestamp = None
+                if timestamp is None or timestamp >= before:
+                    break
+                expired = max(expired, index + 1)
+        if not expired:
+            return 0
+        # Archive first: a crash before the save below duplicates rows in the archive instead of losing them
+        archive.append_many([list(row) for row in rows[:expired] if row[0]])
+        ws.delete_rows(2, expired)
+        atomic_save_workbook(wb, self.file_path)
+        return expired
+
+    def iter_rows(self, start: datetime = None, end: datetime = None,
+                  phone_number: str = None) -> Iterator[tuple]:
+        if not os.path.exists(self.file_path):
+            return
+        wb = load_workbook(self.file_path, read_only=True)
+        try:
+            for row in wb.active.iter_rows(min_row=2, values_only=True):
+                if not row[0]:  # timestamp
+                    continue
+                if phone_number and row[1] != phone_number:
+                    continue
+                if start or end:
+                    try:
+                        activity_time = parse_timestamp(row[0])
+                    except ValueError as e:
+                        logger.warning(f"Error parsing activity row: {e}")
+                        continue
+                    if start and activity_time < start:
+                        continue
+                    if end and activity_time >= end:
+                        continue
+                yield row
+        finally:
+            wb.close()
+
+
+class PartitionedExcelActivityStore(ActivityStore):
+    """Spreadsheet backend split into one workbook per month (or day).
+
+    ``activity_log.xlsx`` becomes ``activity_log_2025-10.xlsx``,
+    ``activity_log_2025-11.xlsx``... plus ``activity_log_manifest.json``
+    recording each partition's first/last timestamp and row count. Date-bounded
+    reads only open the partitions whose range overlaps the request, and rows
+    of partitions that lie entirely inside the window are not re-parsed.
+    """
+
+    PARTITION_FORMATS = {"month": "%Y-%m", "day": "%Y-%m-%d"}
+
+    def __init__(self, file_path: str, granularity: str = "month"):
+        if granularity not in self.PARTITION_FORMATS:
+            raise ValueError(f"Unknown partition granularity: {granularity}")
+        self.file_path = file_path
+        self.granularity = granularity
+        self._key_format = self.PARTITION_FORMATS[granularity]
+        self._base, _ = os.path.splitext(file_path)
+        self.manifest_path = f"{self._base}_manifest.json"
+        self._lock = threading.Lock()
+        self._manifest: Dict[str, Dict[str, Any]] = {}
+        self._meta: Dict[str, str] = {}
+        self._load_manifest()
+
+    def _load_manifest(self):
+        if not os.path.exists(self.manifest_path):
+            return
+        with open(self.manifest_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        self._manifest = data.get("partitions", {})
+        self._meta = data.get("meta", {})
+
+    def _save_manifest(self):
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"granularity": self.granularity, "partitions": self._manifest, "meta": self._meta},
+                      f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.manifest_path)
+
+    def get_meta(self, key: str) -> Optional[str]:
+        with self._lock:
+            return self._meta.get(key)
+
+    def set_meta(self, key: str, value: str):
+        with self._lock:
+            self._meta[key] = value
+            self._save_manifest()
+
+    def partition_path(self, key: str) -> str:
+        return f"{self._base}_{key}.xlsx"
+
+    def partitions(self) -> Dict[str, Dict[str, Any]]:
+        """Snapshot of the manifest: partition key -> {file, first, last, rows}."""
+        with self._lock:
+            return {key: dict(meta) for key, meta in self._manifest.items()}
+
+    def _overlapping(self, start: datetime = None, end: datetime = None) -> List[tuple]:
+        """Partitions that may hold rows in [start, end), oldest first, with a fully-inside flag."""
+        start_str = start.strftime(TIMESTAMP_FORMAT) if start else None
+        end_str = end.strftime(TIMESTAMP_FORMAT) if end else None
+        selected = []
+        for key, meta in sorted(self.partitions().items()):
+            if start_str and meta["last"] < start_str:
+                continue
+            if end_str and meta["first"] >= end_str:
+                continue
+            inside = (not start_str or meta["first"] >= start_str) and (not end_str or meta["last"] < end_str)
+            selected.append((key, meta, inside))
+        return selected
+
+    def append_many(self, rows: List[list], keys: List[Optional[str]] = None):
+        """Append rows to their partitions with one load/save per touched partition."""
+        grouped: Dict[str, List[tuple]] = {}
+        for row in rows:
+            timestamp = parse_timestamp(row[0]) or datetime.now()
+            row = [timestamp.strftime(TIMESTAMP_FORMAT)] + list(row[1:])
+            grouped.setdefault(timestamp.strftime(self._key_format), []).append(row)
+
+        with self._lock:
+            for key, partition_rows in sorted(grouped.items()):
+                path = self.partition_path(key)
+                if os.path.exists(path):
+                    wb = load_workbook(path)
+                    ws = wb.active
+                else:
+                    wb = Workbook()
+                    ws = wb.active
+                    ws.title = "Activity_Log"
+                    ws.append(ACTIVITY_COLUMNS)
+                    style_header_row(ws, ACTIVITY_COLUMNS)
+                for row_data in partition_rows:
+                    ws.append(row_data)
+                atomic_save_workbook(wb, path)
+
+                timestamps = [row[0] for row in partition_rows]
+                meta = self._manifest.get(key)
+                if meta is None:
+                    meta = {"file": os.path.basename(path), "first": min(timestamps), "last": max(timestamps), "rows": 0}
+                    self._manifest[key] = meta
+                meta["first"] = min(meta["first"], min(timestamps))
+                meta["last"] = max(meta["last"], max(timestamps))
+                meta["rows"] += len(partition_rows)
+            self._save_manifest()
+
+    def _read_partition(self, key: str) -> Iterator[tuple]:
+        path = self.partition_path(key)
+        if not os.path.exists(path):
+            logger.warning(f"Activity partition {key} listed in manifest but missing: {path}")
+            return
+        wb = load_workbook(path, read_only=True)
+        try:
+            for row in wb.active.iter_rows(min_row=2, values_only=True):
+                if row[0]:
+                    yield row
+        finally:
+            wb.close()
+
+    def iter_rows(self, start: datetime = None, end: datetime = None,
+                  phone_number: str = None) -> Iterator[tuple]:
+        for key, meta, inside in self._overlapping(start, end):
+            for row in self._read_partition(key):
+                if phone_number and row[1] != phone_number:
+                    continue
+                if not inside:
+                    try:
+                        activity_time = parse_timestamp(row[0])
+                    except ValueError as e:
+                        logger.warning(f"Error parsing activity row: {e}")
+                        continue
+                    if start and activity_time < start:
+                        continue
+                    if end and activity_time >= end:
+                        continue
+                yield row
+
+    def tail(self, limit: int) -> List[tuple]:
+        """Read partitions newest first and stop once ``limit`` rows are collected."""
+        collected: List[tuple] = []
+        if limit <= 0:
+            return collected
+        for key in sorted(self.partitions(), reverse=True):
+            rows = list(self._read_partition(key))
+            collected.extend(reversed(rows[-(limit - len(collected)):]))
+            if len(collected) >= limit:
+                break
+        return collected
+
+    def is_empty(self) -> bool:
+        return not any(meta["rows"] for meta in self.partitions().values())
+
+    def expire(self, archive: ActivityStore, before: datetime = None, keep_rows: int = None) -> int:
+        """Archive whole partitions, oldest first, while they are past the retention limits."""
+        before_str = before.strftime(TIMESTAMP_FORMAT) if before else None
+        expired = 0
+        with self._lock:
+            remaining = sum(meta["rows"] for meta in self._manifest.values())
+            for key in sorted(self._manifest):
+                meta = self._manifest[key]
+                too_old = before_str is not None and meta["last"] < before_str
+                too_many = keep_rows is not None and remaining - meta["rows"] >= keep_rows
+                if not (too_old or too_many):
+                    break
+                archive.append_many([list(row) for row in self._read_partition(key)])
+                path = self.partition_path(key)
+                del self._manifest[key]
+                self._save_manifest()
+                if os.path.exists(path):
+                    os.remove(path)
+                remaining -= meta["rows"]
+                expired += meta["rows"]
+        return expired
+
+
+class SQLiteActivityStore(ActivityStore):
+    """SQLite backend with indexes on the columns the admin screens query by.
+
+    Hourly rollups (counts per activity type and admin flag, plus the distinct
+    users and sessions seen in each hour) and per-session / per-user
+    aggregates are updated in the same transaction as every insert, so
+    ``summarize`` merges at most 24 buckets per day and ``conversation_stats``
+    reads one row per user instead of scanning the activities table.
+    """
+
+    # Bumped whenever derived tables are added; older databases are backfilled on open
+    SCHEMA_VERSION = 2
+
+    # Inserts and each expire chunk are their own SQLite transactions
+    CONCURRENT_WRITES = True
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS activities (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            ts INTEGER NOT NULL,
+            phone_number TEXT,
+            user_name TEXT,
+            activity_type TEXT,
+            message_type TEXT,
+            user_input TEXT,
+            bot_response TEXT,
+            button_id TEXT,
+            admin_flag INTEGER NOT NULL DEFAULT 0,
+            session_id TEXT,
+            additional_data TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_activities_ts ON activities(ts);
+        CREATE INDEX IF NOT EXISTS idx_activities_phone ON activities(phone_number, ts);
+        CREATE INDEX IF NOT EXISTS idx_activities_session ON activities(session_id);
+        CREATE INDEX IF NOT EXISTS idx_activities_type ON activities(activity_type, ts);
+        CREATE TABLE IF NOT EXISTS activity_rollup_hourly (
+            hour INTEGER NOT NULL,
+            activity_type TEXT NOT NULL,
+            admin_flag INTEGER NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (hour, activity_type, admin_flag)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS activity_rollup_users (
+            hour INTEGER NOT NULL,
+            phone_number TEXT NOT NULL,
+            PRIMARY KEY (hour, phone_number)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS activity_rollup_sessions (
+            hour INTEGER NOT NULL,
+            session_id TEXT NOT NULL,
+            PRIMARY KEY (hour, session_id)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS activity_sessions (
+            session_id TEXT PRIMARY KEY,
+            phone_number TEXT NOT NULL,
+            start_ts INTEGER NOT NULL,
+            end_ts INTEGER NOT NULL,
+            activity_count INTEGER NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_activity_sessions_phone ON activity_sessions(phone_number);
+        CREATE TABLE IF NOT EXISTS activity_user_sessions (
+            phone_number TEXT NOT NULL,
+            session_id TEXT NOT NULL,
+            PRIMARY KEY (phone_number, session_id)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS activity_users (
+            phone_number TEXT PRIMARY KEY,
+            first_ts INTEGER NOT NULL,
+            last_ts INTEGER NOT NULL,
+            total_activities INTEGER NOT NULL,
+            session_count INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS store_meta (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS activity_user_types (
+            phone_number TEXT NOT NULL,
+            activity_type TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (phone_number, activity_type)
+        ) WITHOUT ROWID;
+    """
+
+    _SELECT = ("SELECT ts, phone_number, user_name, activity_type, message_type, user_input, "
+               "bot_response, button_id, admin_flag, session_id, additional_data FROM activities")
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._local = threading.local()
+        conn = self._conn()
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        conn.executescript(self.SCHEMA)
+        if version < self.SCHEMA_VERSION:
+            self.rebuild_aggregates()
+            conn.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+        # Identifies this database in archive checkpoints, since row ids restart if it is recreated
+        conn.execute("INSERT OR IGNORE INTO store_meta (key, value) VALUES ('store_id', ?)", (uuid.uuid4().hex,))
+        conn.commit()
+        self.store_id = conn.execute("SELECT value FROM store_meta WHERE key = 'store_id'").fetchone()[0]
+
+    def _conn(self) -> sqlite3.Connection:
+        """One connection per thread; WAL lets readers run while the flusher writes."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _to_db(row: list) -> tuple:
+        timestamp = parse_timestamp(row[0]) or datetime.now()
+        return (to_epoch(timestamp), row[1], row[2], row[3], row[4], row[5],
+                row[6], row[7], 1 if row[8] else 0, row[9], row[10])
+
+    @staticmethod
+    def _from_db(row: tuple) -> tuple:
+        return (from_epoch(row[0]).strftime(TIMESTAMP_FORMAT),) + row[1:8] + (bool(row[8]),) + row[9:]
+
+    def append_many(self, rows: Iterable[list], keys: List[Optional[str]] = None):
+        conn = self._conn()
+        with conn:
+            if keys is not None:
+                rows = self._unapplied(conn, list(rows), keys)
+            records = [self._to_db(row) for row in rows]
+            conn.executemany(
+                "INSERT INTO activities (ts, phone_number, user_name, activity_type, message_type, "
+                "user_input, bot_response, button_id, admin_flag, session_id, additional_data) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                records,
+            )
+            self._update_rollups(conn, records)
+            self._update_conversations(conn, records)
+
+    @staticmethod
+    def _unapplied(conn: sqlite3.Connection, rows: List[list], keys: List[Optional[str]]) -> List[list]:
+        """Drop rows whose journal key is already applied and raise each journal's high-water mark.
+
+        Keys are ``<journal id>:<seq>`` with seq increasing per journal, so one
+        ``journal:<id>`` entry in store_meta per journal is enough. It is
+        written in the caller's transaction, so a batch replayed after a crash
+        between commit and journal trim is skipped.
+        """
+        applied: Dict[str, int] = {}
+        fresh = []
+        for row, key in zip(rows, keys):
+            if key is None:
+                fresh.append(row)
+                continue
+            journal_id, seq = key.rsplit(":", 1)
+            if journal_id not in applied:
+                found = conn.execute("SELECT value FROM store_meta WHERE key = ?", (f"journal:{journal_id}",)).fetchone()
+                applied[journal_id] = int(found[0]) if found else -1
+            if int(seq) > applied[journal_id]:
+                applied[journal_id] = int(seq)
+                fresh.append(row)
+        conn.executemany(
+            "INSERT INTO store_meta (key, value) VALUES (?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            [(f"journal:{journal_id}", str(seq)) for journal_id, seq in applied.items()],
+        )
+        if len(fresh) < len(rows):
+            logger.info(f"Skipped {len(rows) - len(fresh)} journal entries already in the store")
+        return fresh
+
+    @staticmethod
+    def _update_rollups(conn: sqlite3.Connection, records: List[tuple]):
+        counts: Dict[tuple, int] = {}
+        users, sessions = set(), set()
+        for record in records:
+            hour = record[0] // 3600
+            key = (hour, record[3] or "unknown", record[8])
+            counts[key] = counts.get(key, 0) + 1
+            users.add((hour, record[1] or ""))
+            if record[9]:
+                sessions.add((hour, record[9]))
+        conn.executemany(
+            "INSERT INTO activity_rollup_hourly (hour, activity_type, admin_flag, count) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (hour, activity_type, admin_flag) DO UPDATE SET count = count + excluded.count",
+            [key + (count,) for key, count in counts.items()],
+        )
+        conn.executemany("INSERT OR IGNORE INTO activity_rollup_users (hour, phone_number) VALUES (?, ?)", users)
+        conn.executemany("INSERT OR IGNORE INTO activity_rollup_sessions (hour, session_id) VALUES (?, ?)", sessions)
+
+    @staticmethod
+    def _update_conversations(conn: sqlite3.Connection, records: List[tuple]):
+        sessions: Dict[str, list] = {}
+        users: Dict[str, list] = {}
+        types: Dict[tuple, int] = {}
+        user_sessions = set()
+        for record in records:
+            ts, phone, session_id = record[0], record[1] or "", record[9]
+            user = users.setdefault(phone, [ts, ts, 0, 0])
+            user[0], user[1] = min(user[0], ts), max(user[1], ts)
+            user[2] += 1
+            if session_id:
+                session = sessions.setdefault(session_id, [phone, ts, ts, 0])
+                session[1], session[2] = min(session[1], ts), max(session[2], ts)
+                session[3] += 1
+                user_sessions.add((phone, session_id))
+            key = (phone, record[3] or "unknown")
+            types[key] = types.get(key, 0) + 1
+
+        conn.executemany(
+            "INSERT INTO activity_sessions (session_id, phone_number, start_ts, end_ts, activity_count) "
+            "VALUES (?, ?, ?, ?, ?) ON CONFLICT (session_id) DO UPDATE SET "
+            "start_ts = MIN(start_ts, excluded.start_ts), end_ts = MAX(end_ts, excluded.end_ts), "
+            "activity_count = activity_count + excluded.activity_count",
+            [(session_id,) + tuple(session) for session_id, session in sessions.items()],
+        )
+        for phone, session_id in user_sessions:
+            if conn.execute(
+                "INSERT OR IGNORE INTO activity_user_sessions (phone_number, session_id) VALUES (?, ?)",
+                (phone, session_id),
+            ).rowcount:
+                users[phone][3] += 1
+        conn.executemany(
+            "INSERT INTO activity_users (phone_number, first_ts, last_ts, total_activities, session_count) "
+            "VALUES (?, ?, ?, ?, ?) ON CONFLICT (phone_number) DO UPDATE SET "
+            "first_ts = MIN(first_ts, excluded.first_ts), last_ts = MAX(last_ts, excluded.last_ts), "
+            "total_activities = total_activities + excluded.total_activities, "
+            "session_count = session_count + excluded.session_count",
+            [(phone,) + tuple(user) for phone, user in users.items()],
+        )
+        conn.executemany(
+            "INSERT INTO activity_user_types (phone_number, activity_type, count) VALUES (?, ?, ?) "
+            "ON CONFLICT (phone_number, activity_type) DO UPDATE SET count = count + excluded.count",
+            [key + (count,) for key, count in types.items()],
+        )
+
+    def rebuild_aggregates(self):
+        """Recompute the rollups and conversation aggregates from the activities table."""
+        conn = self._conn()
+        with conn:
+            for table in ("activity_rollup_hourly", "activity_rollup_users", "activity_rollup_sessions",
+                          "activity_sessions", "activity_user_sessions", "activity_users", "activity_user_types"):
+                conn.execute(f"DELETE FROM {table}")
+            conn.execute(
+                "INSERT INTO activity_rollup_hourly (hour, activity_type, admin_flag, count) "
+                "SELECT ts / 3600, COALESCE(activity_type, 'unknown'), admin_flag, COUNT(*) "
+                "FROM activities GROUP BY 1, 2, 3"
+            )
+            conn.execute(
+                "INSERT INTO activity_rollup_users (hour, phone_number) "
+                "SELECT DISTINCT ts / 3600, COALESCE(phone_number, '') FROM activities"
+            )
+            conn.execute(
+                "INSERT INTO activity_rollup_sessions (hour, session_id) "
+                "SELECT DISTINCT ts / 3600, session_id FROM activities WHERE session_id IS NOT NULL AND session_id != ''"
+            )
+            conn.execute(
+                "INSERT INTO activity_sessions (session_id, phone_number, start_ts, end_ts, activity_count) "
+                "SELECT session_id, COALESCE(MIN(phone_number), ''), MIN(ts), MAX(ts), COUNT(*) FROM activities "
+                "WHERE session_id IS NOT NULL AND session_id != '' GROUP BY session_id"
+            )
+            conn.execute(
+                "INSERT INTO activity_user_sessions (phone_number, session_id) "
+                "SELECT DISTINCT COALESCE(phone_number, ''), session_id FROM activities "
+                "WHERE session_id IS NOT NULL AND session_id != ''"
+            )
+            conn.execute(
+                "INSERT INTO activity_users (phone_number, first_ts, last_ts, total_activities, session_count) "
+                "SELECT COALESCE(phone_number, ''), MIN(ts), MAX(ts), COUNT(*), COUNT(DISTINCT NULLIF(session_id, '')) "
+                "FROM activities GROUP BY 1"
+            )
+            conn.execute(
+                "INSERT INTO activity_user_types (phone_number, activity_type, count) "
+                "SELECT COALESCE(phone_number, ''), COALESCE(activity_type, 'unknown'), COUNT(*) "
+                "FROM activities GROUP BY 1, 2"
+            )
+
+    def _where(self, start: datetime = None, end: datetime = None, phone_number: str = None,
+               activity_types: List[str] = None, admin_only: bool = False) -> tuple:
+        clauses, params = [], []
+        if start:
+            clauses.append("ts >= ?")
+            params.append(to_epoch(start))
+        if end:
+            clauses.append("ts < ?")
+            params.append(to_epoch(end))
+        if phone_number:
+            clauses.append("phone_number = ?")
+            params.append(phone_number)
+        if activity_types:
+            clauses.append(f"activity_type IN ({', '.join('?' * len(activity_types))})")
+            params.extend(activity_types)
+        if admin_only:
+            clauses.append("admin_flag = 1")
+        sql = self._SELECT
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        return sql, params
+
+    def iter_rows(self, start: datetime = None, end: datetime = None,
+                  phone_number: str = None) -> Iterator[tuple]:
+        sql, params = self._where(start, end, phone_number)
+        for row in self._conn().execute(sql + " ORDER BY id", params):
+            yield self._from_db(row)
+
+    def iter_records(self, start: datetime = None, end: datetime = None, phone_number: str = None,
+                     activity_types: List[str] = None, admin_only: bool = False) -> Iterator[ActivityRecord]:
+        # ts is already epoch seconds in the table, so no timestamp parsing at all
+        sql, params = self._where(start, end, phone_number, activity_types, admin_only)
+        for row in self._conn().execute(sql + " ORDER BY id", params):
+            yield ActivityRecord(*row)
+
+    def count_for_phone(self, phone_number: str) -> int:
+        row = self._conn().execute(
+            "SELECT total_activities FROM activity_users WHERE phone_number = ?", (phone_number,)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def timeline(self, phone_number: str, limit: int, before: datetime = None,
+                 before_seq: int = None) -> List[tuple]:
+        # Walks idx_activities_phone backwards from ``before``, touching only the rows returned;
+        # seq is the row id, which orders rows within a second
+        sql = self._SELECT.replace("SELECT ", "SELECT id, ", 1) + " WHERE phone_number = ?"
+        params = [phone_number]
+        if before and before_seq is not None:
+            sql += " AND (ts < ? OR (ts = ? AND id < ?))"
+            params += [to_epoch(before), to_epoch(before), before_seq]
+        elif before:
+            sql += " AND ts < ?"
+            params.append(to_epoch(before))
+        cur = self._conn().execute(sql + " ORDER BY ts DESC, id DESC LIMIT ?", params + [limit])
+        return [(row[0], self._from_db(row[1:])) for row in cur]
+
+    def tail(self, limit: int) -> List[tuple]:
+        cur = self._conn().execute(self._SELECT + " ORDER BY id DESC LIMIT ?", (limit,))
+        return [self._from_db(row) for row in cur]
+
+    def is_empty(self) -> bool:
+        return self._conn().execute("SELECT 1 FROM activities LIMIT 1").fetchone() is None
+
+    def get_meta(self, key: str) -> Optional[str]:
+        row = self._conn().execute("SELECT value FROM store_meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key: str, value: str):
+        conn = self._conn()
+        conn.execute("INSERT INTO store_meta (key, value) VALUES (?, ?) "
+                     "ON CONFLICT(key) DO UPDATE SET value = excluded.value", (key, value))
+        conn.commit()
+
+    def expire(self, archive: ActivityStore, before: datetime = None, keep_rows: int = None) -> int:
+        """Move the oldest rows into ``archive`` in chunks, then delete them.
+
+        Rollups and per-user aggregates keep counting archived rows. The last
+        archived id is stored as the archive checkpoint, so a crash between
+        archiving and deleting never archives the same row twice.
+        """
+        conn = self._conn()
+        limits = []
+        if before:
+            limits.append(conn.execute("SELECT MAX(id) FROM activities WHERE ts < ?", (to_epoch(before),)).fetchone()[0])
+        if keep_rows is not None:
+            row = conn.execute("SELECT id FROM activities ORDER BY id DESC LIMIT 1 OFFSET ?", (keep_rows,)).fetchone()
+            limits.append(row[0] if row else None)
+        last_id = max((limit for limit in limits if limit is not None), default=None)
+        if last_id is None:
+            return 0
+
+        expired = 0
+        while True:
+            # One short write transaction per chunk; IMMEDIATE takes the lock up front so two
+            # workers never archive the same rows
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                checkpoint = archive.checkpoint or {}
+                archived_id = checkpoint.get("id", 0) if checkpoint.get("store") == self.store_id else 0
+                chunk = conn.execute(
+                    "SELECT id, " + self._SELECT[len("SELECT "):] + " WHERE id > ? AND id <= ? ORDER BY id LIMIT 5000",
+                    (archived_id, last_id),
+                ).fetchall()
+                if chunk:
+                    archived_id = chunk[-1][0]
+                    archive.append_many([list(self._from_db(row[1:])) for row in chunk],
+                                        checkpoint={"store": self.store_id, "id": archived_id})
+                expired += conn.execute("DELETE FROM activities WHERE id <= ?", (min(archived_id, last_id),)).rowcount
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            if not chunk:
+                return expired
+
+    @staticmethod
+    def _split_range(start: datetime = None, end: datetime = None) -> tuple:
+        """Split [start, end) into whole rollup hours plus the partial hours at either edge.
+
+        Returns ``(hour_sql, hour_params, raw_sql, raw_params)``: the whole hours
+        are read from the rollup tables, the edges from the activities table.
+        """
+        start_ts = to_epoch(start) if start else None
+        end_ts = to_epoch(end) if end else None
+        first_hour = -(-start_ts // 3600) if start_ts is not None else None
+        last_hour = end_ts // 3600 if end_ts is not None else None
+        if first_hour is not None and last_hour is not None and first_hour >= last_hour:
+            return "0", [], "ts >= ? AND ts < ?", [start_ts, end_ts]
+
+        hour_clauses, hour_params, raw_clauses, raw_params = [], [], [], []
+        if first_hour is not None:
+            hour_clauses.append("hour >= ?")
+            hour_params.append(first_hour)
+            if start_ts < first_hour * 3600:
+                raw_clauses.append("(ts >= ? AND ts < ?)")
+                raw_params += [start_ts, first_hour * 3600]
+        if last_hour is not None:
+            hour_clauses.append("hour < ?")
+            hour_params.append(last_hour)
+            if last_hour * 3600 < end_ts:
+                raw_clauses.append("(ts >= ? AND ts < ?)")
+                raw_params += [last_hour * 3600, end_ts]
+        return " AND ".join(hour_clauses) or "1", hour_params, " OR ".join(raw_clauses) or "0", raw_params
+
+    def summarize(self, start: datetime = None, end: datetime = None) -> Dict[str, Any]:
+        hour_sql, hour_params, raw_sql, raw_params = self._split_range(start, end)
+        conn = self._conn()
+        summary = empty_summary()
+        buckets = conn.execute(
+            f"SELECT hour, activity_type, admin_flag, count FROM activity_rollup_hourly WHERE {hour_sql} "
+            f"UNION ALL "
+            f"SELECT ts / 3600, COALESCE(activity_type, 'unknown'), admin_flag, COUNT(*) FROM activities "
+            f"WHERE {raw_sql} GROUP BY 1, 2, 3",
+            hour_params + raw_params,
+        )
+        for hour, activity_type, admin_flag, count in buckets:
+            add_to_summary(summary, hour, activity_type, admin_flag, count)
+        summary["unique_users"] = conn.execute(
+            f"SELECT COUNT(*) FROM (SELECT phone_number FROM activity_rollup_users WHERE {hour_sql} "
+            f"UNION SELECT COALESCE(phone_number, '') FROM activities WHERE {raw_sql})",
+            hour_params + raw_params,
+        ).fetchone()[0]
+        summary["sessions"] = conn.execute(
+            f"SELECT COUNT(*) FROM (SELECT session_id FROM activity_rollup_sessions WHERE {hour_sql} "
+            f"UNION SELECT session_id FROM activities WHERE ({raw_sql}) AND session_id IS NOT NULL AND session_id != '')",
+            hour_params + raw_params,
+        ).fetchone()[0]
+        return summary
+
+    def conversation_stats(self, phone_number: str = None) -> Dict[str, Any]:
+        conn = self._conn()
+        where, params = ("WHERE phone_number = ?", [phone_number]) if phone_number else ("", [])
+        count, avg_seconds, max_seconds, min_seconds = conn.execute(
+            f"SELECT COUNT(*), AVG(end_ts - start_ts), MAX(end_ts - start_ts), MIN(end_ts - start_ts) "
+            f"FROM activity_sessions {where}",
+            params,
+        ).fetchone()
+        # A bare column next to a single MAX() takes its value from the row holding the maximum
+        top_activity = {
+            phone: activity_type
+            for phone, activity_type, _ in conn.execute(
+                f"SELECT phone_number, activity_type, MAX(count) FROM activity_user_types {where} "
+                f"GROUP BY phone_number",
+                params,
+            )
+        }
+        users = {}
+        for phone, first_ts, last_ts, total, session_count in conn.execute(
+            f"SELECT phone_number, first_ts, last_ts, total_activities, session_count FROM activity_users {where}",
+            params,
+        ):
+            users[phone] = {
+                "first_ts": first_ts,
+                "last_ts": last_ts,
+                "total_activities": total,
+                "session_count": session_count,
+                "top_activity": top_activity.get(phone, "none"),
+            }
+        return {
+            "sessions": {
+                "count": count,
+                "avg_seconds": avg_seconds or 0,
+                "max_seconds": max_seconds or 0,
+                "min_seconds": min_seconds or 0,
+            },
+            "users": users,
+        }
+
+
+def open_activity_store(path: str, partition: str = None) -> ActivityStore:
+    """Pick a backend from the file extension: ``.xlsx`` is Excel, anything else SQLite.
+
+    ``partition`` ("month" or "day") splits an Excel store into time partitions.
+    """
+    if path.lower().endswith(".xlsx"):
+        if partition:
+            return PartitionedExcelActivityStore(path, partition)
+        return ExcelActivityStore(path)
+    return SQLiteActivityStore(path)
@@ -21,12 +21,14 @@ import uvicorn
 import asyncio
 import inspect
 import uuid
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from typing import List, Tuple, Optional
 from typing import Iterator
 from openpyxl import load_workbook
 from activity_logger import activity_logger
 from order_logger import order_logger
+from order_store import NON_COMPLETED_STATUSES
+from export_formats import FORMAT_LABELS as EXPORT_FORMAT_LABELS, available_formats as available_export_formats, export_filename
 
 
 load_dotenv()
@@ -73,6 +75,9 @@ logger = logging.getLogger(__name__)
 # Keep a small in-memory map of last order viewed by each admin (phone -> order_id)
 ADMIN_LAST_VIEWED: dict = {}
 
+# Export format chosen by each admin in the export menu (phone -> export_formats key)
+ADMIN_EXPORT_FORMAT: dict = {}
+
 
 # Helpers to safely send reply buttons respecting WhatsApp limits (1-3 buttons, title <=20 chars)
 def _chunk_buttons(buttons: List[ReplyButton], size: int = 3) -> Iterator[List[ReplyButton]]:
@@ -121,6 +126,17 @@ def generate_session_id() -> str:
     return str(uuid.uuid4())[:8]
 
 
+def _format_duration(seconds: float) -> str:
+    """Compact duration for admin messages, e.g. ``2d 3h``, ``1h 05m`` or ``12m``"""
+    minutes = int(seconds // 60)
+    days, hours, minutes = minutes // 1440, minutes // 60 % 24, minutes % 60
+    if days:
+        return f"{days}d {hours}h"
+    if hours:
+        return f"{hours}h {minutes:02d}m"
+    return f"{minutes}m"
+
+
 def _read_ids_from_sheet(workbook, sheet_name: str) -> List[str]:
     """Read first-column values from a sheet, skipping header and placeholders."""
     ids: List[str] = []
@@ -244,9 +260,183 @@ def handle_admin_command(phone_number: str, message_text: str):
             whatsapp.send_text(to=phone_number, body="❌ Please provide an order ID. Format: /order <ORDER_ID>")
         return True
     
+    # Order search: /search <text> or /search <phone|name|order_id|status>:<text>
+    if message_lower == "/search" or message_lower.startswith("/search "):
+        query = message_text[7:].strip()
+        if query:
+            send_order_search_results(phone_number, query)
+        else:
+            send_order_search_help(phone_number)
+        return True
+    
+    # Orders and revenue for a date range: /revenue <today|week|month|last_month|YYYY-MM-DD [YYYY-MM-DD]>
+    if message_lower == "/revenue" or message_lower.startswith("/revenue "):
+        period = message_text[8:].strip()
+        if period:
+            send_range_statistics(phone_number, period)
+        else:
+            send_range_statistics_help(phone_number)
+        return True
+    
+    # Customer activity timeline
+    if message_lower.startswith("/user "):
+        customer_phone = message_text[6:].strip().lstrip("+")
+        if customer_phone:
+            send_user_timeline_message(phone_number, customer_phone)
+        else:
+            whatsapp.send_text(to=phone_number, body="❌ Please provide a phone number. Format: /user <phone_number>")
+        return True
+    
     return False
 
 
+def send_order_search_help(phone_number: str):
+    """Explain the /search command to admin"""
+    whatsapp.send_text(
+        to=phone_number,
+        body="""🔍 **Search Orders**
+
+Send `/search <text>` to find orders whose ID, customer phone, customer name or status contains the text (at least 3 characters).
+
+Limit the search to one field with a prefix:
+• `/search phone:5883`
+• `/search name:tendai`
+• `/search order_id:20251017`
+• `/search status:new`"""
+    )
+
+
+def send_order_search_results(phone_number: str, query: str, limit: int = 10):
+    """Send the newest orders matching an admin's search query"""
+    try:
+        criteria = "all"
+        field, sep, rest = query.partition(":")
+        if sep and field.strip().lower() in ("phone", "name", "order_id", "status") and rest.strip():
+            criteria, query = field.strip().lower(), rest.strip()
+        
+        results = order_logger.search_orders(query, criteria, limit=limit)
+        if not results:
+            whatsapp.send_text(to=phone_number, body=f"🔍 No orders match \"{query}\".")
+            return
+        
+        message = f"🔍 **Orders matching \"{query}\"** (newest {len(results)})\n\n"
+        buttons = []
+        for order in results:
+            oid = order.get('order_id')
+            customer = (order.get('customer_name') or 'Unknown')[:16]
+            amount = order.get('total_amount') or 0
+            status = order.get('status') or 'NEW'
+            message += f"{oid} | {customer} | ${float(amount):.2f} | {status}\n"
+            if len(buttons) < 3:
+                # Button titles hold 20 characters; the tail is what tells IDs apart
+                buttons.append(ReplyButton(id=f"admin_select_order:{oid}", title=oid[-20:]))
+        
+        _send_buttons_paginated(phone_number, message, buttons)
+        
+    except Exception as e:
+        logger.exception("Failed to search orders")
+        whatsapp.send_text(to=phone_number, body=f"❌ Error searching orders: {str(e)}")
+
+
+def parse_date_range(period: str, today: date = None):
+    """``(start, end)`` dates, inclusive, for a /revenue period; None if it is not understood"""
+    today = today or date.today()
+    period = period.strip().lower()
+    if period == "today":
+        return today, today
+    if period == "yesterday":
+        return today - timedelta(days=1), today - timedelta(days=1)
+    if period == "week":
+        return today - timedelta(days=6), today
+    if period == "month":
+        return today.replace(day=1), today
+    if period == "last_month":
+        end = today.replace(day=1) - timedelta(days=1)
+        return end.replace(day=1), end
+    try:
+        dates = [datetime.strptime(part, "%Y-%m-%d").date() for part in period.split()]
+    except ValueError:
+        return None
+    if len(dates) == 1:
+        return dates[0], dates[0]
+    if len(dates) == 2 and dates[0] <= dates[1]:
+        return dates[0], dates[1]
+    return None
+
+
+def send_range_statistics_help(phone_number: str):
+    """Explain the /revenue command to admin"""
+    whatsapp.send_text(
+        to=phone_number,
+        body="""📅 **Orders & Revenue by Date**
+
+Send `/revenue <period>` for the orders placed and the completed revenue in that period:
+• `/revenue today` or `/revenue yesterday`
+• `/revenue week` - the last 7 days
+• `/revenue month` or `/revenue last_month`
+• `/revenue 2025-10-01` - a single day
+• `/revenue 2025-10-01 2025-10-15` - from the first date to the second, inclusive"""
+    )
+
+
+def send_range_statistics(phone_number: str, period: str):
+    """Send order count and completed revenue for a date range to admin"""
+    try:
+        bounds = parse_date_range(period)
+        if bounds is None:
+            whatsapp.send_text(to=phone_number, body=f"❌ Unknown period \"{period}\". Send /revenue for the formats.")
+            return
+        
+        stats = order_logger.get_range_statistics(*bounds)
+        if "error" in stats:
+            whatsapp.send_text(to=phone_number, body=f"❌ Error loading order statistics: {stats['error']}")
+            return
+        
+        span = stats['start'] if stats['start'] == stats['end'] else f"{stats['start']} to {stats['end']}"
+        message = f"""📅 **Orders & Revenue**
+{span} ({stats['days']} day{'s' if stats['days'] != 1 else ''})
+
+📦 **Orders Placed:** {stats['orders']}
+✅ **Completed:** {stats['completed_orders']}
+💰 **Completed Revenue:** ${stats['completed_revenue']:.2f}
+📊 **Avg Order Value:** ${stats['average_order_value']:.2f}"""
+        whatsapp.send_text(to=phone_number, body=message)
+        
+    except Exception as e:
+        logger.exception("Failed to send range statistics")
+        whatsapp.send_text(to=phone_number, body=f"❌ Error loading order statistics: {str(e)}")
+
+
+def send_user_timeline_message(phone_number: str, customer_phone: str, limit: int = 15):
+    """Send a customer's activity count and latest activities to admin"""
+    try:
+        total = activity_logger.get_user_activity_count(customer_phone)
+        if not total:
+            whatsapp.send_text(to=phone_number, body=f"❌ No activity found for {customer_phone}.")
+            return
+        
+        message = f"""👤 **Customer Timeline**
+
+**📞 Phone:** {customer_phone}
+**📊 Total Activities:** {total}
+
+**🕐 Latest Activities:**"""
+        
+        for activity in activity_logger.get_user_timeline(customer_phone, limit):
+            detail = activity.get('button_id') or activity.get('user_input') or ""
+            if len(detail) > 40:
+                detail = detail[:40] + "..."
+            message += f"\n• {activity['timestamp']} - {activity['activity_type']}"
+            if detail:
+                message += f" ({detail})"
+        
+        whatsapp.send_text(to=phone_number, body=message)
+        
+    except Exception as e:
+        logger.exception("Failed to send user timeline")
+        whatsapp.send_text(to=phone_number, body=f"❌ Error loading customer timeline: {str(e)}")
+
+
 def send_order_details_message(phone_number: str, order_details: dict):
     """Send detailed order information to admin"""
     try:
@@ -300,6 +490,14 @@ def send_order_details_message(phone_number: str, order_details: dict):
         if order_details.get('admin_notes'):
             message += f"\n\n**📝 Admin Notes:**\n{order_details['admin_notes']}"
         
+        # Latest status changes from the order's event history
+        changes = [event for event in order_details.get('history', []) if event['old_status']]
+        if changes:
+            message += "\n\n**🕓 Status History:**"
+            for event in changes[-5:]:
+                by = f" by {event['actor']}" if event['actor'] else ""
+                message += f"\n• {event['timestamp'][:16]} {event['old_status']} → {event['new_status']}{by}"
+        
         whatsapp.send_interactive_buttons(
             to=phone_number,
             body=message,
@@ -336,6 +534,12 @@ Use the admin dashboard buttons for easy management, or use text commands below.
 • `/remove_laptop <id>` - Remove laptop retailer ID
 • `/remove_repair <id>` - Remove repair retailer ID
 
+🔎 **Lookups:**
+• `/order <ORDER_ID>` - Show order details
+• `/search <text>` - Find orders by ID, phone, name or status
+• `/revenue <period>` - Orders and completed revenue for today, week, month or a date range
+• `/user <phone>` - Show a customer's activity timeline
+
 📊 **Current Status:**
 • You receive all order notifications
 • Changes update Excel files automatically
@@ -509,6 +713,13 @@ def update_repair_excel(repair_ids: List[str]):
     wb.save("repairs.xlsx")
 
 
+@app.on_event("shutdown")
+def flush_logs_on_shutdown():
+    """Materialize journaled activity rows and order changes before the worker exits."""
+    activity_logger.close()
+    order_logger.close()
+
+
 @app.get("/")
 def read_root():
     return {"message": "Welcome to SpectraX Laptops WhatsApp Bot!"}
@@ -533,6 +744,12 @@ async def verify_webhook(request: Request):
 
 @app.post("/webhook")
 async def receive_message(request: Request):
+    # Every activity logged while handling this webhook is committed in one write
+    async with activity_logger.abatch():
+        return await _process_webhook(request)
+
+
+async def _process_webhook(request: Request):
     try:
         body = await request.body()
         message = whatsapp.parse(body)
@@ -551,7 +768,7 @@ async def receive_message(request: Request):
             is_admin_user = is_admin(phone_number)
             
             # Log the incoming text message
-            activity_logger.log_activity(
+            await activity_logger.alog_activity(
                 phone_number=phone_number,
                 user_name=user_name,
                 activity_type="message_received",
@@ -563,7 +780,7 @@ async def receive_message(request: Request):
             
             if _text and handle_admin_command(phone_number, _text):
                 # Log admin command execution
-                activity_logger.log_activity(
+                await activity_logger.alog_activity(
                     phone_number=phone_number,
                     user_name=user_name,
                     activity_type="admin_command",
@@ -577,7 +794,7 @@ async def receive_message(request: Request):
             
             # Check if it's admin - send admin welcome instead of regular welcome
             if is_admin_user:
-                activity_logger.log_activity(
+                await activity_logger.alog_activity(
                     phone_number=phone_number,
                     user_name=user_name,
                     activity_type="admin_welcome",
@@ -588,7 +805,7 @@ async def receive_message(request: Request):
                 )
                 send_admin_welcome_message(phone_number)
             else:
-                activity_logger.log_activity(
+                await activity_logger.alog_activity(
                     phone_number=phone_number,
                     user_name=user_name,
                     activity_type="welcome_message",
@@ -608,7 +825,7 @@ async def receive_message(request: Request):
             is_admin_user = is_admin(phone_number)
             
             # Log the button click
-            activity_logger.log_activity(
+            await activity_logger.alog_activity(
                 phone_number=phone_number,
                 user_name=user_name,
                 activity_type="button_clicked",
@@ -620,7 +837,7 @@ async def receive_message(request: Request):
             )
             
             if user_choice == "browse_laptops":
-                activity_logger.log_activity(
+                await activity_logger.alog_activity(
                     phone_number=phone_number,
                     user_name=user_name,
                     activity_type="browse_laptops",
@@ -631,7 +848,7 @@ async def receive_message(request: Request):
                 )
                 handle_browse_laptops(phone_number)
             elif user_choice == "browse_collection":
-                activity_logger.log_activity(
+                await activity_logger.alog_activity(
                     phone_number=phone_number,
                     user_name=user_name,
                     activity_type="browse_collection",
@@ -642,7 +859,7 @@ async def receive_message(request: Request):
                 )
                 handle_browse_laptops(phone_number)
             elif user_choice == "why_spectrax":
-                activity_logger.log_activity(
+                await activity_logger.alog_activity(
                     phone_number=phone_number,
                     user_name=user_name,
                     activity_type="why_spectrax",
@@ -653,7 +870,7 @@ async def receive_message(request: Request):
                 )
                 send_why_spectrax_message(phone_number)
             elif user_choice == "lifetime_support":
-                activity_logger.log_activity(
+                await activity_logger.alog_activity(
                     phone_number=phone_number,
                     user_name=user_name,
                     activity_type="lifetime_support",
@@ -682,7 +899,7 @@ async def receive_message(request: Request):
                 send_upgrades_accessories_message(phone_number)
             # new button handlers
             elif user_choice == "action_buy_laptop":
-                activity_logger.log_activity(
+                await activity_logger.alog_activity(
                     phone_number=phone_number,
                     user_name=user_name,
                     activity_type="catalog_viewed",
@@ -694,7 +911,7 @@ async def receive_message(request: Request):
                 )
                 handle_buy_laptops(phone_number)
             elif user_choice == "action_repairs":
-                activity_logger.log_activity(
+                await activity_logger.alog_activity(
                     phone_number=phone_number,
                     user_name=user_name,
                     activity_type="catalog_viewed",
@@ -707,7 +924,7 @@ async def receive_message(request: Request):
                 handle_repairs(phone_number)
             # Admin button handlers
             elif user_choice == "admin_catalog_management":
-                activity_logger.log_activity(
+                await activity_logger.alog_activity(
                     phone_number=phone_number,
                     user_name=user_name,
                     activity_type="admin_catalog_management",
@@ -718,7 +935,7 @@ async def receive_message(request: Request):
                 )
                 send_admin_catalog_menu(phone_number)
             elif user_choice == "admin_order_management":
-                activity_logger.log_activity(
+                await activity_logger.alog_activity(
                     phone_number=phone_number,
                     user_name=user_name,
                     activity_type="admin_order_management",
@@ -764,9 +981,8 @@ async def receive_message(request: Request):
                     whatsapp.send_text(to=phone_number, body=f"❌ Error opening order: {str(e)}")
 
             elif user_choice == "admin_view_all_orders":
-                orders = order_logger.get_orders_by_status(None)
-                non_completed = [o for o in orders if (o.get('status') or 'NEW') != 'COMPLETED']
-                display = non_completed[:10] if non_completed else (orders[:10] if orders else [])
+                non_completed = order_logger.get_orders_in_statuses(NON_COMPLETED_STATUSES, 10)
+                display = non_completed or order_logger.get_orders_by_status(None, limit=10)
 
                 if not display:
                     whatsapp.send_text(to=phone_number, body="📋 No orders found.")
@@ -797,12 +1013,12 @@ async def receive_message(request: Request):
                     _send_buttons_paginated(phone_number, msg, buttons)
 
             elif user_choice == "admin_filter_non_completed":
-                orders = order_logger.get_orders_by_status(None)
-                non_completed = [o for o in orders if (o.get('status') or 'NEW') != 'COMPLETED']
+                non_completed = order_logger.get_orders_in_statuses(NON_COMPLETED_STATUSES, 3)
                 if not non_completed:
                     whatsapp.send_text(to=phone_number, body="✅ No pending orders. All orders are completed.")
                 else:
-                    msg = f"🚫 Non-Completed Orders ({len(non_completed)})\n\n"
+                    total = sum(order_logger.count_orders(status) for status in NON_COMPLETED_STATUSES)
+                    msg = f"🚫 Non-Completed Orders ({total})\n\n"
                     buttons = []
                     for o in non_completed[:3]:
                         oid = o.get('order_id')
@@ -818,33 +1034,30 @@ async def receive_message(request: Request):
 
             elif user_choice == "admin_export_orders":
                 try:
-                    export_file = f"orders_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-                    import shutil
-                    if os.path.exists(order_logger.file_path):
-                        shutil.copy(order_logger.file_path, export_file)
+                    export_format = ADMIN_EXPORT_FORMAT.get(phone_number, "xlsx")
+                    export_file = order_logger.export_orders(output_format=export_format)
+                    if export_file:
                         whatsapp.send_text(to=phone_number, body=f"✅ Orders export ready: {export_file} (check server files)")
                     else:
-                        whatsapp.send_text(to=phone_number, body="❌ Orders file not found to export.")
+                        whatsapp.send_text(to=phone_number, body="❌ Orders export failed. Please check the logs.")
                 except Exception as e:
                     logger.exception("Failed to export orders: %s", e)
                     whatsapp.send_text(to=phone_number, body=f"❌ Export error: {str(e)}")
             elif user_choice == "admin_process_next":
-                # Admin requested to process the next NEW order
+                # Admin requested to process the next NEW order: pop it into PROCESSING for this admin
                 try:
-                    new_orders = order_logger.get_orders_by_status("NEW")
-                    if not new_orders:
+                    details = order_logger.claim_next_order(processed_by=phone_number)
+                    if not details:
                         whatsapp.send_text(to=phone_number, body="ℹ️ No new orders to process.")
                     else:
-                        next_order = new_orders[0]
-                        order_id = next_order.get('order_id')
-                        details = order_logger.get_order_details(order_id)
-                        if details:
-                            send_order_details_message(phone_number, details)
-                        else:
-                            whatsapp.send_text(to=phone_number, body=f"❌ Could not load order {order_id} details.")
+                        send_order_details_message(phone_number, details)
                 except Exception as e:
                     logger.exception("Failed to fetch next order: %s", e)
                     whatsapp.send_text(to=phone_number, body=f"❌ Error fetching next order: {str(e)}")
+            elif user_choice == "admin_new_orders":
+                send_admin_new_orders(phone_number)
+            elif user_choice == "admin_order_search":
+                send_order_search_help(phone_number)
             elif user_choice == "admin_order_status":
                 send_admin_order_status_menu(phone_number)
             elif user_choice == "admin_customer_comm":
@@ -854,7 +1067,7 @@ async def receive_message(request: Request):
             elif user_choice == "admin_delivery_tracking":
                 send_admin_delivery_tracking(phone_number)
             elif user_choice == "admin_activity_stats":
-                activity_logger.log_activity(
+                await activity_logger.alog_activity(
                     phone_number=phone_number,
                     user_name=user_name,
                     activity_type="admin_activity_stats",
@@ -865,7 +1078,7 @@ async def receive_message(request: Request):
                 )
                 send_admin_activity_stats(phone_number)
             elif user_choice == "admin_analytics_menu":
-                activity_logger.log_activity(
+                await activity_logger.alog_activity(
                     phone_number=phone_number,
                     user_name=user_name,
                     activity_type="admin_analytics_menu",
@@ -891,6 +1104,13 @@ async def receive_message(request: Request):
                 handle_admin_export_request(phone_number, "admin_only")
             elif user_choice == "admin_export_conversations":
                 handle_admin_export_request(phone_number, "conversations")
+            elif user_choice == "admin_export_format":
+                send_admin_export_format_menu(phone_number)
+            elif user_choice.startswith("admin_export_format:"):
+                export_format = user_choice.split(":", 1)[1]
+                if export_format in available_export_formats():
+                    ADMIN_EXPORT_FORMAT[phone_number] = export_format
+                send_admin_export_menu(phone_number)
             
             # Order processing handlers
             elif user_choice == "admin_process_order":
@@ -900,7 +1120,16 @@ async def receive_message(request: Request):
             elif user_choice == "admin_order_details":
                 send_admin_order_details_menu(phone_number)
             elif user_choice == "admin_mark_processing":
-                whatsapp.send_text(to=phone_number, body="✅ Order marked as processing. Customer will be notified of status update.")
+                # Claim the last viewed order; only one admin can move it out of NEW
+                last = ADMIN_LAST_VIEWED.get(phone_number)
+                if not last:
+                    whatsapp.send_text(to=phone_number, body="ℹ️ No recent order in view. Open an order first to mark it as processing.")
+                elif order_logger.update_order_status(last, "PROCESSING", processed_by=phone_number, expected_status="NEW"):
+                    whatsapp.send_text(to=phone_number, body=f"✅ Order {last} marked as processing. Customer will be notified of status update.")
+                else:
+                    details = order_logger.get_order_details(last)
+                    current = details.get('status') if details else "missing"
+                    whatsapp.send_text(to=phone_number, body=f"⚠️ Order {last} was not updated: it is already {current}.")
             elif user_choice == "admin_notify_customer":
                 # Notify the customer for the last viewed order by this admin
                 try:
@@ -920,7 +1149,7 @@ async def receive_message(request: Request):
                                 notify_msg = f"📦 Update on your order {last}: Status - {details.get('status')}.\nWe will follow up shortly."
                                 whatsapp.send_text(to=sanitized, body=notify_msg)
                                 whatsapp.send_text(to=phone_number, body=f"✅ Notification sent to customer {sanitized}.")
-                                activity_logger.log_activity(
+                                await activity_logger.alog_activity(
                                     phone_number=phone_number,
                                     user_name="Admin",
                                     activity_type="admin_notify_customer",
@@ -1038,7 +1267,7 @@ async def receive_message(request: Request):
 
             # Log the order to Excel
             try:
-                order_id = order_logger.log_order(
+                order_id = await order_logger.alog_order(
                     customer_phone=phone_number,
                     customer_name=user_name,
                     order_type=order_type,
@@ -1055,7 +1284,7 @@ async def receive_message(request: Request):
                 order_id = f"ERR_{datetime.now().strftime('%Y%m%d%H%M%S')}"
 
             # Log the order activity
-            activity_logger.log_activity(
+            await activity_logger.alog_activity(
                 phone_number=phone_number,
                 user_name=user_name,
                 activity_type="order_placed",
@@ -1124,7 +1353,7 @@ async def receive_message(request: Request):
                         ],
                     )
                     # Also log the admin notification
-                    activity_logger.log_activity(
+                    await activity_logger.alog_activity(
                         phone_number=admin_number,
                         user_name="System",
                         activity_type="admin_order_notification",
@@ -1182,7 +1411,7 @@ Thanks for choosing SpectraX Laptops! 💻✨"""
             )
 
             # Log customer confirmation
-            activity_logger.log_activity(
+            await activity_logger.alog_activity(
                 phone_number=phone_number,
                 user_name=user_name,
                 activity_type="order_confirmation_sent",
@@ -1290,14 +1519,15 @@ def send_admin_order_dashboard(phone_number: str):
 def send_admin_new_orders(phone_number: str):
     """Show all new orders that need processing"""
     try:
-        new_orders = order_logger.get_orders_by_status("NEW")
+        # Last 10 new orders, read newest-first off the NEW queue and shown oldest-first
+        new_orders = order_logger.get_orders_by_status("NEW", limit=10, newest_first=True)[::-1]
         
         if not new_orders:
             message = "🆕 **New Orders**\n\nNo new orders found! All orders have been processed. 🎉"
         else:
-            message = f"🆕 **New Orders ({len(new_orders)})**\n\n"
+            message = f"🆕 **New Orders ({order_logger.count_orders('NEW')})**\n\n"
             
-            for order in new_orders[-10:]:  # Show last 10 new orders
+            for order in new_orders:
                 order_id = order['order_id']
                 customer = order['customer_name'] or "Unknown"
                 customer_phone = order['customer_phone'][-4:] if order['customer_phone'] else "N/A"
@@ -1404,15 +1634,14 @@ def handle_admin_order_update(phone_number: str, message_text: str):
                 return True
             
             # Update order
-            success = order_logger.update_order_status(order_id, status, notes, "Admin")
+            old_status = order_logger.update_order_status(order_id, status, notes, phone_number)
             
-            if success:
+            if old_status:
                 # Get order details for confirmation
                 order_details = order_logger.get_order_details(order_id)
                 if order_details:
                     customer_name = order_details.get('customer_name') or "Unknown"
                     customer_phone = order_details.get('customer_phone') or None
-                    old_status = order_details.get('status', 'Unknown')
 
                     confirmation_message = f"""✅ **Order Updated Successfully**
 
@@ -1828,33 +2057,61 @@ def send_admin_customer_comm_menu(phone_number: str):
 
 
 def send_admin_order_analytics(phone_number: str):
-    """Send order analytics overview (placeholder)"""
-    message = """📊 **Order Analytics**
-
-**This Week:**
-📈 Total Orders: 15 (+25%)
-💰 Revenue: $4,500 (+30%)
-⭐ Avg Rating: 4.8/5
-
-**Top Products:**
-1. Gaming Laptops (40%)
-2. Business Laptops (35%)
-3. Repair Services (25%)
+    """Send order analytics overview: week-over-week, order mix and top products"""
+    try:
+        report = order_logger.get_order_analytics()
+        if "error" in report:
+            whatsapp.send_text(to=phone_number, body=f"❌ Error loading order analytics: {report['error']}")
+            return
+        
+        def change(pct):
+            return "n/a" if pct is None else f"{pct:+.0f}%"
+        
+        this_week, last_week = report["this_week"], report["last_week"]
+        message = f"""📊 **Order Analytics**
 
-**Customer Satisfaction:**
-😊 95% Positive Feedback
-🔄 5% Return Rate
+**This Week (last 7 days):**
+📈 Orders: {this_week['orders']} ({change(report['orders_change_pct'])} vs {last_week['orders']})
+💰 Revenue: ${this_week['revenue']:,.2f} ({change(report['revenue_change_pct'])} vs ${last_week['revenue']:,.2f})
 
-*Note: Advanced analytics dashboard in development!*"""
-    
-    whatsapp.send_interactive_buttons(
-        to=phone_number,
-        body=message,
-        buttons=[
-            ReplyButton(id="admin_delivery_tracking", title="🚚 Delivery Status"),
-            ReplyButton(id="admin_order_management", title="⬅️ Back to Orders"),
-        ],
-    )
+**Order Mix ({report['total_orders']} orders):**"""
+        for order_type, mix in report["order_mix"].items():
+            if mix["orders"] or order_type != "OTHER":
+                message += f"\n• {order_type}: {mix['orders']} ({mix['share']:.0f}%)"
+        
+        message += "\n\n**Top Products by Revenue:**"
+        for i, product in enumerate(report["top_by_revenue"], 1):
+            message += f"\n{i}. {str(product['title'] or product['retailer_id'])[:30]} - ${product['revenue']:,.2f}"
+        if not report["top_by_revenue"]:
+            message += "\nNo product sales yet."
+        
+        message += "\n\n**Top Products by Units:**"
+        for i, product in enumerate(report["top_by_units"], 1):
+            message += f"\n{i}. {str(product['title'] or product['retailer_id'])[:30]} - {product['units']} sold"
+        if not report["top_by_units"]:
+            message += "\nNo product sales yet."
+        
+        durations = order_logger.get_status_durations()
+        if durations:
+            message += "\n\n**⏱️ Avg Time in Status:**"
+            for entry in durations[:4]:
+                message += (f"\n• {entry['from_status']} → {entry['to_status']}: "
+                            f"{_format_duration(entry['average_seconds'])} ({entry['transitions']} orders)")
+        
+        message += f"\n\n*Cancelled orders excluded. As of {report['generated_at']}*"
+        
+        whatsapp.send_interactive_buttons(
+            to=phone_number,
+            body=message,
+            buttons=[
+                ReplyButton(id="admin_delivery_tracking", title="🚚 Delivery Status"),
+                ReplyButton(id="admin_order_management", title="⬅️ Back to Orders"),
+            ],
+        )
+        
+    except Exception as e:
+        logger.exception("Failed to send order analytics")
+        whatsapp.send_text(to=phone_number, body=f"❌ Error loading order analytics: {str(e)}")
 
 
 def send_admin_delivery_tracking(phone_number: str):
@@ -2483,6 +2740,7 @@ def send_admin_conversation_analytics(phone_number: str):
 
 def send_admin_export_menu(phone_number: str):
     """Send data export options menu"""
+    export_format = ADMIN_EXPORT_FORMAT.get(phone_number, "xlsx")
     message = """📥 **Data Export Options**
 
 **📊 Available Exports:**
@@ -2501,17 +2759,40 @@ def send_admin_export_menu(phone_number: str):
 • Conversation analysis
 
 **📁 Export Formats:**
-All exports are provided as Excel files (.xlsx) with formatted data and summary sheets.
+Excel (.xlsx) with formatted data and a summary sheet, or compressed CSV / JSON Lines (and Parquet when available) for large exports.
+Current format: """ + EXPORT_FORMAT_LABELS[export_format] + """
 
 **⚡ Quick Actions:**"""
     
-    whatsapp.send_interactive_buttons(
-        to=phone_number,
-        body=message,
-        buttons=[
+    _send_buttons_paginated(
+        phone_number,
+        message,
+        [
             ReplyButton(id="admin_export_7days", title="📅 7 Days"),
             ReplyButton(id="admin_export_30days", title="📅 30 Days"),
             ReplyButton(id="admin_export_admin_only", title="👨‍💼 Admin Only"),
+            ReplyButton(id="admin_export_format", title="📁 Change Format"),
+        ],
+    )
+
+
+def send_admin_export_format_menu(phone_number: str):
+    """Let the admin pick the file format used for exports"""
+    current = ADMIN_EXPORT_FORMAT.get(phone_number, "xlsx")
+    message = f"""📁 **Export Format**
+
+Current: {EXPORT_FORMAT_LABELS[current]}
+
+• Excel - formatted workbook, best for opening directly
+• CSV (gzip) / JSON Lines (gzip) - fast and small, for months of data
+• Parquet - columnar, for data tools (when installed)"""
+    
+    _send_buttons_paginated(
+        phone_number,
+        message,
+        [
+            ReplyButton(id=f"admin_export_format:{fmt}", title=EXPORT_FORMAT_LABELS[fmt])
+            for fmt in available_export_formats()
         ],
     )
 
@@ -2521,14 +2802,18 @@ def handle_admin_export_request(phone_number: str, export_type: str):
     try:
         from datetime import datetime, timedelta
         
-        export_file = f"spectrax_export_{export_type}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
+        export_format = ADMIN_EXPORT_FORMAT.get(phone_number, "xlsx")
+        export_file = export_filename(
+            f"spectrax_export_{export_type}_{datetime.now().strftime('%Y%m%d_%H%M%S')}", export_format
+        )
         success = False
         
         if export_type == "7days":
             start_date = (datetime.now() - timedelta(days=7)).strftime("%Y-%m-%d")
             success = activity_logger.export_filtered_data(
                 start_date=start_date,
-                output_file=export_file
+                output_file=export_file,
+                output_format=export_format
             )
             description = "Last 7 days activity"
             
@@ -2536,14 +2821,16 @@ def handle_admin_export_request(phone_number: str, export_type: str):
             start_date = (datetime.now() - timedelta(days=30)).strftime("%Y-%m-%d")
             success = activity_logger.export_filtered_data(
                 start_date=start_date,
-                output_file=export_file
+                output_file=export_file,
+                output_format=export_format
             )
             description = "Last 30 days activity"
             
         elif export_type == "admin_only":
             success = activity_logger.export_filtered_data(
                 admin_only=True,
-                output_file=export_file
+                output_file=export_file,
+                output_format=export_format
             )
             description = "Admin activities only"
             
@@ -2551,7 +2838,8 @@ def handle_admin_export_request(phone_number: str, export_type: str):
             # Export conversation-focused data
             success = activity_logger.export_filtered_data(
                 activity_types=["message_received", "button_clicked", "order_placed"],
-                output_file=export_file
+                output_file=export_file,
+                output_format=export_format
             )
             description = "Conversation activities"
         
@@ -2564,6 +2852,7 @@ def handle_admin_export_request(phone_number: str, export_type: str):
 
 **📁 File Generated:**
 • Name: {export_file}
+• Format: {EXPORT_FORMAT_LABELS[export_format]}
 • Content: {description}
 • Size: {file_size_mb} MB
 • Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
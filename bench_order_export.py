@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Benchmark OrderLogger.export_orders at 10k and 100k orders:
+
+  percell - the previous writer: a normal workbook, ws.cell() per value and a new PatternFill per status cell
+  bulk    - export_orders: rows streamed into a write-only sheet, status colours as conditional formats
+
+Run: python bench_order_export.py [orders ...]
+"""
+
+import os
+import sys
+import time
+import tempfile
+
+from openpyxl import Workbook
+from openpyxl.styles import PatternFill
+
+from order_logger import OrderLogger
+from order_store import ORDER_HEADERS, ORDER_STATUSES
+
+
+def _seed(orders, count):
+    rows = []
+    for i in range(count):
+        rows.append([
+            f"ORD20250101{i:012d}",
+            "2025-01-01 00:00:00", f"26377{i:07d}", f"Customer {i}", "LAPTOP", 100.0 + i % 50, "USD",
+            ORDER_STATUSES[i % 4], "CAT", "1x Gaming Laptop Pro",
+            '[{"retailer_id": "LAPTOP_GAMING_001", "quantity": 1}]',
+        ])
+    orders.store.insert_many(rows)
+
+
+def _export_percell(orders, path):
+    rows = list(orders.store.iter_rows())
+    wb = Workbook()
+    ws = wb.active
+    headers = list(ORDER_HEADERS)
+    ws.append(headers)
+    for row_idx, row in enumerate(rows, 2):
+        for col_idx, value in enumerate(row, 1):
+            cell = ws.cell(row=row_idx, column=col_idx, value=value)
+            if col_idx == headers.index('status') + 1:
+                if value == "COMPLETED":
+                    cell.fill = PatternFill(start_color="98FB98", end_color="98FB98", fill_type="solid")
+                elif value == "CANCELLED":
+                    cell.fill = PatternFill(start_color="FFB6C1", end_color="FFB6C1", fill_type="solid")
+    wb.save(path)
+
+
+def bench(count):
+    with tempfile.TemporaryDirectory() as tmp:
+        orders = OrderLogger(os.path.join(tmp, "orders.db"))
+        cwd = os.getcwd()
+        os.chdir(tmp)
+        try:
+            _seed(orders, count)
+            for mode in ("percell", "bulk"):
+                start = time.perf_counter()
+                if mode == "percell":
+                    _export_percell(orders, "percell.xlsx")
+                else:
+                    orders.export_orders()
+                elapsed = time.perf_counter() - start
+                print(f"{count:>7} orders {mode:>8}: {elapsed:7.2f} s")
+        finally:
+            os.chdir(cwd)
+            orders.close()
+
+
+if __name__ == "__main__":
+    for count in [int(arg) for arg in sys.argv[1:]] or [10000, 100000]:
+        bench(count)
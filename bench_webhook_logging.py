@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Benchmark webhook latency under concurrent load for three logging paths:
+
+  inline - every event rewrites the workbook on the event loop (the original behaviour)
+  sync   - batch() + log_activity/log_order: journal append on the loop, workbook writes in the background
+  async  - abatch() + alog_activity/alog_order: no file I/O on the loop at all
+
+Simulates bursts of concurrent webhooks that each log a few activities (and
+sometimes an order) the way receive_message does, then reports latency
+percentiles. Set FSYNC_DELAY_MS to emulate a disk slower than the local one.
+Run: python bench_webhook_logging.py [webhooks] [concurrency]
+"""
+
+import os
+import sys
+import time
+import asyncio
+import tempfile
+import statistics
+
+from activity_logger import ActivityLogger
+from order_logger import OrderLogger
+
+FSYNC_DELAY_MS = float(os.getenv("FSYNC_DELAY_MS", "0"))
+
+PRODUCTS = [{"title": "Gaming Laptop Pro", "quantity": 1, "price": 1299.99, "item_total": 1299.99, "retailer_id": "LAPTOP_GAMING_001"}]
+
+
+def _order_kwargs(i):
+    return dict(
+        customer_phone=f"26377{i:07d}",
+        customer_name="Bench Customer",
+        order_type="LAPTOP",
+        total_amount=1299.99,
+        catalog_id="BENCH",
+        order_text="bench order",
+        products_data=PRODUCTS,
+    )
+
+
+async def _webhook_inline(log, orders, i):
+    log.log_activity(phone_number=f"26377{i:07d}", activity_type="button_clicked", session_id=str(i))
+    log.flush()
+    log.log_activity(phone_number=f"26377{i:07d}", activity_type="browse_laptops", session_id=str(i))
+    log.flush()
+    if i % 5 == 0:
+        orders.log_order(**_order_kwargs(i))
+        orders.flush()
+    await asyncio.sleep(0)
+
+
+async def _webhook_sync(log, orders, i):
+    with log.batch():
+        log.log_activity(phone_number=f"26377{i:07d}", activity_type="button_clicked", session_id=str(i))
+        log.log_activity(phone_number=f"26377{i:07d}", activity_type="browse_laptops", session_id=str(i))
+        if i % 5 == 0:
+            orders.log_order(**_order_kwargs(i))
+        await asyncio.sleep(0)  # stand-in for the WhatsApp API round trip
+
+
+async def _webhook_async(log, orders, i):
+    async with log.abatch():
+        await log.alog_activity(phone_number=f"26377{i:07d}", activity_type="button_clicked", session_id=str(i))
+        await log.alog_activity(phone_number=f"26377{i:07d}", activity_type="browse_laptops", session_id=str(i))
+        if i % 5 == 0:
+            await orders.alog_order(**_order_kwargs(i))
+        await asyncio.sleep(0)
+
+
+async def _run(handler, log, orders, webhooks, concurrency):
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def timed(i):
+        async with semaphore:
+            start = time.perf_counter()
+            await handler(log, orders, i)
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(timed(i) for i in range(webhooks)))
+    return latencies
+
+
+def bench(mode, webhooks, concurrency):
+    with tempfile.TemporaryDirectory() as tmp:
+        # A spreadsheet activity store makes materialization expensive, like the original deployment
+        log = ActivityLogger(os.path.join(tmp, "activity_log.xlsx"), flush_max_events=25, flush_interval=0.05)
+        orders = OrderLogger(os.path.join(tmp, "orders.db"))
+        handler = {"inline": _webhook_inline, "sync": _webhook_sync, "async": _webhook_async}[mode]
+        try:
+            latencies = sorted(asyncio.run(_run(handler, log, orders, webhooks, concurrency)))
+        finally:
+            log.close()
+            orders.close()
+    p50 = statistics.median(latencies) * 1000
+    p99 = latencies[int(len(latencies) * 0.99) - 1] * 1000
+    print(f"{mode:>6}: p50 {p50:7.2f} ms   p99 {p99:7.2f} ms   max {latencies[-1] * 1000:7.2f} ms")
+
+
+if __name__ == "__main__":
+    webhooks = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    if FSYNC_DELAY_MS:
+        real_fsync = os.fsync
+        os.fsync = lambda fd: (time.sleep(FSYNC_DELAY_MS / 1000), real_fsync(fd))[1]
+    print(f"{webhooks} webhooks, {concurrency} in flight, +{FSYNC_DELAY_MS} ms per fsync")
+    for mode in ("inline", "sync", "async"):
+        bench(mode, webhooks, concurrency)
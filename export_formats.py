@@ -0,0 +1,133 @@
+import os
+import csv
+import gzip
+import json
+import math
+from typing import Any, Dict, Iterable, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet exports are offered only when pyarrow is installed
+    pa = None
+    pq = None
+
+# Export format -> file extension; "xlsx" is the styled workbook written by the loggers themselves
+EXPORT_FORMATS = {
+    "xlsx": ".xlsx",
+    "csv.gz": ".csv.gz",
+    "jsonl.gz": ".jsonl.gz",
+    "parquet": ".parquet",
+}
+FORMAT_LABELS = {
+    "xlsx": "Excel",
+    "csv.gz": "CSV (gzip)",
+    "jsonl.gz": "JSON Lines (gzip)",
+    "parquet": "Parquet",
+}
+
+# Rows buffered per Parquet row group
+PARQUET_BATCH_ROWS = 50000
+
+
+def available_formats() -> List[str]:
+    """Formats that can be produced with the installed packages."""
+    return [fmt for fmt in EXPORT_FORMATS if fmt != "parquet" or pa is not None]
+
+
+def export_filename(prefix: str, fmt: str) -> str:
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    return prefix + EXPORT_FORMATS[fmt]
+
+
+def _clean(value: Any) -> Any:
+    # pandas hands missing cells over as NaN
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    if hasattr(value, "item"):  # numpy scalars
+        return value.item()
+    return value
+
+
+def write_rows(path: str, fmt: str, headers: List[str], rows: Iterable[Iterable[Any]],
+               column_types: Optional[Dict[str, str]] = None) -> int:
+    """Stream ``rows`` to ``path`` as gzip CSV, gzip JSONL or Parquet and return the row count.
+
+    Rows are encoded as they arrive, so memory does not grow with the export
+    (Parquet holds one row group of ``PARQUET_BATCH_ROWS`` at a time).
+    ``column_types`` maps header -> "bool" / "int" / "float" for Parquet
+    columns; everything else is written as a string.
+    """
+    tmp_path = path + ".tmp"
+    if fmt == "csv.gz":
+        count = _write_csv(tmp_path, headers, rows)
+    elif fmt == "jsonl.gz":
+        count = _write_jsonl(tmp_path, headers, rows)
+    elif fmt == "parquet":
+        count = _write_parquet(tmp_path, headers, rows, column_types or {})
+    else:
+        raise ValueError(f"Unsupported streaming export format: {fmt}")
+    os.replace(tmp_path, path)
+    return count
+
+
+def _write_csv(path: str, headers: List[str], rows: Iterable[Iterable[Any]]) -> int:
+    count = 0
+    with gzip.open(path, "wt", encoding="utf-8", newline="", compresslevel=6) as f:
+        writer = csv.writer(f)
+        writer.writerow(headers)
+        for row in rows:
+            writer.writerow([_clean(value) for value in row])
+            count += 1
+    return count
+
+
+def _write_jsonl(path: str, headers: List[str], rows: Iterable[Iterable[Any]]) -> int:
+    count = 0
+    with gzip.open(path, "wt", encoding="utf-8", compresslevel=6) as f:
+        for row in rows:
+            record = {header: _clean(value) for header, value in zip(headers, row)}
+            f.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+            count += 1
+    return count
+
+
+def _write_parquet(path: str, headers: List[str], rows: Iterable[Iterable[Any]], column_types: Dict[str, str]) -> int:
+    if pa is None:
+        raise RuntimeError("Parquet export requires pyarrow")
+    arrow_types = {"bool": pa.bool_(), "int": pa.int64(), "float": pa.float64()}
+    schema = pa.schema([(header, arrow_types.get(column_types.get(header), pa.string())) for header in headers])
+    casts = [_parquet_cast(column_types.get(header)) for header in headers]
+
+    def row_group(columns):
+        arrays = [pa.array(column, type=field.type) for column, field in zip(columns, schema)]
+        return pa.Table.from_arrays(arrays, schema=schema)
+
+    count = 0
+    columns: List[List[Any]] = [[] for _ in headers]
+    with pq.ParquetWriter(path, schema, compression="snappy") as writer:
+        for row in rows:
+            for column, cast, value in zip(columns, casts, row):
+                value = _clean(value)
+                column.append(None if value is None else cast(value))
+            count += 1
+            if len(columns[0]) >= PARQUET_BATCH_ROWS:
+                writer.write_table(row_group(columns))
+                columns = [[] for _ in headers]
+        if columns[0] or not count:
+            writer.write_table(row_group(columns))
+    return count
+
+
+def _parquet_cast(column_type: Optional[str]):
+    return {"bool": bool, "int": int, "float": float}.get(column_type, str)
+
+
+def write_summary(path: str, summary: List[List[Any]]):
+    """Write an export's summary next to it as ``<file>.summary.json`` (xlsx keeps it as a sheet)."""
+    with open(path + ".summary.json", "w", encoding="utf-8") as f:
+        json.dump({str(key): value for key, value in summary[1:]}, f, indent=2, ensure_ascii=False, default=str)
@@ -0,0 +1,352 @@
+import os
+import glob
+import json
+import time
+import uuid
+import atexit
+import threading
+from typing import Optional, Any, List, Tuple, Callable
+import logging
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+try:
+    import msvcrt  # Windows: journals are locked with a byte-range lock instead of flock
+except ImportError:
+    msvcrt = None
+
+logger = logging.getLogger(__name__)
+
+# Group-commit thresholds: pending entries are committed once either limit is hit
+DEFAULT_FLUSH_MAX_EVENTS = 50
+DEFAULT_FLUSH_INTERVAL_SECONDS = 2.0
+
+# Journal durability: fsync after this many appends or this many seconds, whichever comes first
+JOURNAL_SYNC_EVERY = int(os.getenv("JOURNAL_SYNC_EVERY", "20"))
+JOURNAL_SYNC_INTERVAL_SECONDS = float(os.getenv("JOURNAL_SYNC_INTERVAL_SECONDS", "1.0"))
+
+
+def atomic_save_workbook(wb, path: str):
+    """Save an openpyxl workbook next to ``path`` and rename it into place.
+
+    A crash or exception during ``wb.save`` then leaves the previous file intact
+    instead of a truncated one.
+    """
+    tmp_path = path + ".tmp"
+    wb.save(tmp_path)
+    os.replace(tmp_path, path)
+
+
+class Journal:
+    """Append-only JSONL file used as a write-ahead log.
+
+    Every entry is written and flushed to the OS immediately (a process crash
+    keeps it); ``fsync`` is batched by ``sync_every`` / ``sync_interval`` so a
+    burst of appends pays for one disk sync. A torn last line left by a crash
+    mid-write is ignored on ``read``.
+
+    Each entry is stored under a key ``<journal id>:<sequence number>`` that
+    stays with it when another journal adopts it, so a store can recognise
+    entries it already applied (see ``GroupCommitWriter``'s ``keyed``).
+
+    A journal has one writer. With ``owned`` it holds an exclusive lock
+    (``flock``, or ``msvcrt.locking`` on Windows) on ``<path>.lock`` until
+    closed, which tells other processes it is alive (see ``adopt``), and an
+    owned journal that is empty on close is removed.
+    """
+
+    def __init__(self, path: str, sync_every: int = JOURNAL_SYNC_EVERY,
+                 sync_interval: float = JOURNAL_SYNC_INTERVAL_SECONDS, owned: bool = False):
+        self.path = path
+        self.sync_every = max(1, sync_every)
+        self.sync_interval = sync_interval
+        self._lock = threading.Lock()
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self._id = uuid.uuid4().hex[:12]
+        self._seq = 0
+        self._owner_lock = _lock_file(path + ".lock", blocking=True) if owned else None
+        self._file = open(self.path, "ab")
+
+    def append_many(self, entries: List[Any], keys: List[Optional[str]] = None) -> List[Optional[str]]:
+        """Append entries and return their keys; ``keys`` keeps the ones they were adopted with."""
+        if not entries:
+            return []
+        with self._lock:
+            if keys is None:
+                keys = [f"{self._id}:{seq}" for seq in range(self._seq, self._seq + len(entries))]
+                self._seq += len(entries)
+            data = "".join(
+                json.dumps({"key": key, "entry": entry}, ensure_ascii=False, default=str) + "\n"
+                for key, entry in zip(keys, entries)
+            ).encode("utf-8")
+            self._file.write(data)
+            self._file.flush()
+            self._unsynced += len(entries)
+            if self._unsynced >= self.sync_every or time.monotonic() - self._last_sync >= self.sync_interval:
+                self._sync_locked()
+        return keys
+
+    def append(self, entry: Any) -> Optional[str]:
+        return self.append_many([entry])[0]
+
+    def sync(self):
+        """Force everything appended so far onto disk."""
+        with self._lock:
+            self._sync_locked()
+
+    def _sync_locked(self):
+        if self._unsynced:
+            os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def mark(self) -> int:
+        """Current end of the journal; pass to ``discard_through`` once applied."""
+        with self._lock:
+            return self._file.tell()
+
+    def read(self) -> List[Any]:
+        """Return every complete entry in the journal, oldest first."""
+        return [entry for _, entry in self.read_keyed()]
+
+    def read_keyed(self) -> List[Tuple[Optional[str], Any]]:
+        """Return ``(key, entry)`` for every complete entry; lines written before keys existed get None."""
+        entries: List[Tuple[Optional[str], Any]] = []
+        with self._lock:
+            self._file.flush()
+            with open(self.path, "rb") as f:
+                for line_number, line in enumerate(f, 1):
+                    if not line.endswith(b"\n"):
+                        logger.warning(f"Ignoring torn entry at end of journal {self.path}")
+                        break
+                    try:
+                        item = json.loads(line)
+                    except ValueError:
+                        logger.warning(f"Skipping unreadable journal line {line_number} in {self.path}")
+                        continue
+                    if isinstance(item, dict) and item.keys() == {"key", "entry"}:
+                        entries.append((item["key"], item["entry"]))
+                    else:
+                        entries.append((None, item))
+        return entries
+
+    def discard_through(self, mark: int):
+        """Drop entries up to ``mark`` (they are materialized), keeping anything appended after it."""
+        with self._lock:
+            self._file.flush()
+            with open(self.path, "rb") as f:
+                f.seek(mark)
+                remainder = f.read()
+            self._file.close()
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(remainder)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+            self._file = open(self.path, "ab")
+            self._unsynced = 0
+
+    def adopt(self, pattern: str) -> int:
+        """Move the entries of abandoned journals matching ``pattern`` into this one.
+
+        A journal is abandoned when nobody holds its lock, i.e. the process
+        that wrote it has exited. Its entries are appended and synced here
+        before it is deleted, so only this journal's writer commits them. They
+        keep the keys they were first journaled with, so a store that records
+        keys skips any the dead writer committed before its journal was
+        trimmed. Returns the number of entries taken over.
+        """
+        if fcntl is None and msvcrt is None:
+            return 0  # without a lock a live journal cannot be told from an abandoned one
+        adopted = 0
+        for path in sorted(glob.glob(pattern)):
+            if os.path.abspath(path) == os.path.abspath(self.path):
+                continue
+            lock_path = path + ".lock"
+            lock = _lock_file(lock_path, blocking=False)
+            if lock is None:
+                continue  # its writer is still running
+            try:
+                if os.path.exists(path):
+                    stale = Journal(path)
+                    entries = stale.read_keyed()
+                    stale.close()
+                    self.append_many([entry for _, entry in entries], keys=[key for key, _ in entries])
+                    self.sync()
+                    os.remove(path)
+                    adopted += len(entries)
+                    if entries:
+                        logger.info(f"Adopted {len(entries)} uncommitted entries from {path}")
+            finally:
+                _release_lock(lock, remove=True)
+        return adopted
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._sync_locked()
+                empty = self._file.tell() == 0
+                self._file.close()
+                if self._owner_lock is not None:
+                    if empty:
+                        os.remove(self.path)
+                    _release_lock(self._owner_lock, remove=empty)
+
+
+def _lock_file(path: str, blocking: bool):
+    """Open ``path`` and lock it exclusively; None if ``blocking`` is False and it is held."""
+    f = open(path, "a")
+    try:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        elif msvcrt is not None:
+            # Locks the first byte; LK_LOCK gives up after ten seconds, so poll instead
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+                    break
+                except OSError:
+                    if not blocking:
+                        raise BlockingIOError(path)
+                    time.sleep(0.1)
+    except BlockingIOError:
+        f.close()
+        return None
+    return f
+
+
+def _release_lock(f, remove: bool = False):
+    """Unlock and close a file from ``_lock_file``, deleting it when ``remove`` is set.
+
+    With flock the file is deleted while still locked, so nobody can lock the
+    old path in between. Windows cannot delete an open file, so there it is
+    unlocked and closed first, and left behind if another process opened it.
+    """
+    if fcntl is None and msvcrt is not None:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        f.close()
+        if remove:
+            try:
+                os.remove(f.name)
+            except OSError:
+                pass
+        return
+    if remove:
+        os.remove(f.name)
+    f.close()
+
+
+class GroupCommitWriter:
+    """Queue entries in memory and commit them in batches from a background thread.
+
+    ``commit`` receives the list of pending entries and must write all of them
+    in one go. A batch is committed when ``max_events`` entries are pending,
+    when ``interval`` seconds have passed, on an explicit ``flush()`` and on
+    close. With a ``journal`` every entry is appended to it before it is
+    queued, entries left over from a previous run are recovered on start, and
+    the journal is trimmed after each successful commit.
+
+    A crash after ``commit`` but before the trim replays that batch on the
+    next start. With ``keyed`` the commit is called as ``commit(entries,
+    keys)`` with each entry's journal key (None without a journal), so a
+    store that records the keys in the same write can skip a replayed batch.
+    """
+
+    def __init__(self, commit: Callable[..., None], max_events: int = DEFAULT_FLUSH_MAX_EVENTS,
+                 interval: float = DEFAULT_FLUSH_INTERVAL_SECONDS, name: str = "group-commit-writer",
+                 journal: Optional[Journal] = None, keyed: bool = False):
+        self._commit = commit
+        self.max_events = max(1, max_events)
+        self.interval = interval
+        self.journal = journal
+        self.keyed = keyed
+        # (journal key, entry) pairs, oldest first
+        self._pending: List[Tuple[Optional[str], Any]] = journal.read_keyed() if journal else []
+        if self._pending:
+            logger.info(f"Recovered {len(self._pending)} uncommitted entries from {journal.path}")
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._closed = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def submit(self, entry: Any):
+        """Queue an entry for the next batch."""
+        self.submit_many([entry])
+
+    def submit_many(self, entries: List[Any]):
+        """Queue several entries so they are always committed in the same batch."""
+        if not entries:
+            return
+        with self._lock:
+            keys = self.journal.append_many(entries) if self.journal else [None] * len(entries)
+            self._pending.extend(zip(keys, entries))
+            full = len(self._pending) >= self.max_events
+        if full:
+            self._wakeup.set()
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def pending_entries(self) -> List[Any]:
+        """Snapshot of the queued (journaled but not yet committed) entries, oldest first."""
+        with self._lock:
+            return [entry for _, entry in self._pending]
+
+    def flush(self) -> int:
+        """Commit every pending entry now and return how many were written."""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+                if not batch:
+                    return 0
+                mark = self.journal.mark() if self.journal else None
+            entries = [entry for _, entry in batch]
+            try:
+                if self.keyed:
+                    self._commit(entries, [key for key, _ in batch])
+                else:
+                    self._commit(entries)
+            except Exception:
+                # Put the batch back in front of anything queued meanwhile so it is retried
+                with self._lock:
+                    self._pending[:0] = batch
+                raise
+            if self.journal:
+                self.journal.discard_through(mark)
+            return len(batch)
+
+    def close(self):
+        """Stop the background flusher and commit whatever is still pending."""
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        self._wakeup.set()
+        if self._thread.is_alive() and self._thread is not threading.current_thread():
+            self._thread.join(timeout=5)
+        try:
+            self.flush()
+        except Exception as e:
+            logger.exception(f"Failed to flush pending entries on close: {e}")
+        if self.journal:
+            self.journal.close()
+
+    def _run(self):
+        while not self._closed.is_set():
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            if self._closed.is_set():
+                break
+            try:
+                self.flush()
+            except Exception as e:
+                logger.exception(f"Background flush failed, will retry: {e}")
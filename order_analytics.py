@@ -0,0 +1,182 @@
+import threading
+from datetime import date, datetime, timedelta
+from typing import Optional, Any, Dict, List
+import logging
+
+import numpy as np
+import pandas as pd
+
+from activity_store import to_epoch
+
+logger = logging.getLogger(__name__)
+
+# Order types the admin mix is reported for; anything else is counted as OTHER
+ORDER_MIX_TYPES = ["LAPTOP", "REPAIR", "MIXED"]
+TOP_PRODUCTS = 5
+SECONDS_PER_DAY = 86400
+
+
+def _change_pct(current: float, previous: float) -> Optional[float]:
+    if not previous:
+        return None
+    return round(float((current - previous) / previous * 100), 1)
+
+
+class OrderAnalytics:
+    """Product and revenue analytics over a columnar snapshot of the order store.
+
+    The snapshot holds the insert-only columns of every order and line item
+    (see ``SQLiteOrderStore.analytics_rows``). When the store's revision
+    counter moves (an order write from any process) only orders added since
+    are appended and the cancelled set is re-read from the status index; the
+    report itself is memoized per revision and day, so repeat requests cost
+    one primary-key read. Cancelled orders are left out of every figure.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self._lock = threading.Lock()
+        self._revision = None
+        self._orders = None
+        self._items = None
+        self._cancelled: List[int] = []
+        self._report_key = None
+        self._report: Optional[Dict[str, Any]] = None
+
+    def _refresh(self, revision: int):
+        if self._revision == revision:
+            return
+        if self._orders is None or len(self._orders) > self.store.count():
+            # First load, or orders were deleted: start over
+            self._orders, self._items = self.store.analytics_rows(0)
+        else:
+            last_id = int(self._orders["id"].iloc[-1]) if len(self._orders) else 0
+            orders, items = self.store.analytics_rows(last_id)
+            if len(orders):
+                self._orders = pd.concat([self._orders, orders], ignore_index=True)
+                self._items = pd.concat([self._items, items], ignore_index=True)
+        self._cancelled = self.store.row_ids("CANCELLED")
+        self._revision = revision
+
+    def report(self, now: datetime = None) -> Dict[str, Any]:
+        """Week-over-week orders and revenue, order type mix, and top products by units and revenue.
+
+        "This week" is the 7 days ending with today, "last week" the 7 before.
+        """
+        now = now or datetime.now()
+        revision = self.store.revision()
+        key = (revision, now.date())
+        with self._lock:
+            if self._report_key == key:
+                return self._report
+            self._refresh(revision)
+            report = self._compute(self._orders, self._items, self._cancelled, now)
+            self._report_key, self._report = key, report
+            return report
+
+    def _compute(self, orders: pd.DataFrame, items: pd.DataFrame, cancelled: List[int],
+                 now: datetime) -> Dict[str, Any]:
+        if cancelled:
+            orders = orders[~orders["id"].isin(cancelled)]
+            items = items[~items["order_row"].isin(cancelled)]
+        day_end = datetime(now.year, now.month, now.day) + timedelta(days=1)
+        edges = np.array([to_epoch(day_end - timedelta(days=14)),
+                          to_epoch(day_end - timedelta(days=7)),
+                          to_epoch(day_end)])
+        # 0 = last week, 1 = this week; everything else falls outside both
+        week = np.searchsorted(edges, orders["ts"].to_numpy(), side="right") - 1
+        amounts = orders["total_amount"].fillna(0).to_numpy()
+        in_window = (week == 0) | (week == 1)
+        weekly_orders = np.bincount(week[in_window], minlength=2)
+        weekly_revenue = np.bincount(week[in_window], weights=amounts[in_window], minlength=2)
+
+        type_counts = orders["order_type"].astype(str).where(
+            orders["order_type"].isin(ORDER_MIX_TYPES), "OTHER"
+        ).value_counts()
+        total_orders = int(type_counts.sum())
+        mix = {
+            order_type: {
+                "orders": int(type_counts.get(order_type, 0)),
+                "share": round(float(type_counts.get(order_type, 0) / total_orders * 100), 1) if total_orders else 0.0,
+            }
+            for order_type in ORDER_MIX_TYPES + ["OTHER"]
+        }
+
+        products = items.groupby("retailer_id", observed=True).agg(
+            title=("title", "last"), units=("quantity", "sum"), revenue=("item_total", "sum")
+        )
+        return {
+            "generated_at": now.strftime("%Y-%m-%d %H:%M:%S"),
+            "total_orders": total_orders,
+            "total_revenue": round(float(amounts.sum()), 2),
+            "this_week": {"orders": int(weekly_orders[1]), "revenue": round(float(weekly_revenue[1]), 2)},
+            "last_week": {"orders": int(weekly_orders[0]), "revenue": round(float(weekly_revenue[0]), 2)},
+            "orders_change_pct": _change_pct(weekly_orders[1], weekly_orders[0]),
+            "revenue_change_pct": _change_pct(weekly_revenue[1], weekly_revenue[0]),
+            "order_mix": mix,
+            "top_by_units": self._top(products, "units"),
+            "top_by_revenue": self._top(products, "revenue"),
+        }
+
+    @staticmethod
+    def _top(products: pd.DataFrame, column: str) -> List[Dict[str, Any]]:
+        top = products.sort_values([column, "revenue" if column == "units" else "units"], ascending=False)
+        return [
+            {"retailer_id": retailer_id, "title": row.title, "units": int(row.units), "revenue": round(float(row.revenue), 2)}
+            for retailer_id, row in top.head(TOP_PRODUCTS).iterrows()
+        ]
+
+
+class OrderRangeTotals:
+    """Order counts and completed revenue for any range of days, from prefix sums.
+
+    ``order_daily_totals`` is kept per day by triggers on every order write
+    and status change. The running sums over it are rebuilt here, in one
+    pass over the days rather than the orders, the first time a range is
+    asked for after the store's revision moves; a range is then the
+    difference of two prefix entries.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self._lock = threading.Lock()
+        self._revision = None
+        self._first_day = 0
+        # Row i holds (orders, completed, revenue) summed over the days before first_day + i
+        self._cumulative = np.zeros((1, 3))
+
+    def _refresh(self, revision: int):
+        if self._revision == revision:
+            return
+        rows = self.store.daily_totals()
+        if rows:
+            days = np.array([row[0] for row in rows])
+            daily = np.zeros((days[-1] - days[0] + 1, 3))
+            daily[days - days[0]] = [row[1:] for row in rows]
+            self._first_day = int(days[0])
+            self._cumulative = np.vstack([np.zeros((1, 3)), np.cumsum(daily, axis=0)])
+        else:
+            self._first_day, self._cumulative = 0, np.zeros((1, 3))
+        self._revision = revision
+
+    def totals(self, start: date, end: date) -> Dict[str, Any]:
+        """Orders, completed orders and completed revenue for the days ``start`` to ``end`` inclusive."""
+        first = to_epoch(datetime(start.year, start.month, start.day)) // SECONDS_PER_DAY
+        last = to_epoch(datetime(end.year, end.month, end.day)) // SECONDS_PER_DAY
+        if last < first:
+            raise ValueError("start must not be after end")
+        with self._lock:
+            self._refresh(self.store.revision())
+            size = len(self._cumulative) - 1
+            lo = min(max(first - self._first_day, 0), size)
+            hi = min(max(last + 1 - self._first_day, 0), size)
+            orders, completed, revenue = self._cumulative[hi] - self._cumulative[lo]
+        return {
+            "start": start.strftime("%Y-%m-%d"),
+            "end": end.strftime("%Y-%m-%d"),
+            "days": last - first + 1,
+            "orders": int(round(orders)),
+            "completed_orders": int(round(completed)),
+            "completed_revenue": round(float(revenue), 2),
+            "average_order_value": round(float(revenue / completed), 2) if completed >= 1 else 0,
+        }
@@ -0,0 +1,54 @@
+import threading
+from datetime import datetime
+from typing import Optional
+
+from activity_store import from_epoch, to_epoch
+
+ID_PREFIX = "ORD"
+# Worker ids and per-second sequence numbers are three decimal digits each
+MAX_WORKERS = 1000
+MAX_SEQUENCE = 1000
+
+
+def id_bound(moment: datetime) -> str:
+    """Smallest order ID that can be issued at ``moment``, for order_id range scans.
+
+    Works for the older ``ORD{YYYYmmddHHMMSS}{last4(phone)}`` IDs too, since
+    both formats start with the same timestamp digits.
+    """
+    return f"{ID_PREFIX}{moment.strftime('%Y%m%d%H%M%S')}"
+
+
+class OrderIdGenerator:
+    """Time-sortable order IDs: ``ORD{YYYYmmddHHMMSS}{worker:03d}{sequence:03d}``.
+
+    IDs from one generator strictly increase: the sequence counts up within
+    a second, and the clock never goes back (a clock step back or a sequence
+    overflow borrows the next second). Each process gets its own worker id,
+    so IDs are unique across workers without coordination per order, and
+    sort in creation order to the second.
+    """
+
+    def __init__(self, worker_id: int, clock=datetime.now):
+        if not 0 <= worker_id < MAX_WORKERS:
+            raise ValueError(f"worker_id must be in [0, {MAX_WORKERS})")
+        self.worker_id = worker_id
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._second: Optional[int] = None
+        self._sequence = 0
+
+    def next_id(self) -> str:
+        with self._lock:
+            # Wall-clock seconds, the same clock as the order timestamp column
+            second = to_epoch(self._clock())
+            if self._second is not None and second <= self._second:
+                second = self._second
+                self._sequence += 1
+                if self._sequence >= MAX_SEQUENCE:
+                    second += 1
+                    self._sequence = 0
+            else:
+                self._sequence = 0
+            self._second = second
+            return f"{id_bound(from_epoch(second))}{self.worker_id:03d}{self._sequence:03d}"
@@ -1,90 +1,185 @@
 import os
 import json
-from datetime import datetime
-from typing import Optional, Dict, Any, List
-from openpyxl import Workbook, load_workbook
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
+import heapq
+import asyncio
+import sqlite3
+import functools
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from typing import Optional, Dict, Any, List, Iterable, Iterator
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.formatting.rule import CellIsRule
+from openpyxl.styles import Font, PatternFill, Alignment
+from openpyxl.utils import get_column_letter
 import logging
-import pandas as pd
+
+from export_formats import FORMAT_LABELS, export_filename, write_rows, write_summary
+from activity_store import parse_timestamp
+from journal import Journal, atomic_save_workbook
+from order_analytics import OrderAnalytics, OrderRangeTotals
+from order_ids import OrderIdGenerator
+from order_store import ORDER_HEADERS, SEARCH_COLUMNS, SQLiteOrderStore, read_order_workbook
 
 logger = logging.getLogger(__name__)
 
+# Workbook used as the live order log before the SQLite store; imported once if present
 ORDER_LOG_FILE = "orders.xlsx"
+ORDER_STORE_PATH = os.getenv("ORDER_STORE_PATH", "orders.db")
+# Fixed order-ID worker id (0-999) for this process; by default each process takes the next one from the store
+ORDER_WORKER_ID = os.getenv("ORDER_WORKER_ID")
+
+# search_orders criteria -> indexed columns
+SEARCH_CRITERIA = {
+    "phone": ["customer_phone"],
+    "order_id": ["order_id"],
+    "name": ["customer_name"],
+    "status": ["status"],
+}
+
+# Export styling: header colours, and status fills applied as conditional formats on the status column
+EXPORT_HEADER_FONT = Font(bold=True, color="FFFFFF")
+EXPORT_HEADER_FILL = PatternFill(start_color="2E8B57", end_color="2E8B57", fill_type="solid")
+EXPORT_STATUS_FILLS = {
+    "COMPLETED": "98FB98",
+    "CANCELLED": "FFB6C1",
+}
+EXPORT_COLUMN_WIDTH = 15
+
+
+def _period_bounds(date: str) -> tuple:
+    """``[start, end)`` of a "YYYY", "YYYY-MM" or "YYYY-MM-DD" filter, or ``(None, None)`` for anything else."""
+    for fmt, step in (("%Y-%m-%d", "day"), ("%Y-%m", "month"), ("%Y", "year")):
+        try:
+            start = datetime.strptime(date, fmt)
+        except ValueError:
+            continue
+        if step == "day":
+            return start, start + timedelta(days=1)
+        if step == "month":
+            return start, start.replace(year=start.year + start.month // 12, month=start.month % 12 + 1)
+        return start, start.replace(year=start.year + 1)
+    return None, None
+
+
+def write_orders_workbook(path: str, rows: Iterable[Iterable[Any]], headers: List[str] = ORDER_HEADERS) -> int:
+    """Write orders to a styled workbook in one streaming pass and return the row count.
+    
+    Rows go straight into a write-only sheet; status colours come from one
+    conditional-format rule per colour over the status column rather than a
+    fill on every cell. The file is renamed into place once complete, so an
+    export that fails half way never leaves a truncated workbook at ``path``.
+    """
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Orders Export")
+    for col in range(1, len(headers) + 1):
+        ws.column_dimensions[get_column_letter(col)].width = EXPORT_COLUMN_WIDTH
+    
+    header_cells = []
+    for header in headers:
+        cell = WriteOnlyCell(ws, value=header)
+        cell.font = EXPORT_HEADER_FONT
+        cell.fill = EXPORT_HEADER_FILL
+        cell.alignment = Alignment(horizontal='center')
+        header_cells.append(cell)
+    ws.append(header_cells)
+    
+    count = 0
+    for row in rows:
+        # Blank values are left out of the sheet XML entirely rather than written as empty strings
+        ws.append([None if value == "" else value for value in row])
+        count += 1
+    
+    if count and "status" in headers:
+        status_column = get_column_letter(headers.index("status") + 1)
+        status_range = f"{status_column}2:{status_column}{count + 1}"
+        for status, color in EXPORT_STATUS_FILLS.items():
+            ws.conditional_formatting.add(status_range, CellIsRule(
+                operator="equal", formula=[f'"{status}"'],
+                fill=PatternFill(start_color=color, end_color=color, fill_type="solid"),
+            ))
+    
+    atomic_save_workbook(wb, path)
+    return count
+
 
 class OrderLogger:
-    def __init__(self, file_path: str = ORDER_LOG_FILE):
+    def __init__(self, file_path: str = ORDER_STORE_PATH,
+                 legacy_file: Optional[str] = None,
+                 journal_path: Optional[str] = None,
+                 worker_id: Optional[int] = None):
         self.file_path = file_path
-        self.ensure_order_file_exists()
+        self.store = SQLiteOrderStore(file_path)
+        if worker_id is None:
+            worker_id = int(ORDER_WORKER_ID) if ORDER_WORKER_ID else self.store.allocate_worker_id()
+        self._ids = OrderIdGenerator(worker_id)
+        self.analytics = OrderAnalytics(self.store)
+        self.range_totals = OrderRangeTotals(self.store)
+        if legacy_file:
+            self.import_legacy_orders(legacy_file)
+        # Order changes the old journaled writer had not yet saved into orders.xlsx
+        self.journal_path = journal_path or os.path.splitext(file_path)[0] + ".journal.jsonl"
+        self.replay_legacy_journal(self.journal_path)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="order-log-io")
     
-    def ensure_order_file_exists(self):
-        """Create the order log Excel file if it doesn't exist."""
-        if not os.path.exists(self.file_path):
-            wb = Workbook()
-            ws = wb.active
-            ws.title = "Orders"
-            
-            # Add headers with styling
-            headers = [
-                "order_id", "timestamp", "customer_phone", "customer_name", 
-                "order_type", "total_amount", "currency", "status", 
-                "catalog_id", "order_text", "products_json", "admin_notes",
-                "processed_by", "processing_timestamp", "delivery_address", "payment_method"
-            ]
-            ws.append(headers)
-
-    def search_orders(self, query: str, criteria: str = 'all') -> List[Dict[str, Any]]:
+    def import_legacy_orders(self, legacy_file: str) -> int:
+        """Copy orders from an old orders.xlsx into an empty store."""
+        if not os.path.exists(legacy_file):
+            return 0
+        try:
+            if not self.store.is_empty():
+                return 0
+            imported = self.store.insert_many(read_order_workbook(legacy_file))
+            logger.info(f"Imported {imported} orders from {legacy_file}")
+            return imported
+        except Exception as e:
+            logger.exception(f"Failed to import legacy orders: {e}")
+            return 0
+    
+    def replay_legacy_journal(self, journal_path: str) -> int:
+        """Apply and remove an orders journal left behind by the journaled workbook writer."""
+        if not os.path.exists(journal_path):
+            return 0
+        try:
+            journal = Journal(journal_path)
+            entries = journal.read()
+            journal.close()
+            for entry in entries:
+                if entry.get("op") == "insert":
+                    self.store.insert_many([entry["row"]])
+                elif entry.get("op") == "update":
+                    self.store.update_status(
+                        entry["order_id"], entry["status"], entry.get("note") or "",
+                        entry.get("processed_by") or "", entry.get("processing_timestamp") or "",
+                        at=parse_timestamp(entry.get("processing_timestamp")),
+                    )
+            os.remove(journal_path)
+            if entries:
+                logger.info(f"Replayed {len(entries)} journaled order changes from {journal_path}")
+            return len(entries)
+        except Exception as e:
+            logger.exception(f"Failed to replay order journal: {e}")
+            return 0
+    
+    def search_orders(self, query: str, criteria: str = 'all', limit: int = 50) -> List[Dict[str, Any]]:
         """
         Search orders based on various criteria.
         
         Args:
-            query (str): The search query
+            query (str): The search query (substring, case-insensitive)
             criteria (str): The search criteria ('phone', 'order_id', 'name', 'status', 'all')
+            limit (int): Maximum number of orders returned, newest first
         
         Returns:
             List of matching orders
         """
         try:
-            df = pd.read_excel(self.file_path)
-            query = str(query).lower()
-            
-            if criteria == 'phone':
-                mask = df['customer_phone'].astype(str).str.contains(query, case=False, na=False)
-            elif criteria == 'order_id':
-                mask = df['order_id'].astype(str).str.contains(query, case=False, na=False)
-            elif criteria == 'name':
-                mask = df['customer_name'].astype(str).str.contains(query, case=False, na=False)
-            elif criteria == 'status':
-                mask = df['status'].astype(str).str.contains(query, case=False, na=False)
-            else:  # 'all'
-                mask = df.apply(lambda x: x.astype(str).str.contains(query, case=False, na=False)).any(axis=1)
-            
-            results = df[mask].to_dict('records')
-            return results
+            columns = SEARCH_CRITERIA.get(criteria, SEARCH_COLUMNS)
+            return [dict(zip(ORDER_HEADERS, row)) for row in self.store.search(str(query), columns, limit)]
         except Exception as e:
             logger.exception(f"Failed to search orders: {e}")
             return []
-            
-            # Style the header row
-            header_font = Font(bold=True, color="FFFFFF")
-            header_fill = PatternFill(start_color="2E8B57", end_color="2E8B57", fill_type="solid")
-            thin_border = Border(
-                left=Side(style='thin'),
-                right=Side(style='thin'),
-                top=Side(style='thin'),
-                bottom=Side(style='thin')
-            )
-            
-            for col_num, header in enumerate(headers, 1):
-                cell = ws.cell(row=1, column=col_num)
-                cell.font = header_font
-                cell.fill = header_fill
-                cell.alignment = Alignment(horizontal='center')
-                cell.border = thin_border
-                # Auto-adjust column width
-                ws.column_dimensions[cell.column_letter].width = max(len(header) + 2, 12)
-            
-            wb.save(self.file_path)
-            logger.info(f"Created order log file: {self.file_path}")
     
     def log_order(
         self,
@@ -98,15 +193,9 @@ class OrderLogger:
         currency: str = "USD",
         status: str = "NEW"
     ) -> str:
-        """Log an order to the Excel file and return the generated order ID."""
+        """Insert an order in its own transaction and return the generated order ID."""
         try:
-            # Generate unique order ID
             timestamp = datetime.now()
-            order_id = f"ORD{timestamp.strftime('%Y%m%d%H%M%S')}{customer_phone[-4:]}"
-            
-            # Load existing workbook
-            wb = load_workbook(self.file_path)
-            ws = wb.active
             
             # Prepare data
             timestamp_str = timestamp.strftime("%Y-%m-%d %H:%M:%S")
@@ -114,7 +203,7 @@ class OrderLogger:
             
             # Add row
             row_data = [
-                order_id,
+                None,  # order_id
                 timestamp_str,
                 customer_phone,
                 customer_name,
@@ -132,32 +221,16 @@ class OrderLogger:
                 ""   # payment_method
             ]
             
-            row_num = ws.max_row + 1
-            ws.append(row_data)
-            
-            # Style the new row
-            thin_border = Border(
-                left=Side(style='thin'),
-                right=Side(style='thin'),
-                top=Side(style='thin'),
-                bottom=Side(style='thin')
-            )
-            
-            for col_num in range(1, len(row_data) + 1):
-                cell = ws.cell(row=row_num, column=col_num)
-                cell.border = thin_border
-                cell.alignment = Alignment(vertical='top', wrap_text=True)
-                
-                # Color coding by status
-                if col_num == 8:  # status column
-                    if status == "NEW":
-                        cell.fill = PatternFill(start_color="FFE4B5", end_color="FFE4B5", fill_type="solid")
-                    elif status == "PROCESSING":
-                        cell.fill = PatternFill(start_color="E6F3FF", end_color="E6F3FF", fill_type="solid")
-                    elif status == "COMPLETED":
-                        cell.fill = PatternFill(start_color="E8F5E8", end_color="E8F5E8", fill_type="solid")
-            
-            wb.save(self.file_path)
+            for attempt in range(3):
+                order_id = row_data[0] = self._ids.next_id()
+                try:
+                    self.store.insert(row_data)
+                    break
+                except sqlite3.IntegrityError:
+                    # Only possible if another live process holds the same worker id
+                    if attempt == 2:
+                        raise
+                    logger.warning(f"Order ID {order_id} already taken, allocating another")
             logger.info(f"Logged order: {order_id} for {customer_phone}")
             return order_id
             
@@ -165,256 +238,275 @@ class OrderLogger:
             logger.exception(f"Failed to log order: {e}")
             return f"ORD_ERROR_{datetime.now().strftime('%Y%m%d%H%M%S')}"
     
-    def export_orders(self, criteria: dict = None) -> str:
+    async def alog_order(self, **kwargs) -> str:
+        """Awaitable ``log_order`` that runs on the logger's executor, never on the event loop."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(self.log_order, **kwargs))
+    
+    def flush(self) -> int:
+        """Nothing to flush: orders are committed as they are written. Kept for existing callers."""
+        return 0
+    
+    def close(self):
+        """Wait for pending ``alog_order`` calls."""
+        self._executor.shutdown(wait=True)
+    
+    def export_orders(self, criteria: dict = None, output_format: str = "xlsx") -> str:
         """
-        Export orders to a new Excel file with optional filtering.
+        Export orders to a new file with optional filtering.
         
         Args:
             criteria (dict): Filter criteria (e.g., {'status': 'COMPLETED', 'date': '2025-10'})
+            output_format (str): One of export_formats.EXPORT_FORMATS; "xlsx" is the styled workbook
         
         Returns:
             str: Path to the exported file
         """
         try:
-            df = pd.read_excel(self.file_path)
-            
-            if criteria:
-                if 'status' in criteria:
-                    df = df[df['status'] == criteria['status']]
-                if 'date' in criteria:
-                    df = df[df['timestamp'].str.contains(criteria['date'])]
-                if 'customer' in criteria:
-                    mask = (df['customer_name'].str.contains(criteria['customer'], case=False, na=False) |
-                           df['customer_phone'].str.contains(criteria['customer'], case=False, na=False))
-                    df = df[mask]
+            rows = self._export_rows(criteria or {})
             
             # Generate export filename with timestamp
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            export_path = f"orders_export_{timestamp}.xlsx"
-            
-            # Export with styling
-            wb = Workbook()
-            ws = wb.active
-            ws.title = "Orders Export"
-            
-            # Write headers
-            headers = list(df.columns)
-            ws.append(headers)
-            
-            # Style headers
-            header_font = Font(bold=True, color="FFFFFF")
-            header_fill = PatternFill(start_color="2E8B57", end_color="2E8B57", fill_type="solid")
-            
-            for col, header in enumerate(headers, 1):
-                cell = ws.cell(row=1, column=col)
-                cell.font = header_font
-                cell.fill = header_fill
-                cell.alignment = Alignment(horizontal='center')
-                ws.column_dimensions[chr(64 + col)].width = 15
-            
-            # Write data
-            for row_idx, row in enumerate(df.values, 2):
-                for col_idx, value in enumerate(row, 1):
-                    cell = ws.cell(row=row_idx, column=col_idx, value=value)
-                    if col_idx == headers.index('status') + 1:  # Status column
-                        status = str(value).upper()
-                        if status == "COMPLETED":
-                            cell.fill = PatternFill(start_color="98FB98", end_color="98FB98", fill_type="solid")
-                        elif status == "CANCELLED":
-                            cell.fill = PatternFill(start_color="FFB6C1", end_color="FFB6C1", fill_type="solid")
-            
-            wb.save(export_path)
+            export_path = export_filename(f"orders_export_{timestamp}", output_format)
+            
+            if output_format != "xlsx":
+                exported = write_rows(
+                    export_path, output_format, list(ORDER_HEADERS), rows,
+                    column_types={"total_amount": "float"},
+                )
+                write_summary(export_path, [
+                    ["Export Summary", ""],
+                    ["Export Date", datetime.now().strftime("%Y-%m-%d %H:%M:%S")],
+                    ["Total Rows Exported", exported],
+                    ["Criteria", json.dumps(criteria or {})],
+                    ["Format", FORMAT_LABELS[output_format]],
+                ])
+                return export_path
+            
+            write_orders_workbook(export_path, rows)
             return export_path
             
         except Exception as e:
             logger.exception(f"Failed to export orders: {e}")
             return ""
-
-    def update_order_status(self, order_id: str, status: str, admin_notes: str = "", processed_by: str = "") -> bool:
-        """Update order status and add admin notes."""
+    
+    def _export_rows(self, criteria: dict) -> Iterator[tuple]:
+        """Stream export rows; status and whole-period date filters are answered by the store's indexes."""
+        date = str(criteria.get('date') or "")
+        start, end = _period_bounds(date) if date else (None, None)
+        customer = str(criteria.get('customer') or "").lower()
+        for row in self.store.iter_rows(criteria.get('status'), start, end):
+            if date and start is None and date not in row[1]:
+                continue
+            if customer and customer not in str(row[3] or "").lower() and customer not in str(row[2] or "").lower():
+                continue
+            yield row
+    
+    def update_order_status(self, order_id: str, status: str, admin_notes: str = "", processed_by: str = "",
+                            expected_status: Optional[str] = None) -> Optional[str]:
+        """Update order status and record the change, with any admin notes, in the order's event history.
+        
+        Returns the status the order had just before this update, or None if
+        it was not updated. With ``expected_status`` the update only applies if
+        the order is still in that status, so when two admins claim the same
+        order only one wins.
+        """
         try:
-            wb = load_workbook(self.file_path)
-            ws = wb.active
-            
-            # Find the order row
-            for row_num in range(2, ws.max_row + 1):  # Skip header
-                if ws.cell(row=row_num, column=1).value == order_id:
-                    # Update status
-                    ws.cell(row=row_num, column=8).value = status
-                    
-                    # Update admin notes
-                    if admin_notes:
-                        current_notes = ws.cell(row=row_num, column=12).value or ""
-                        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M")
-                        new_note = f"[{timestamp}] {admin_notes}"
-                        updated_notes = f"{current_notes}\n{new_note}" if current_notes else new_note
-                        ws.cell(row=row_num, column=12).value = updated_notes
-                    
-                    # Update processed by and timestamp
-                    if processed_by:
-                        ws.cell(row=row_num, column=13).value = processed_by
-                        ws.cell(row=row_num, column=14).value = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                    
-                    # Update cell styling based on status
-                    status_cell = ws.cell(row=row_num, column=8)
-                    if status == "NEW":
-                        status_cell.fill = PatternFill(start_color="FFE4B5", end_color="FFE4B5", fill_type="solid")
-                    elif status == "PROCESSING":
-                        status_cell.fill = PatternFill(start_color="E6F3FF", end_color="E6F3FF", fill_type="solid")
-                    elif status == "COMPLETED":
-                        status_cell.fill = PatternFill(start_color="E8F5E8", end_color="E8F5E8", fill_type="solid")
-                    elif status == "CANCELLED":
-                        status_cell.fill = PatternFill(start_color="FFE4E1", end_color="FFE4E1", fill_type="solid")
-                    
-                    wb.save(self.file_path)
-                    logger.info(f"Updated order {order_id} status to {status}")
-                    return True
+            now = datetime.now()
+            previous = self.store.update_status(
+                order_id,
+                status,
+                note=admin_notes,
+                processed_by=processed_by,
+                processing_timestamp=now.strftime("%Y-%m-%d %H:%M:%S") if processed_by else "",
+                expected_status=expected_status,
+                at=now,
+            )
+            if previous is None:
+                current = self.store.status_of(order_id)
+                if current is None:
+                    logger.warning(f"Order {order_id} not found for status update")
+                else:
+                    logger.warning(f"Order {order_id} is {current}, expected {expected_status}; not updated")
+                return None
             
-            logger.warning(f"Order {order_id} not found for status update")
-            return False
+            logger.info(f"Updated order {order_id} status from {previous} to {status}")
+            return previous
             
         except Exception as e:
             logger.exception(f"Failed to update order status: {e}")
-            return False
+            return None
     
-    def get_orders_by_status(self, status: str = None) -> List[Dict[str, Any]]:
-        """Get orders filtered by status."""
+    def get_orders_by_status(self, status: str = None, limit: Optional[int] = None,
+                             newest_first: bool = False) -> List[Dict[str, Any]]:
+        """Get orders filtered by status, oldest first unless ``newest_first``.
+        
+        With a ``status`` and ``limit`` only that many rows are read from the
+        status queue, however many orders there are.
+        """
         try:
-            if not os.path.exists(self.file_path):
-                return []
-            
-            wb = load_workbook(self.file_path, read_only=True)
-            ws = wb.active
-            
-            orders = []
-            headers = [cell.value for cell in ws[1]]
-            
-            for row in ws.iter_rows(min_row=2, values_only=True):
-                if not row[0]:  # order_id
-                    continue
-                
-                order_data = dict(zip(headers, row))
-                
-                # Filter by status if specified
-                if status and order_data.get('status') != status:
-                    continue
-                
-                orders.append(order_data)
-            
-            return orders
-            
+            if status and limit is not None:
+                rows = self.store.queue(status, limit, newest_first)
+            elif limit is not None and newest_first:
+                rows = self.store.recent(limit)
+            else:
+                rows = list(self.store.iter_rows(status))
+                if newest_first:
+                    rows.reverse()
+                if limit is not None:
+                    rows = rows[:limit]
+            return [dict(zip(ORDER_HEADERS, row)) for row in rows]
         except Exception as e:
             logger.exception(f"Failed to get orders by status: {e}")
             return []
     
+    def get_orders_in_statuses(self, statuses: List[str], limit: int) -> List[Dict[str, Any]]:
+        """The oldest ``limit`` orders in any of ``statuses``, merged from their status queues."""
+        try:
+            queues = [self.store.queue(status, limit) for status in statuses]
+            rows = heapq.merge(*queues, key=lambda row: row[0])
+            return [dict(zip(ORDER_HEADERS, row)) for row in itertools.islice(rows, limit)]
+        except Exception as e:
+            logger.exception(f"Failed to get orders in statuses {statuses}: {e}")
+            return []
+    
+    def count_orders(self, status: str = None) -> int:
+        try:
+            return self.store.count(status)
+        except Exception as e:
+            logger.exception(f"Failed to count orders: {e}")
+            return 0
+    
+    def claim_next_order(self, processed_by: str, admin_notes: str = "") -> Optional[Dict[str, Any]]:
+        """Pop the oldest NEW order into PROCESSING for ``processed_by`` and return its details.
+        
+        Two admins pressing "Process Next" together get different orders.
+        """
+        try:
+            now = datetime.now()
+            order_id = self.store.claim_next(
+                "NEW",
+                "PROCESSING",
+                note=admin_notes,
+                processed_by=processed_by,
+                processing_timestamp=now.strftime("%Y-%m-%d %H:%M:%S") if processed_by else "",
+                at=now,
+            )
+            if order_id is None:
+                return None
+            logger.info(f"Order {order_id} claimed by {processed_by}")
+            return self.get_order_details(order_id)
+        except Exception as e:
+            logger.exception(f"Failed to claim next order: {e}")
+            return None
+    
     def get_recent_orders(self, limit: int = 10) -> List[Dict[str, Any]]:
-        """Get recent orders."""
+        """Get recent orders, most recent first."""
         try:
-            if not os.path.exists(self.file_path):
-                return []
-            
-            wb = load_workbook(self.file_path, read_only=True)
-            ws = wb.active
-            
-            orders = []
-            headers = [cell.value for cell in ws[1]]
-            rows = list(ws.iter_rows(min_row=2, values_only=True))
-            
-            # Get last N rows (most recent)
-            for row in rows[-limit:]:
-                if row[0]:  # order_id exists
-                    orders.append(dict(zip(headers, row)))
-            
-            return list(reversed(orders))  # Most recent first
-            
+            return [dict(zip(ORDER_HEADERS, row)) for row in self.store.recent(limit)]
         except Exception as e:
             logger.exception(f"Failed to get recent orders: {e}")
             return []
     
+    def get_orders_between(self, start: datetime, end: datetime) -> List[Dict[str, Any]]:
+        """Orders placed in ``[start, end)``, oldest first."""
+        try:
+            return [dict(zip(ORDER_HEADERS, row)) for row in self.store.iter_rows(start=start, end=end)]
+        except Exception as e:
+            logger.exception(f"Failed to get orders between {start} and {end}: {e}")
+            return []
+    
+    def get_product_sales(self, start: datetime = None, end: datetime = None, statuses: List[str] = None,
+                          limit: int = 10, order_by: str = "revenue") -> List[Dict[str, Any]]:
+        """Top products (by ``revenue`` or ``units``) with units, revenue and order count per retailer_id."""
+        try:
+            return self.store.product_sales(start, end, statuses, limit, order_by)
+        except Exception as e:
+            logger.exception(f"Failed to get product sales: {e}")
+            return []
+    
+    def get_order_analytics(self) -> Dict[str, Any]:
+        """Week-over-week, order mix and top-product report; recomputed only after order writes."""
+        try:
+            return self.analytics.report()
+        except Exception as e:
+            logger.exception(f"Failed to get order analytics: {e}")
+            return {"error": str(e)}
+    
+    def get_range_statistics(self, start: date, end: date) -> Dict[str, Any]:
+        """Orders, completed orders and completed revenue placed from ``start`` to ``end`` (whole days, inclusive)."""
+        try:
+            return self.range_totals.totals(start, end)
+        except Exception as e:
+            logger.exception(f"Failed to get order statistics for {start} to {end}: {e}")
+            return {"error": str(e)}
+    
     def get_order_details(self, order_id: str) -> Optional[Dict[str, Any]]:
         """Get detailed information about a specific order."""
         try:
-            if not os.path.exists(self.file_path):
+            row = self.store.get(order_id)
+            if row is None:
                 return None
+            order_data = dict(zip(ORDER_HEADERS, row))
             
-            wb = load_workbook(self.file_path, read_only=True)
-            ws = wb.active
-            
-            headers = [cell.value for cell in ws[1]]
+            # Parse products JSON
+            try:
+                if order_data.get('products_json'):
+                    order_data['products'] = json.loads(order_data['products_json'])
+                else:
+                    order_data['products'] = []
+            except:
+                order_data['products'] = []
             
-            for row in ws.iter_rows(min_row=2, values_only=True):
-                if row[0] == order_id:
-                    order_data = dict(zip(headers, row))
-                    
-                    # Parse products JSON
-                    try:
-                        if order_data.get('products_json'):
-                            order_data['products'] = json.loads(order_data['products_json'])
-                        else:
-                            order_data['products'] = []
-                    except:
-                        order_data['products'] = []
-                    
-                    return order_data
-            
-            return None
+            order_data['history'] = self.get_order_history(order_id)
+            return order_data
             
         except Exception as e:
             logger.exception(f"Failed to get order details: {e}")
             return None
     
+    def get_order_history(self, order_id: str) -> List[Dict[str, Any]]:
+        """Status changes of an order, oldest first, starting with its creation (``old_status`` None)."""
+        try:
+            return [
+                dict(zip(["timestamp", "actor", "old_status", "new_status", "note"], event))
+                for event in self.store.events(order_id)
+            ]
+        except Exception as e:
+            logger.exception(f"Failed to get order history: {e}")
+            return []
+    
+    def get_status_durations(self) -> List[Dict[str, Any]]:
+        """Average time orders spend in a status before each transition, e.g. NEW -> PROCESSING, most frequent first."""
+        try:
+            return [
+                {
+                    "from_status": old_status,
+                    "to_status": new_status,
+                    "transitions": count,
+                    "average_seconds": round(seconds / count) if count else 0,
+                }
+                for old_status, new_status, count, seconds in self.store.transition_totals()
+            ]
+        except Exception as e:
+            logger.exception(f"Failed to get status durations: {e}")
+            return []
+    
     def get_order_statistics(self) -> Dict[str, Any]:
         """Get order statistics for admin dashboard."""
         try:
-            if not os.path.exists(self.file_path):
-                return {
-                    "total_orders": 0,
-                    "new_orders": 0,
-                    "processing_orders": 0,
-                    "completed_orders": 0,
-                    "cancelled_orders": 0,
-                    "total_revenue": 0,
-                    "average_order_value": 0
-                }
-            
-            wb = load_workbook(self.file_path, read_only=True)
-            ws = wb.active
-            
+            totals = self.store.status_totals()
             stats = {
-                "total_orders": 0,
-                "new_orders": 0,
-                "processing_orders": 0,
-                "completed_orders": 0,
-                "cancelled_orders": 0,
-                "total_revenue": 0,
+                "total_orders": sum(entry["count"] for entry in totals.values()),
+                "new_orders": totals.get("NEW", {}).get("count", 0),
+                "processing_orders": totals.get("PROCESSING", {}).get("count", 0),
+                "completed_orders": totals.get("COMPLETED", {}).get("count", 0),
+                "cancelled_orders": totals.get("CANCELLED", {}).get("count", 0),
+                # Revenue only counts completed orders
+                "total_revenue": round(totals.get("COMPLETED", {}).get("amount", 0), 2),
                 "average_order_value": 0
             }
             
-            for row in ws.iter_rows(min_row=2, values_only=True):
-                if not row[0]:  # order_id
-                    continue
-                
-                stats["total_orders"] += 1
-                
-                # Count by status
-                status = row[7] or "NEW"
-                if status == "NEW":
-                    stats["new_orders"] += 1
-                elif status == "PROCESSING":
-                    stats["processing_orders"] += 1
-                elif status == "COMPLETED":
-                    stats["completed_orders"] += 1
-                elif status == "CANCELLED":
-                    stats["cancelled_orders"] += 1
-                
-                # Calculate revenue (only completed orders)
-                if status == "COMPLETED":
-                    try:
-                        amount = float(row[5] or 0)
-                        stats["total_revenue"] += amount
-                    except:
-                        pass
-            
             # Calculate average order value
             if stats["completed_orders"] > 0:
                 stats["average_order_value"] = round(stats["total_revenue"] / stats["completed_orders"], 2)
@@ -426,4 +518,4 @@ class OrderLogger:
             return {"error": str(e)}
 
 # Global order logger instance
-order_logger = OrderLogger()
+order_logger = OrderLogger(legacy_file=ORDER_LOG_FILE)
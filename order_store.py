@@ -0,0 +1,679 @@
+import os
+import json
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Optional, Any, Dict, List, Iterator, Iterable
+from openpyxl import load_workbook
+import logging
+import pandas as pd
+
+from activity_store import TIMESTAMP_FORMAT, from_epoch, parse_timestamp, to_epoch
+from order_ids import MAX_WORKERS, id_bound
+
+logger = logging.getLogger(__name__)
+
+ORDER_HEADERS = [
+    "order_id", "timestamp", "customer_phone", "customer_name",
+    "order_type", "total_amount", "currency", "status",
+    "catalog_id", "order_text", "products_json", "admin_notes",
+    "processed_by", "processing_timestamp", "delivery_address", "payment_method"
+]
+
+ORDER_STATUSES = ["NEW", "PROCESSING", "COMPLETED", "CANCELLED"]
+NON_COMPLETED_STATUSES = ["NEW", "PROCESSING", "CANCELLED"]
+# Columns covered by the order search index
+SEARCH_COLUMNS = ["order_id", "customer_phone", "customer_name", "status"]
+# Trigram index: substrings shorter than this cannot be looked up in it
+MIN_SEARCH_LENGTH = 3
+
+
+class SQLiteOrderStore:
+    """Orders table in SQLite, one row per order in ``ORDER_HEADERS`` order.
+
+    Every write is its own transaction, so an order is durable once
+    ``insert`` returns. Status changes are a single conditional UPDATE:
+    passing ``expected_status`` turns it into a compare-and-set, which is how
+    two admins claiming the same order are told apart without a lock.
+
+    Per-status order counts and amounts live in ``order_status_totals``,
+    kept by triggers in the same transaction as every insert, status change
+    and delete, and checked against a full scan each time the store opens.
+
+    ``order_search`` is an FTS5 trigram index over ``SEARCH_COLUMNS``, also
+    kept in step by triggers, so substring search reads only the matching
+    rows. Without FTS5 in the SQLite build, search falls back to a scan.
+
+    Each order's products are also written as ``order_items`` rows (one per
+    product, with the order time) in the same transaction as the order, so
+    product-level questions are grouped queries instead of JSON decoding.
+    """
+
+    # Bumped whenever derived tables are added; older databases are backfilled on open
+    SCHEMA_VERSION = 3
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS orders (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            order_id TEXT NOT NULL UNIQUE,
+            ts INTEGER NOT NULL,
+            customer_phone TEXT,
+            customer_name TEXT,
+            order_type TEXT,
+            total_amount REAL,
+            currency TEXT,
+            status TEXT NOT NULL,
+            catalog_id TEXT,
+            order_text TEXT,
+            products_json TEXT,
+            admin_notes TEXT,
+            processed_by TEXT,
+            processing_timestamp TEXT,
+            delivery_address TEXT,
+            payment_method TEXT
+        );
+        DROP INDEX IF EXISTS idx_orders_status;
+        CREATE INDEX IF NOT EXISTS idx_orders_status_queue ON orders(status, order_id);
+        CREATE INDEX IF NOT EXISTS idx_orders_phone ON orders(customer_phone, ts);
+        CREATE INDEX IF NOT EXISTS idx_orders_ts ON orders(ts);
+        CREATE TABLE IF NOT EXISTS order_items (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            order_id TEXT NOT NULL,
+            ts INTEGER NOT NULL,
+            retailer_id TEXT,
+            title TEXT,
+            quantity INTEGER NOT NULL,
+            unit_price REAL NOT NULL,
+            item_total REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_order_items_order ON order_items(order_id);
+        CREATE INDEX IF NOT EXISTS idx_order_items_retailer ON order_items(retailer_id, ts);
+        CREATE INDEX IF NOT EXISTS idx_order_items_ts ON order_items(ts);
+        CREATE TRIGGER IF NOT EXISTS trg_orders_items_delete AFTER DELETE ON orders BEGIN
+            DELETE FROM order_items WHERE order_id = OLD.order_id;
+        END;
+        CREATE TABLE IF NOT EXISTS store_meta (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        );
+        CREATE TRIGGER IF NOT EXISTS trg_orders_revision_insert AFTER INSERT ON orders BEGIN
+            INSERT INTO store_meta (key, value) VALUES ('revision', '1')
+            ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1;
+        END;
+        CREATE TRIGGER IF NOT EXISTS trg_orders_revision_update AFTER UPDATE ON orders BEGIN
+            INSERT INTO store_meta (key, value) VALUES ('revision', '1')
+            ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1;
+        END;
+        CREATE TRIGGER IF NOT EXISTS trg_orders_revision_delete AFTER DELETE ON orders BEGIN
+            INSERT INTO store_meta (key, value) VALUES ('revision', '1')
+            ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1;
+        END;
+        CREATE TABLE IF NOT EXISTS order_status_totals (
+            status TEXT PRIMARY KEY,
+            count INTEGER NOT NULL,
+            amount REAL NOT NULL
+        );
+        CREATE TRIGGER IF NOT EXISTS trg_orders_totals_insert AFTER INSERT ON orders BEGIN
+            INSERT INTO order_status_totals (status, count, amount) VALUES (NEW.status, 1, COALESCE(NEW.total_amount, 0))
+            ON CONFLICT(status) DO UPDATE SET count = count + 1, amount = amount + excluded.amount;
+        END;
+        CREATE TRIGGER IF NOT EXISTS trg_orders_totals_update AFTER UPDATE OF status, total_amount ON orders
+        WHEN OLD.status IS NOT NEW.status OR OLD.total_amount IS NOT NEW.total_amount BEGIN
+            UPDATE order_status_totals SET count = count - 1, amount = amount - COALESCE(OLD.total_amount, 0)
+            WHERE status = OLD.status;
+            INSERT INTO order_status_totals (status, count, amount) VALUES (NEW.status, 1, COALESCE(NEW.total_amount, 0))
+            ON CONFLICT(status) DO UPDATE SET count = count + 1, amount = amount + excluded.amount;
+        END;
+        CREATE TRIGGER IF NOT EXISTS trg_orders_totals_delete AFTER DELETE ON orders BEGIN
+            UPDATE order_status_totals SET count = count - 1, amount = amount - COALESCE(OLD.total_amount, 0)
+            WHERE status = OLD.status;
+        END;
+        CREATE TABLE IF NOT EXISTS order_daily_totals (
+            day INTEGER PRIMARY KEY,
+            orders INTEGER NOT NULL,
+            completed INTEGER NOT NULL,
+            revenue REAL NOT NULL
+        );
+        CREATE TRIGGER IF NOT EXISTS trg_orders_daily_insert AFTER INSERT ON orders BEGIN
+            INSERT INTO order_daily_totals (day, orders, completed, revenue)
+            VALUES (NEW.ts / 86400, 1, NEW.status = 'COMPLETED',
+                    CASE WHEN NEW.status = 'COMPLETED' THEN COALESCE(NEW.total_amount, 0) ELSE 0 END)
+            ON CONFLICT(day) DO UPDATE SET orders = orders + 1, completed = completed + excluded.completed,
+                revenue = revenue + excluded.revenue;
+        END;
+        CREATE TRIGGER IF NOT EXISTS trg_orders_daily_update AFTER UPDATE OF ts, status, total_amount ON orders
+        WHEN OLD.ts IS NOT NEW.ts OR OLD.status IS NOT NEW.status OR OLD.total_amount IS NOT NEW.total_amount BEGIN
+            UPDATE order_daily_totals SET orders = orders - 1, completed = completed - (OLD.status = 'COMPLETED'),
+                revenue = revenue - CASE WHEN OLD.status = 'COMPLETED' THEN COALESCE(OLD.total_amount, 0) ELSE 0 END
+            WHERE day = OLD.ts / 86400;
+            INSERT INTO order_daily_totals (day, orders, completed, revenue)
+            VALUES (NEW.ts / 86400, 1, NEW.status = 'COMPLETED',
+                    CASE WHEN NEW.status = 'COMPLETED' THEN COALESCE(NEW.total_amount, 0) ELSE 0 END)
+            ON CONFLICT(day) DO UPDATE SET orders = orders + 1, completed = completed + excluded.completed,
+                revenue = revenue + excluded.revenue;
+        END;
+        CREATE TRIGGER IF NOT EXISTS trg_orders_daily_delete AFTER DELETE ON orders BEGIN
+            UPDATE order_daily_totals SET orders = orders - 1, completed = completed - (OLD.status = 'COMPLETED'),
+                revenue = revenue - CASE WHEN OLD.status = 'COMPLETED' THEN COALESCE(OLD.total_amount, 0) ELSE 0 END
+            WHERE day = OLD.ts / 86400;
+        END;
+        CREATE TABLE IF NOT EXISTS order_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            order_id TEXT NOT NULL,
+            ts INTEGER NOT NULL,
+            actor TEXT,
+            old_status TEXT,
+            new_status TEXT NOT NULL,
+            note TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_order_events_order ON order_events(order_id, id);
+        CREATE TRIGGER IF NOT EXISTS trg_orders_events_insert AFTER INSERT ON orders BEGIN
+            INSERT INTO order_events (order_id, ts, actor, old_status, new_status, note)
+            VALUES (NEW.order_id, NEW.ts, NEW.customer_phone, NULL, NEW.status, NULL);
+        END;
+        CREATE TABLE IF NOT EXISTS order_transition_totals (
+            old_status TEXT NOT NULL,
+            new_status TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            seconds INTEGER NOT NULL,
+            PRIMARY KEY (old_status, new_status)
+        );
+        CREATE TRIGGER IF NOT EXISTS trg_order_events_transition AFTER INSERT ON order_events
+        WHEN NEW.old_status IS NOT NULL AND NEW.old_status != NEW.new_status BEGIN
+            INSERT INTO order_transition_totals (old_status, new_status, count, seconds)
+            SELECT NEW.old_status, NEW.new_status, 1, NEW.ts - ts FROM order_events
+            WHERE order_id = NEW.order_id AND id < NEW.id AND (old_status IS NULL OR old_status != new_status)
+            ORDER BY id DESC LIMIT 1
+            ON CONFLICT(old_status, new_status) DO UPDATE SET count = count + 1, seconds = seconds + excluded.seconds;
+        END;
+    """
+
+    # admin_notes reads as any notes stored on the row (orders from before the event log) followed by
+    # the "[YYYY-mm-dd HH:MM] note" lines of the order's events, in the order they were written
+    _NOTES = (
+        "NULLIF(trim(COALESCE(admin_notes, '') || char(10) || COALESCE(("
+        "SELECT group_concat('[' || strftime('%Y-%m-%d %H:%M', e.ts, 'unixepoch') || '] ' || e.note, char(10)) "
+        "FROM order_events e WHERE e.order_id = orders.order_id AND e.note != ''), ''), char(10)), '')"
+    )
+
+    _SELECT = ("SELECT order_id, ts, customer_phone, customer_name, order_type, total_amount, currency, "
+               f"status, catalog_id, order_text, products_json, {_NOTES}, processed_by, "
+               "processing_timestamp, delivery_address, payment_method FROM orders")
+
+    _INSERT_ORDER = (
+        "INSERT {conflict}INTO orders (order_id, ts, customer_phone, customer_name, order_type, total_amount, "
+        "currency, status, catalog_id, order_text, products_json, admin_notes, processed_by, "
+        "processing_timestamp, delivery_address, payment_method) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+    )
+
+    _INSERT_ITEM = ("INSERT INTO order_items (order_id, ts, retailer_id, title, quantity, unit_price, item_total) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)")
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._local = threading.local()
+        conn = self._conn()
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        conn.executescript(self.SCHEMA)
+        if version < 1:
+            self.rebuild_line_items()
+        if version < 2:
+            self.rebuild_daily_totals()
+        if version < 3:
+            self.backfill_order_events()
+        if version < self.SCHEMA_VERSION:
+            conn.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+        conn.commit()
+        self.reconcile_totals()
+        self.search_indexed = self._create_search_index(conn)
+
+    SEARCH_SCHEMA = """
+        CREATE VIRTUAL TABLE order_search USING fts5(
+            order_id, customer_phone, customer_name, status,
+            content='orders', content_rowid='id', tokenize='trigram'
+        );
+        CREATE TRIGGER trg_orders_search_insert AFTER INSERT ON orders BEGIN
+            INSERT INTO order_search (rowid, order_id, customer_phone, customer_name, status)
+            VALUES (NEW.id, NEW.order_id, NEW.customer_phone, NEW.customer_name, NEW.status);
+        END;
+        CREATE TRIGGER trg_orders_search_delete AFTER DELETE ON orders BEGIN
+            INSERT INTO order_search (order_search, rowid, order_id, customer_phone, customer_name, status)
+            VALUES ('delete', OLD.id, OLD.order_id, OLD.customer_phone, OLD.customer_name, OLD.status);
+        END;
+        CREATE TRIGGER trg_orders_search_update AFTER UPDATE OF order_id, customer_phone, customer_name, status
+        ON orders BEGIN
+            INSERT INTO order_search (order_search, rowid, order_id, customer_phone, customer_name, status)
+            VALUES ('delete', OLD.id, OLD.order_id, OLD.customer_phone, OLD.customer_name, OLD.status);
+            INSERT INTO order_search (rowid, order_id, customer_phone, customer_name, status)
+            VALUES (NEW.id, NEW.order_id, NEW.customer_phone, NEW.customer_name, NEW.status);
+        END;
+        INSERT INTO order_search (order_search) VALUES ('rebuild');
+    """
+
+    def _create_search_index(self, conn: sqlite3.Connection) -> bool:
+        """Create the search index (and index existing orders) the first time; False if FTS5 is unavailable."""
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'order_search'").fetchone():
+            return True
+        try:
+            conn.executescript("BEGIN IMMEDIATE;" + self.SEARCH_SCHEMA + "COMMIT;")
+            return True
+        except sqlite3.OperationalError as e:
+            conn.rollback()
+            logger.warning(f"Order search index unavailable, searches will scan: {e}")
+            return False
+
+    def reconcile_totals(self) -> bool:
+        """Recount ``order_status_totals`` from the orders table; returns whether they had drifted."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            actual = {
+                status: (count, amount)
+                for status, count, amount in conn.execute(
+                    "SELECT status, COUNT(*), COALESCE(SUM(total_amount), 0) FROM orders GROUP BY status"
+                )
+            }
+            stored = {
+                status: (count, amount)
+                for status, count, amount in conn.execute(
+                    "SELECT status, count, amount FROM order_status_totals WHERE count != 0"
+                )
+            }
+            drifted = actual.keys() != stored.keys() or any(
+                stored[status][0] != count or abs(stored[status][1] - amount) > 0.005
+                for status, (count, amount) in actual.items()
+            )
+            # Rewritten even when in step, which also clears rounding left by running sums
+            conn.execute("DELETE FROM order_status_totals")
+            conn.executemany(
+                "INSERT INTO order_status_totals (status, count, amount) VALUES (?, ?, ?)",
+                [(status, count, amount) for status, (count, amount) in actual.items()],
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        if drifted:
+            logger.warning(f"Order status totals were out of step with {self.db_path}; recounted")
+        return drifted
+
+    def _conn(self) -> sqlite3.Connection:
+        """One connection per thread; WAL lets admin reads run while an order is being written."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def rebuild_line_items(self) -> int:
+        """Regenerate ``order_items`` from every order's products_json."""
+        conn = self._conn()
+        with conn:
+            conn.execute("DELETE FROM order_items")
+            items = []
+            for order_id, ts, products_json in conn.execute("SELECT order_id, ts, products_json FROM orders"):
+                items.extend(self._line_items(order_id, ts, products_json))
+            conn.executemany(self._INSERT_ITEM, items)
+        logger.info(f"Rebuilt {len(items)} order line items in {self.db_path}")
+        return len(items)
+
+    def rebuild_daily_totals(self) -> int:
+        """Recount ``order_daily_totals`` (orders, completed orders and revenue per day) from the orders table."""
+        conn = self._conn()
+        with conn:
+            conn.execute("DELETE FROM order_daily_totals")
+            conn.execute(
+                "INSERT INTO order_daily_totals (day, orders, completed, revenue) "
+                "SELECT ts / 86400, COUNT(*), SUM(status = 'COMPLETED'), "
+                "COALESCE(SUM(CASE WHEN status = 'COMPLETED' THEN total_amount END), 0) "
+                "FROM orders GROUP BY ts / 86400"
+            )
+            days = conn.execute("SELECT COUNT(*) FROM order_daily_totals").fetchone()[0]
+        logger.info(f"Rebuilt daily order totals for {days} days in {self.db_path}")
+        return days
+
+    def backfill_order_events(self) -> int:
+        """Give orders that have no event history a creation event in their current status."""
+        conn = self._conn()
+        with conn:
+            added = conn.execute(
+                "INSERT INTO order_events (order_id, ts, actor, old_status, new_status, note) "
+                "SELECT order_id, ts, customer_phone, NULL, status, NULL FROM orders "
+                "WHERE NOT EXISTS (SELECT 1 FROM order_events e WHERE e.order_id = orders.order_id) ORDER BY id"
+            ).rowcount
+        if added:
+            logger.info(f"Added creation events for {added} orders in {self.db_path}")
+        return added
+
+    @staticmethod
+    def _line_items(order_id: str, ts: int, products_json: Any) -> List[tuple]:
+        """``order_items`` rows for one order, from the product list stored with it."""
+        if not products_json:
+            return []
+        try:
+            products = json.loads(products_json) if isinstance(products_json, str) else products_json
+        except ValueError as e:
+            logger.warning(f"Unreadable products for order {order_id}: {e}")
+            return []
+        items = []
+        for product in products if isinstance(products, list) else []:
+            if not isinstance(product, dict):
+                continue
+            try:
+                quantity = int(product.get("quantity") or 1)
+                unit_price = float(product.get("price") or 0)
+                item_total = float(product.get("item_total") if product.get("item_total") is not None
+                                   else unit_price * quantity)
+            except (TypeError, ValueError):
+                logger.warning(f"Skipping malformed product in order {order_id}: {product}")
+                continue
+            items.append((order_id, ts, product.get("retailer_id"), product.get("title"),
+                          quantity, unit_price, item_total))
+        return items
+
+    def allocate_worker_id(self) -> int:
+        """Hand out the next order-ID worker id; every process that opens the store takes its own."""
+        conn = self._conn()
+        with conn:
+            conn.execute("INSERT OR IGNORE INTO store_meta (key, value) VALUES ('next_worker_id', '0')")
+            conn.execute("UPDATE store_meta SET value = CAST(value AS INTEGER) + 1 WHERE key = 'next_worker_id'")
+            taken = int(conn.execute("SELECT value FROM store_meta WHERE key = 'next_worker_id'").fetchone()[0])
+        return (taken - 1) % MAX_WORKERS
+
+    @staticmethod
+    def _to_db(row: list) -> tuple:
+        row = list(row) + [""] * (len(ORDER_HEADERS) - len(row))
+        timestamp = parse_timestamp(row[1]) or datetime.now()
+        try:
+            amount = float(row[5] or 0)
+        except (TypeError, ValueError):
+            amount = 0.0
+        phone = str(row[2]) if row[2] is not None else None
+        return (str(row[0]), to_epoch(timestamp), phone, row[3], row[4], amount,
+                row[6] or "USD", row[7] or "NEW", *row[8:16])
+
+    @staticmethod
+    def _from_db(row: tuple) -> tuple:
+        return (row[0], from_epoch(row[1]).strftime(TIMESTAMP_FORMAT)) + row[2:]
+
+    def insert(self, row: list):
+        """Insert one order and its line items; raises ``sqlite3.IntegrityError`` if its order_id exists."""
+        record = self._to_db(row)
+        conn = self._conn()
+        with conn:
+            conn.execute(self._INSERT_ORDER.format(conflict=""), record)
+            conn.executemany(self._INSERT_ITEM, self._line_items(record[0], record[1], record[10]))
+
+    def insert_many(self, rows: Iterable[list]) -> int:
+        """Bulk insert for imports; orders whose order_id already exists are skipped."""
+        records = [self._to_db(row) for row in rows if row and row[0]]
+        conn = self._conn()
+        inserted = 0
+        with conn:
+            for record in records:
+                if conn.execute(self._INSERT_ORDER.format(conflict="OR IGNORE "), record).rowcount:
+                    conn.executemany(self._INSERT_ITEM, self._line_items(record[0], record[1], record[10]))
+                    inserted += 1
+        return inserted
+
+    def update_status(self, order_id: str, status: str, note: str = "", processed_by: str = "",
+                      processing_timestamp: str = "", expected_status: Optional[str] = None,
+                      at: datetime = None) -> Optional[str]:
+        """Set an order's status and append an ``order_events`` row with ``note``.
+
+        With ``expected_status`` the order only changes if it is still in that
+        status. Returns the status the order had before, or None if it was
+        not updated.
+        """
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT status FROM orders WHERE order_id = ?", (order_id,)).fetchone()
+            old_status = row[0] if row and expected_status in (None, row[0]) else None
+            if old_status is not None:
+                self._update_status(conn, order_id, old_status, status, note, processed_by,
+                                    processing_timestamp, at)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        return old_status
+
+    @staticmethod
+    def _update_status(conn: sqlite3.Connection, order_id: str, old_status: str, status: str, note: str,
+                       processed_by: str, processing_timestamp: str, at: Optional[datetime]):
+        """Apply a status change inside the caller's write transaction: one UPDATE and one event append."""
+        conn.execute(
+            "UPDATE orders SET status = ?, "
+            "processed_by = CASE WHEN ? = '' THEN processed_by ELSE ? END, "
+            "processing_timestamp = CASE WHEN ? = '' THEN processing_timestamp ELSE ? END "
+            "WHERE order_id = ?",
+            (status, processed_by, processed_by, processing_timestamp, processing_timestamp, order_id),
+        )
+        conn.execute(
+            "INSERT INTO order_events (order_id, ts, actor, old_status, new_status, note) VALUES (?, ?, ?, ?, ?, ?)",
+            (order_id, to_epoch(at or datetime.now()), processed_by or None, old_status, status, note),
+        )
+
+    def claim_next(self, from_status: str, to_status: str, note: str = "", processed_by: str = "",
+                   processing_timestamp: str = "", at: datetime = None) -> Optional[str]:
+        """Move the oldest order in ``from_status`` to ``to_status`` and return its ID.
+
+        The head of the status queue is one seek on ``idx_orders_status_queue``;
+        the write lock is taken before reading it, so concurrent callers
+        always get different orders.
+        """
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT order_id FROM orders WHERE status = ? ORDER BY order_id LIMIT 1", (from_status,)
+            ).fetchone()
+            if row:
+                self._update_status(conn, row[0], from_status, to_status, note, processed_by,
+                                    processing_timestamp, at)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        return row[0] if row else None
+
+    def get(self, order_id: str) -> Optional[tuple]:
+        row = self._conn().execute(self._SELECT + " WHERE order_id = ?", (order_id,)).fetchone()
+        return self._from_db(row) if row else None
+
+    def events(self, order_id: str) -> List[tuple]:
+        """``(timestamp, actor, old_status, new_status, note)`` for each event of an order, oldest first."""
+        return [
+            (from_epoch(ts).strftime(TIMESTAMP_FORMAT), actor, old_status, new_status, note)
+            for ts, actor, old_status, new_status, note in self._conn().execute(
+                "SELECT ts, actor, old_status, new_status, note FROM order_events WHERE order_id = ? ORDER BY id",
+                (order_id,),
+            )
+        ]
+
+    def transition_totals(self) -> List[tuple]:
+        """``(old_status, new_status, count, seconds)`` per status transition; ``seconds`` is the total
+        time orders spent in ``old_status`` before moving to ``new_status``."""
+        return self._conn().execute(
+            "SELECT old_status, new_status, count, seconds FROM order_transition_totals ORDER BY count DESC"
+        ).fetchall()
+
+    def status_of(self, order_id: str) -> Optional[str]:
+        row = self._conn().execute("SELECT status FROM orders WHERE order_id = ?", (order_id,)).fetchone()
+        return row[0] if row else None
+
+    def iter_rows(self, status: Optional[str] = None, start: datetime = None,
+                  end: datetime = None) -> Iterator[tuple]:
+        """Orders oldest first, optionally only those in ``status``.
+
+        ``start`` / ``end`` bound the order time and are answered as a range
+        scan over the order_id index, since order IDs begin with their timestamp.
+        """
+        clauses, params = [], []
+        if status:
+            clauses.append("status = ?")
+            params.append(status)
+        if start:
+            clauses.append("order_id >= ?")
+            params.append(id_bound(start))
+        if end:
+            clauses.append("order_id < ?")
+            params.append(id_bound(end))
+        sql = self._SELECT
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY order_id"
+        for row in self._conn().execute(sql, params):
+            yield self._from_db(row)
+
+    def recent(self, limit: int) -> List[tuple]:
+        """The newest ``limit`` orders, newest first, read backwards off the order_id index."""
+        rows = self._conn().execute(self._SELECT + " ORDER BY order_id DESC LIMIT ?", (max(0, limit),)).fetchall()
+        return [self._from_db(row) for row in rows]
+
+    def queue(self, status: str, limit: int, newest_first: bool = False) -> List[tuple]:
+        """The oldest (or newest) ``limit`` orders in ``status``; reads only those rows off the status index."""
+        direction = "DESC" if newest_first else "ASC"
+        rows = self._conn().execute(
+            self._SELECT + f" WHERE status = ? ORDER BY order_id {direction} LIMIT ?", (status, max(0, limit))
+        ).fetchall()
+        return [self._from_db(row) for row in rows]
+
+    def search(self, query: str, columns: List[str] = None, limit: int = 50) -> List[tuple]:
+        """Orders whose ``columns`` (default all of ``SEARCH_COLUMNS``) contain ``query``, newest first.
+
+        Queries of ``MIN_SEARCH_LENGTH`` characters or more are answered from
+        the trigram index; shorter ones fall back to a LIKE scan.
+        """
+        columns = [column for column in (columns or SEARCH_COLUMNS) if column in SEARCH_COLUMNS]
+        query = query.strip()
+        if not query or not columns:
+            return []
+        conn = self._conn()
+        if self.search_indexed and len(query) >= MIN_SEARCH_LENGTH:
+            match = "{" + " ".join(columns) + "} : \"" + query.replace('"', '""') + "\""
+            rows = conn.execute(
+                self._SELECT + " WHERE id IN (SELECT rowid FROM order_search WHERE order_search MATCH ? "
+                "ORDER BY rowid DESC LIMIT ?) ORDER BY id DESC",
+                (match, max(0, limit)),
+            ).fetchall()
+        else:
+            pattern = "%" + query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+            where = " OR ".join(f"{column} LIKE ? ESCAPE '\\'" for column in columns)
+            rows = conn.execute(
+                self._SELECT + f" WHERE {where} ORDER BY id DESC LIMIT ?",
+                [pattern] * len(columns) + [max(0, limit)],
+            ).fetchall()
+        return [self._from_db(row) for row in rows]
+
+    def product_sales(self, start: datetime = None, end: datetime = None, statuses: List[str] = None,
+                      limit: int = None, order_by: str = "revenue") -> List[Dict[str, Any]]:
+        """Units, revenue and order count per retailer_id in one grouped query over ``order_items``.
+
+        ``start`` / ``end`` bound the order time (``idx_order_items_ts``);
+        ``statuses`` keeps only items of orders currently in those statuses.
+        """
+        clauses, params = [], []
+        if start:
+            clauses.append("i.ts >= ?")
+            params.append(to_epoch(start))
+        if end:
+            clauses.append("i.ts < ?")
+            params.append(to_epoch(end))
+        join = ""
+        if statuses:
+            join = " JOIN orders o ON o.order_id = i.order_id"
+            clauses.append("o.status IN (" + ", ".join("?" for _ in statuses) + ")")
+            params.extend(statuses)
+        sql = (
+            "SELECT i.retailer_id, MAX(i.title), SUM(i.quantity), SUM(i.item_total), COUNT(DISTINCT i.order_id) "
+            "FROM order_items i" + join
+        )
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " GROUP BY i.retailer_id ORDER BY " + ("SUM(i.quantity)" if order_by == "units" else "SUM(i.item_total)")
+        sql += " DESC, i.retailer_id"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return [
+            {"retailer_id": retailer_id, "title": title, "units": units, "revenue": revenue, "orders": orders}
+            for retailer_id, title, units, revenue, orders in self._conn().execute(sql, params)
+        ]
+
+    def revision(self) -> int:
+        """Counter bumped by every order insert, update and delete, in any process."""
+        row = self._conn().execute("SELECT value FROM store_meta WHERE key = 'revision'").fetchone()
+        return int(row[0]) if row else 0
+
+    def analytics_rows(self, after_id: int = 0) -> tuple:
+        """Columnar ``(orders, items)`` DataFrames for orders with row id above ``after_id``.
+
+        ``orders`` has id, ts, order_type and total_amount; ``items`` has the
+        order's row id, ts, retailer_id, title, quantity and item_total. Only
+        columns that never change after insert are included, so a snapshot
+        can be extended with new orders instead of being reloaded.
+        """
+        conn = self._conn()
+        orders = pd.DataFrame.from_records(
+            conn.execute("SELECT id, ts, order_type, total_amount FROM orders WHERE id > ? ORDER BY id",
+                         (after_id,)).fetchall(),
+            columns=["id", "ts", "order_type", "total_amount"],
+        ).astype({"id": "int64", "ts": "int64", "total_amount": "float64"})
+        items = pd.DataFrame.from_records(
+            conn.execute(
+                "SELECT o.id, i.ts, i.retailer_id, i.title, i.quantity, i.item_total "
+                "FROM orders o JOIN order_items i ON i.order_id = o.order_id WHERE o.id > ?",
+                (after_id,),
+            ).fetchall(),
+            columns=["order_row", "ts", "retailer_id", "title", "quantity", "item_total"],
+        ).astype({"order_row": "int64", "ts": "int64", "quantity": "int64", "item_total": "float64"})
+        # Fixed dtypes: an empty first load would otherwise leave object columns that later batches inherit
+        return orders, items
+
+    def row_ids(self, status: str) -> List[int]:
+        """Row ids of the orders currently in ``status``, from the status index."""
+        return [row[0] for row in self._conn().execute("SELECT id FROM orders WHERE status = ?", (status,))]
+
+    def count(self, status: Optional[str] = None) -> int:
+        if status:
+            row = self._conn().execute("SELECT count FROM order_status_totals WHERE status = ?", (status,)).fetchone()
+            return row[0] if row else 0
+        return self._conn().execute("SELECT COALESCE(SUM(count), 0) FROM order_status_totals").fetchone()[0]
+
+    def status_totals(self) -> Dict[str, Dict[str, Any]]:
+        """``status -> {"count", "amount"}``, read from the trigger-maintained totals (one row per status)."""
+        totals = {}
+        for status, count, amount in self._conn().execute(
+            "SELECT status, count, amount FROM order_status_totals WHERE count != 0"
+        ):
+            totals[status] = {"count": count, "amount": amount}
+        return totals
+
+    def daily_totals(self) -> List[tuple]:
+        """``(day, orders, completed, revenue)`` per day with orders, oldest first; ``day`` is ``ts // 86400``."""
+        return self._conn().execute(
+            "SELECT day, orders, completed, revenue FROM order_daily_totals WHERE orders != 0 ORDER BY day"
+        ).fetchall()
+
+    def is_empty(self) -> bool:
+        return self._conn().execute("SELECT 1 FROM orders LIMIT 1").fetchone() is None
+
+
+def read_order_workbook(path: str) -> List[list]:
+    """Rows of an orders.xlsx written by earlier versions, for importing into the store."""
+    rows = []
+    if not os.path.exists(path):
+        return rows
+    wb = load_workbook(path, read_only=True)
+    try:
+        for row in wb.active.iter_rows(min_row=2, values_only=True):
+            if row and row[0]:
+                rows.append(list(row))
+    finally:
+        wb.close()
+    return rows
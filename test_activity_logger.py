@@ -0,0 +1,639 @@
+#!/usr/bin/env python3
+"""
+Tests for the ActivityLogger storage paths.
+Each test works on a throwaway directory so the real activity log is never touched.
+"""
+
+import os
+import gzip
+import json
+import asyncio
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+from openpyxl import Workbook, load_workbook
+
+from activity_logger import ActivityLogger, _current_batch
+from activity_archive import ActivityArchive
+from export_formats import FORMAT_LABELS, available_formats, export_filename
+from journal import Journal
+from activity_store import (
+    ActivityRecord, ActivityStore, ExcelActivityStore, PartitionedExcelActivityStore, SQLiteActivityStore,
+)
+
+
+def _row_count(path):
+    wb = load_workbook(path, read_only=True)
+    return sum(1 for _ in wb.active.iter_rows(min_row=2, values_only=True))
+
+
+def test_log_activity_is_buffered_until_flush():
+    """Activities are queued in memory and written in one batch on flush"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "activity_log.xlsx")
+        log = ActivityLogger(path, flush_max_events=1000, flush_interval=60)
+        try:
+            for i in range(5):
+                log.log_activity(phone_number=f"26377000000{i}", activity_type="message_received")
+            assert _row_count(path) == 0
+            assert log.flush() == 5
+            assert _row_count(path) == 5
+            assert log.flush() == 0
+        finally:
+            log.close()
+
+
+def test_batch_size_threshold_triggers_background_flush():
+    """Reaching the size threshold wakes the background flusher"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "activity_log.xlsx")
+        log = ActivityLogger(path, flush_max_events=3, flush_interval=60)
+        try:
+            for i in range(3):
+                log.log_activity(phone_number="263770000000", activity_type="button_clicked")
+            for _ in range(50):
+                if log._writer.pending_count() == 0 and _row_count(path) == 3:
+                    break
+                time.sleep(0.1)
+            assert _row_count(path) == 3
+        finally:
+            log.close()
+
+
+def test_close_flushes_pending_activities():
+    """Closing the logger commits whatever is still queued"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "activity_log.xlsx")
+        log = ActivityLogger(path, flush_max_events=1000, flush_interval=60)
+        log.log_activity(phone_number="263770000000", activity_type="welcome_message")
+        log.close()
+        assert _row_count(path) == 1
+
+
+def test_workers_sharing_a_store_keep_separate_journals():
+    """A second worker neither replays nor trims the first worker's uncommitted entries"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "activity_log.db")
+        first = ActivityLogger(path, flush_max_events=1000, flush_interval=60)
+        second = None
+        try:
+            for _ in range(3):
+                first.log_activity(phone_number="263770000001", activity_type="message_received")
+            second = ActivityLogger(path, flush_max_events=1000, flush_interval=60)
+            assert second.journal_path != first.journal_path
+            second.log_activity(phone_number="263770000002", activity_type="message_received")
+            assert second.flush() == 1
+            assert len(Journal(first.journal_path).read()) == 3
+        finally:
+            first.close()
+            if second:
+                second.close()
+        assert not [name for name in os.listdir(tmp) if ".journal" in name]
+
+        reopened = ActivityLogger(path)
+        try:
+            assert reopened.get_user_activity_count("263770000001") == 3
+            assert reopened.get_user_activity_count("263770000002") == 1
+        finally:
+            reopened.close()
+
+
+def test_journal_of_exited_worker_is_adopted_once():
+    """Entries left by a worker that died before committing are committed by the next one to start"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "activity_log.db")
+        for name in ("activity_log.journal.jsonl", "activity_log.journal.99999-0.jsonl"):
+            stale = Journal(os.path.join(tmp, name))
+            stale.append(_activity_row("2025-09-01 09:00:00"))
+            stale.close()
+
+        log = ActivityLogger(path, flush_max_events=1000, flush_interval=60)
+        try:
+            assert log.flush() == 2
+            own = os.path.basename(log.journal_path)
+            assert sorted(name for name in os.listdir(tmp) if ".journal" in name) == [own, own + ".lock"]
+        finally:
+            log.close()
+        reopened = ActivityLogger(path)
+        try:
+            assert reopened.get_user_activity_count("263770000001") == 2
+        finally:
+            reopened.close()
+
+
+def test_batch_replayed_after_crash_before_journal_trim_is_skipped():
+    """A batch committed just before a crash is still journaled, but its keys stop it counting twice"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "activity_log.db")
+        log = ActivityLogger(path, flush_max_events=1000, flush_interval=60)
+        log._writer.journal.discard_through = lambda mark: None
+        log.log_activity(phone_number="263770000001", activity_type="button_clicked")
+        assert log.flush() == 1
+        log.close()
+        assert os.path.getsize(log.journal_path) > 0
+
+        reopened = ActivityLogger(path, flush_max_events=1000, flush_interval=60)
+        try:
+            assert reopened.flush() == 1
+            assert reopened.get_user_activity_count("263770000001") == 1
+            assert reopened.store.summarize()["total"] == 1
+        finally:
+            reopened.close()
+
+
+def test_sqlite_store_answers_dashboard_queries():
+    """The SQLite backend serves the same analytics API as the spreadsheet"""
+    with tempfile.TemporaryDirectory() as tmp:
+        log = ActivityLogger(os.path.join(tmp, "activity_log.db"), flush_max_events=1000, flush_interval=60)
+        try:
+            log.log_activity(phone_number="263770000001", activity_type="message_received", session_id="s1")
+            log.log_activity(phone_number="263770000001", activity_type="button_clicked", session_id="s1")
+            log.log_activity(phone_number="263770000002", activity_type="admin_command", admin_flag=True, session_id="s2")
+
+            summary = log.get_analytics_summary(7)
+            assert summary["total_activities"] == 3
+            assert summary["unique_users"] == 2
+            assert summary["admin_activities"] == 1
+            assert summary["total_sessions"] == 2
+
+            conversations = log.get_conversation_analytics()
+            assert conversations["total_conversations"] == 2
+            assert conversations["user_engagement"]["263770000001"]["total_activities"] == 2
+
+            assert log.get_user_activity_count("263770000001") == 2
+            recent = log.get_recent_activities(2)
+            assert [a["activity_type"] for a in recent] == ["admin_command", "button_clicked"]
+            assert recent[0]["admin_flag"] is True
+        finally:
+            log.close()
+
+
+def test_legacy_workbook_is_imported_into_new_store():
+    """An existing activity_log.xlsx is copied into a freshly created database once"""
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_path = os.path.join(tmp, "activity_log.xlsx")
+        legacy = ActivityLogger(legacy_path)
+        legacy.log_activity(phone_number="263770000001", activity_type="message_received")
+        legacy.close()
+
+        db_path = os.path.join(tmp, "activity_log.db")
+        log = ActivityLogger(db_path, legacy_file=legacy_path)
+        log.close()
+        log = ActivityLogger(db_path, legacy_file=legacy_path)
+        try:
+            assert log.get_user_activity_count("263770000001") == 1
+        finally:
+            log.close()
+
+
+def test_legacy_workbook_is_not_reimported_after_retention_empties_store():
+    """Archiving every imported row must not make the next start import the workbook again"""
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_path = os.path.join(tmp, "activity_log.xlsx")
+        legacy = ActivityLogger(legacy_path)
+        legacy.log_activity(phone_number="263770000001", activity_type="message_received")
+        legacy.close()
+
+        db_path = os.path.join(tmp, "activity_log.db")
+        log = ActivityLogger(db_path, legacy_file=legacy_path)
+        assert log.store.expire(log.archive, keep_rows=0) == 1
+        log.close()
+        log = ActivityLogger(db_path, legacy_file=legacy_path)
+        try:
+            assert log.store.is_empty()
+            assert log.store.summarize()["total"] == 1
+            assert len(list(log.archive.iter_rows())) == 1
+        finally:
+            log.close()
+
+
+def test_export_filtered_data_writes_xlsx_from_store():
+    """Exports stay .xlsx even when the live store is SQLite"""
+    with tempfile.TemporaryDirectory() as tmp:
+        log = ActivityLogger(os.path.join(tmp, "activity_log.db"))
+        try:
+            log.log_activity(phone_number="263770000001", activity_type="message_received")
+            log.log_activity(phone_number="263770000002", activity_type="admin_command", admin_flag=True)
+            output = os.path.join(tmp, "export.xlsx")
+            assert log.export_filtered_data(admin_only=True, output_file=output)
+            assert _row_count(output) == 1
+            assert log.export_filtered_data(activity_types=["message_received"], output_file=output)
+            ws = load_workbook(output).active
+            assert ws["A1"].value == "timestamp" and ws["A1"].font.bold
+            assert [row[3] for row in ws.iter_rows(min_row=2, values_only=True)] == ["message_received"]
+        finally:
+            log.close()
+
+
+def test_export_streams_compressed_formats():
+    """gzip CSV / JSONL (and Parquet when pyarrow is installed) carry the same rows plus a summary"""
+    with tempfile.TemporaryDirectory() as tmp:
+        log = ActivityLogger(os.path.join(tmp, "activity_log.db"))
+        try:
+            log.log_activity(phone_number="263770000001", activity_type="message_received")
+            log.log_activity(phone_number="263770000002", activity_type="admin_command", admin_flag=True)
+            for fmt in available_formats():
+                output = export_filename(os.path.join(tmp, "export"), fmt)
+                assert log.export_filtered_data(admin_only=True, output_file=output, output_format=fmt)
+                if fmt == "csv.gz":
+                    with gzip.open(output, "rt") as f:
+                        assert [line.split(",")[3] for line in f.read().splitlines()] == ["activity_type", "admin_command"]
+                elif fmt == "jsonl.gz":
+                    with gzip.open(output, "rt") as f:
+                        assert [json.loads(line)["admin_flag"] for line in f] == [True]
+                elif fmt == "parquet":
+                    import pyarrow.parquet as pq
+                    assert pq.read_table(output).column("phone_number").to_pylist() == ["263770000002"]
+                if fmt != "xlsx":
+                    with open(output + ".summary.json") as f:
+                        assert json.load(f)["Format"] == FORMAT_LABELS[fmt]
+        finally:
+            log.close()
+
+
+def test_batch_commits_webhook_activities_in_one_write():
+    """Activities logged inside batch() reach the store in a single append"""
+    with tempfile.TemporaryDirectory() as tmp:
+        log = ActivityLogger(os.path.join(tmp, "activity_log.db"), flush_max_events=1000, flush_interval=60)
+        writes = []
+        append_many = log.store.append_many
+        log.store.append_many = lambda rows, keys=None: (writes.append(len(rows)), append_many(rows, keys=keys))
+        try:
+            with log.batch():
+                log.log_activity(phone_number="263770000001", activity_type="button_clicked")
+                with log.batch():
+                    log.log_activity(phone_number="263770000001", activity_type="browse_laptops")
+                assert log._writer.pending_count() == 0
+            assert log._writer.pending_count() == 2
+
+            log.flush()
+            assert writes == [2]
+            assert log.get_user_activity_count("263770000001") == 2
+        finally:
+            log.close()
+
+
+def test_concurrent_tasks_get_separate_batches():
+    """Each asyncio task handling a webhook collects its own activities"""
+    with tempfile.TemporaryDirectory() as tmp:
+        log = ActivityLogger(os.path.join(tmp, "activity_log.db"), flush_max_events=1000, flush_interval=60)
+        sizes = []
+
+        async def handle(phone, events):
+            with log.batch():
+                for _ in range(events):
+                    log.log_activity(phone_number=phone, activity_type="message_received")
+                    await asyncio.sleep(0)
+                sizes.append(len(_current_batch.get().rows))
+
+        async def main():
+            await asyncio.gather(handle("263770000001", 2), handle("263770000002", 3))
+
+        try:
+            asyncio.run(main())
+            assert sorted(sizes) == [2, 3]
+            assert log.get_user_activity_count("263770000002") == 3
+        finally:
+            log.close()
+
+
+def test_alog_activity_joins_async_batch():
+    """Awaitable logging runs off the event loop but still joins the webhook batch"""
+    with tempfile.TemporaryDirectory() as tmp:
+        log = ActivityLogger(os.path.join(tmp, "activity_log.db"), flush_max_events=1000, flush_interval=60)
+
+        async def handle():
+            async with log.abatch():
+                await log.alog_activity(phone_number="263770000001", activity_type="button_clicked")
+                await log.alog_activity(phone_number="263770000001", activity_type="browse_laptops")
+                assert len(_current_batch.get().rows) == 2
+                assert log._writer.pending_count() == 0
+            assert log._writer.pending_count() == 2
+            await log.alog_activity(phone_number="263770000001", activity_type="welcome_message")
+
+        try:
+            asyncio.run(handle())
+            assert log.get_user_activity_count("263770000001") == 3
+        finally:
+            log.close()
+
+
+def test_running_retention_does_not_delay_webhook_batches():
+    """A slow archive run stays on the retention thread instead of queueing ahead of alog_activity"""
+    with tempfile.TemporaryDirectory() as tmp:
+        log = ActivityLogger(os.path.join(tmp, "activity_log.db"), retention_max_rows=1, flush_interval=60)
+        release = threading.Event()
+        log.store.expire = lambda *args, **kwargs: release.wait(10) and 0
+
+        async def handle():
+            async with log.abatch():
+                await log.alog_activity(phone_number="263770000001", activity_type="button_clicked")
+            log._writer.flush()
+            started = time.monotonic()
+            async with log.abatch():
+                await log.alog_activity(phone_number="263770000001", activity_type="browse_laptops")
+            return time.monotonic() - started
+
+        try:
+            assert asyncio.run(handle()) < 5
+            assert not log._retention_run.done()
+        finally:
+            release.set()
+            log.close()
+
+
+def test_sqlite_readers_do_not_wait_for_running_retention():
+    """SQLite serializes writers per chunk itself, so a flush and summary proceed during an archive run"""
+    with tempfile.TemporaryDirectory() as tmp:
+        log = ActivityLogger(os.path.join(tmp, "activity_log.db"), retention_max_rows=1, flush_interval=60)
+        started, release = threading.Event(), threading.Event()
+
+        def slow_expire(*args, **kwargs):
+            started.set()
+            release.wait(10)
+            return 0
+
+        log.store.expire = slow_expire
+        retention = threading.Thread(target=log.apply_retention)
+        try:
+            retention.start()
+            assert started.wait(5)
+            log.log_activity(phone_number="263770000001", activity_type="button_clicked")
+            begin = time.monotonic()
+            assert log.get_analytics_summary(7)["total_activities"] == 1
+            assert time.monotonic() - begin < 5
+        finally:
+            release.set()
+            retention.join()
+            log.close()
+
+
+def test_recent_activities_come_from_ring_buffer():
+    """Recent activities are served from memory and survive a restart"""
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "activity_log.db")
+        log = ActivityLogger(db_path, flush_max_events=1000, flush_interval=60, recent_buffer_size=3)
+        for i in range(5):
+            log.log_activity(phone_number=f"26377000000{i}", activity_type="message_received")
+        tail = log.store.tail
+        log.store.tail = lambda limit: (_ for _ in ()).throw(AssertionError("store read"))
+        try:
+            recent = log.get_recent_activities(2)
+            assert [a["phone_number"] for a in recent] == ["263770000004", "263770000003"]
+            assert log._writer.pending_count() == 5
+        finally:
+            log.store.tail = tail
+        assert len(log.get_recent_activities(4)) == 4
+        log.close()
+
+        log = ActivityLogger(db_path, recent_buffer_size=3)
+        try:
+            assert [a["phone_number"] for a in log.get_recent_activities(3)] == [
+                "263770000004", "263770000003", "263770000002"
+            ]
+        finally:
+            log.close()
+
+
+def _activity_row(timestamp, phone="263770000001", activity_type="message_received"):
+    return [timestamp, phone, "Test", activity_type, "text", None, None, None, False, "s1", None]
+
+
+def test_activity_record_round_trips_rows():
+    """Records keep epoch seconds and shared type codes but convert back to the stored row"""
+    row = _activity_row("2025-09-01 09:05:00", activity_type="button_clicked")
+    record = ActivityRecord.from_row(row)
+    assert record.ts == 1756717500
+    assert record.type_code == ActivityRecord.from_row(_activity_row("2025-09-02 10:00:00", activity_type="button_clicked")).type_code
+    assert record.activity_type == "button_clicked"
+    assert record.to_row() == row
+    assert not hasattr(record, "__dict__")
+
+
+def test_retention_moves_old_rows_to_archive_and_exports_still_see_them():
+    """Rows past retention leave the live table but exports reaching back read the archive"""
+    with tempfile.TemporaryDirectory() as tmp:
+        log = ActivityLogger(os.path.join(tmp, "activity_log.db"), retention_days=30, retention_max_rows=3)
+        try:
+            log.store.append_many([
+                _activity_row("2025-07-10 10:00:00"),
+                _activity_row("2025-08-20 10:00:00"),
+            ] + [_activity_row(datetime.now().strftime("%Y-%m-%d %H:%M:%S")) for _ in range(4)])
+            assert log.apply_retention() == 3
+            assert log.store.count_for_phone("263770000001") == 6  # lifetime aggregate
+            assert sum(1 for _ in log.store.iter_rows()) == 3
+            assert sorted(log.archive.months()) == ["2025-07", "2025-08", datetime.now().strftime("%Y-%m")]
+            assert log.apply_retention() == 0
+
+            output = os.path.join(tmp, "export.xlsx")
+            assert log.export_filtered_data(start_date="2025-07-01", end_date="2025-07-31", output_file=output)
+            assert _row_count(output) == 1
+            assert log.export_filtered_data(output_file=output)
+            assert _row_count(output) == 6
+        finally:
+            log.close()
+
+
+def test_archive_checkpoint_prevents_double_archiving():
+    """Rows archived before a crash are deleted, not archived again, on the next run"""
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SQLiteActivityStore(os.path.join(tmp, "activity_log.db"))
+        archive = ActivityArchive(os.path.join(tmp, "archive"))
+        store.append_many([_activity_row(f"2025-07-0{i} 10:00:00") for i in range(1, 5)])
+        # Simulate a crash after the first two rows reached the archive but before they were deleted
+        archive.append_many([list(row) for row in store.tail(4)[:1:-1]], checkpoint={"store": store.store_id, "id": 2})
+
+        assert store.expire(archive, before=datetime(2025, 7, 4)) == 3
+        assert [row[0][:10] for row in archive.iter_rows()] == ["2025-07-01", "2025-07-02", "2025-07-03"]
+        assert [row[0][:10] for row in store.iter_rows()] == ["2025-07-04"]
+
+
+def test_excel_store_retention_rewrites_workbook():
+    """The single-workbook store keeps only the newest rows after expiry"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "activity_log.xlsx")
+        log = ActivityLogger(path, retention_days=0, retention_max_rows=2)
+        try:
+            log.store.append_many([_activity_row(f"2025-07-0{i} 10:00:00") for i in range(1, 6)])
+            assert log.apply_retention() == 3
+            assert _row_count(path) == 2
+            assert log.archive.months()["2025-07"]["rows"] == 3
+        finally:
+            log.close()
+
+
+def test_excel_store_keeps_previous_workbook_when_save_fails():
+    """A save killed half way leaves the last complete workbook in place"""
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ExcelActivityStore(os.path.join(tmp, "activity_log.xlsx"))
+        store.append_many([_activity_row("2025-09-01 09:00:00")])
+
+        def torn_save(wb, filename):
+            with open(filename, "wb") as f:
+                f.write(b"PK\x03\x04")
+            raise OSError("killed during save")
+
+        save = Workbook.save
+        Workbook.save = torn_save
+        try:
+            store.append_many([_activity_row("2025-09-01 09:01:00")])
+        except OSError:
+            pass
+        finally:
+            Workbook.save = save
+        assert [row[0] for row in store.iter_rows()] == ["2025-09-01 09:00:00"]
+
+
+def test_partitioned_store_prunes_by_manifest():
+    """Monthly partitions are recorded in a manifest and skipped outside the window"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "activity_log.xlsx")
+        store = PartitionedExcelActivityStore(path, "month")
+        store.append_many([
+            _activity_row("2025-08-15 10:00:00"),
+            _activity_row("2025-09-01 09:00:00"),
+            _activity_row("2025-09-30 23:59:59", phone="263770000002"),
+            _activity_row("2025-10-02 08:30:00"),
+        ])
+
+        manifest = PartitionedExcelActivityStore(path, "month").partitions()
+        assert sorted(manifest) == ["2025-08", "2025-09", "2025-10"]
+        assert manifest["2025-09"]["rows"] == 2
+        assert manifest["2025-09"]["first"] == "2025-09-01 09:00:00"
+        assert os.path.exists(os.path.join(tmp, "activity_log_2025-09.xlsx"))
+
+        window = store._overlapping(start=datetime(2025, 9, 10))
+        assert [key for key, _, _ in window] == ["2025-09", "2025-10"]
+        rows = list(store.iter_rows(start=datetime(2025, 9, 10)))
+        assert [row[0] for row in rows] == ["2025-09-30 23:59:59", "2025-10-02 08:30:00"]
+        assert [row[1] for row in store.tail(2)] == ["263770000001", "263770000002"]
+        assert store.count_for_phone("263770000002") == 1
+
+
+
+def test_user_timeline_pages_back_by_cursor():
+    """Per-user timelines come back newest first and page with ``before``, even inside one second"""
+    with tempfile.TemporaryDirectory() as tmp:
+        log = ActivityLogger(os.path.join(tmp, "activity_log.db"))
+        try:
+            log.store.append_many([
+                _activity_row(f"2025-09-01 09:0{i}:00", activity_type=f"step_{i}") for i in range(5)
+            ] + [_activity_row("2025-09-01 09:03:30", phone="263770000002")])
+            assert log.get_user_activity_count("263770000001") == 5
+
+            page = log.get_user_timeline("263770000001", limit=2)
+            assert [a["activity_type"] for a in page] == ["step_4", "step_3"]
+            page = log.get_user_timeline("263770000001", limit=2, before=page[-1]["cursor"])
+            assert [a["activity_type"] for a in page] == ["step_2", "step_1"]
+            page = log.get_user_timeline("263770000001", limit=2, before=page[-1]["timestamp"])
+            assert [a["activity_type"] for a in page] == ["step_0"]
+        finally:
+            log.close()
+
+
+def test_user_timeline_page_boundary_inside_one_second():
+    """Activities logged in the same second are neither dropped nor repeated across pages"""
+    rows = [_activity_row("2025-09-01 09:00:00", activity_type="before")] + [
+        _activity_row("2025-09-01 09:00:05", activity_type=f"burst_{i}") for i in range(3)
+    ]
+    with tempfile.TemporaryDirectory() as tmp:
+        log = ActivityLogger(os.path.join(tmp, "activity_log.db"))
+        try:
+            log.store.append_many(rows)
+            seen, before = [], None
+            while True:
+                page = log.get_user_timeline("263770000001", limit=2, before=before)
+                if not page:
+                    break
+                seen += [a["activity_type"] for a in page]
+                before = page[-1]["cursor"]
+            assert seen == ["burst_2", "burst_1", "burst_0", "before"]
+
+            # The scan-based default pages the same way
+            store = ExcelActivityStore(os.path.join(tmp, "activity_log.xlsx"))
+            store.append_many(rows)
+            first = ActivityStore.timeline(store, "263770000001", 2)
+            rest = ActivityStore.timeline(store, "263770000001", 5, datetime(2025, 9, 1, 9, 0, 5), first[-1][0])
+            assert [row[3] for _, row in first + rest] == seen
+        finally:
+            log.close()
+
+
+def test_sqlite_rollups_match_full_scan():
+    """Rollup-based summaries agree with a row scan, including partial hours at the edges"""
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "activity_log.db")
+        store = SQLiteActivityStore(db_path)
+        store.append_many([
+            _activity_row("2025-09-01 09:05:00"),
+            _activity_row("2025-09-01 09:40:00", phone="263770000002", activity_type="button_clicked"),
+            _activity_row("2025-09-01 10:15:00", activity_type="button_clicked"),
+            _activity_row("2025-09-02 23:59:59", phone="263770000003"),
+        ])
+        store.append_many([_activity_row("2025-09-03 00:00:00", activity_type="admin_command")])
+
+        windows = [
+            (None, None),
+            (datetime(2025, 9, 1, 9, 30), None),
+            (datetime(2025, 9, 1, 9, 30), datetime(2025, 9, 1, 9, 45)),
+            (datetime(2025, 9, 1, 9, 30), datetime(2025, 9, 3)),
+            (datetime(2025, 9, 1, 10), datetime(2025, 9, 2)),
+        ]
+        for start, end in windows:
+            assert store.summarize(start, end) == ActivityStore.summarize(store, start, end)
+
+        summary = store.summarize(datetime(2025, 9, 1, 9, 30))
+        assert summary["total"] == 4
+        assert summary["unique_users"] == 3
+        assert summary["activity_types"] == {"button_clicked": 2, "message_received": 1, "admin_command": 1}
+        assert summary["daily"] == {"2025-09-01": 2, "2025-09-02": 1, "2025-09-03": 1}
+
+        # Databases created before the rollups existed are backfilled on open
+        conn = sqlite3.connect(db_path)
+        conn.execute("DELETE FROM activity_rollup_hourly")
+        conn.execute("PRAGMA user_version = 0")
+        conn.commit()
+        conn.close()
+        assert SQLiteActivityStore(db_path).summarize()["total"] == 5
+
+
+
+def test_sqlite_conversation_aggregates_match_full_scan():
+    """Session and user aggregates kept on write agree with a row scan"""
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "activity_log.db")
+        store = SQLiteActivityStore(db_path)
+        store.append_many([
+            _activity_row("2025-09-01 09:00:00"),
+            _activity_row("2025-09-01 09:04:00", activity_type="button_clicked"),
+            _activity_row("2025-09-01 09:05:00", phone="263770000002", activity_type="button_clicked"),
+        ])
+        # The s1 session continues in a later batch and a second session starts
+        store.append_many([
+            _activity_row("2025-09-01 09:10:00", activity_type="button_clicked"),
+            _activity_row("2025-09-02 12:00:00", activity_type="button_clicked")[:9] + ["s2", None],
+        ])
+
+        stats = store.conversation_stats()
+        assert stats == ActivityStore.conversation_stats(store)
+        assert stats["sessions"] == {"count": 2, "avg_seconds": 300.0, "max_seconds": 600, "min_seconds": 0}
+        user = stats["users"]["263770000001"]
+        assert (user["total_activities"], user["session_count"], user["top_activity"]) == (4, 2, "button_clicked")
+        assert store.conversation_stats("263770000002")["sessions"]["count"] == 0
+
+        conn = sqlite3.connect(db_path)
+        conn.execute("DELETE FROM activity_users")
+        conn.execute("PRAGMA user_version = 1")
+        conn.commit()
+        conn.close()
+        assert SQLiteActivityStore(db_path).conversation_stats() == stats
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
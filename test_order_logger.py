@@ -0,0 +1,542 @@
+#!/usr/bin/env python3
+"""
+Tests for OrderLogger persistence and admin queries.
+Each test works on a throwaway directory so the real orders file is never touched.
+"""
+
+import os
+import json
+import gzip
+import asyncio
+import tempfile
+import threading
+from datetime import datetime, timedelta
+
+from openpyxl import Workbook, load_workbook
+
+from order_ids import OrderIdGenerator
+from order_logger import OrderLogger, write_orders_workbook
+from order_store import ORDER_HEADERS, SQLiteOrderStore
+
+test_products = [
+    {"title": "Gaming Laptop Pro", "quantity": 2, "price": 1299.99, "item_total": 2599.98, "retailer_id": "LAPTOP_GAMING_001"},
+    {"title": "Laptop Screen Repair", "quantity": 1, "price": 199.99, "item_total": 199.99, "retailer_id": "REPAIR_SCREEN_001"},
+]
+
+
+def _new_logger(tmp, **kwargs):
+    return OrderLogger(os.path.join(tmp, "orders.db"), **kwargs)
+
+
+def _log_test_order(orders, phone="263711475883", amount=2799.97):
+    return orders.log_order(
+        customer_phone=phone,
+        customer_name="Test Customer",
+        order_type="MIXED",
+        total_amount=amount,
+        catalog_id="TEST_CATALOG_001",
+        order_text="2 gaming laptops and 1 repair",
+        products_data=test_products,
+    )
+
+
+def test_order_is_committed_when_logged():
+    """log_order commits straight to the store, visible to any other connection"""
+    with tempfile.TemporaryDirectory() as tmp:
+        orders = _new_logger(tmp)
+        try:
+            order_id = _log_test_order(orders)
+            row = SQLiteOrderStore(orders.file_path).get(order_id)
+            assert row[ORDER_HEADERS.index("customer_name")] == "Test Customer"
+
+            details = orders.get_order_details(order_id)
+            assert details["status"] == "NEW"
+            assert details["products"][0]["retailer_id"] == "LAPTOP_GAMING_001"
+        finally:
+            orders.close()
+
+
+def test_update_order_status_appends_notes():
+    """Each status update appends an event with its note and unknown orders are rejected"""
+    with tempfile.TemporaryDirectory() as tmp:
+        orders = _new_logger(tmp)
+        try:
+            order_id = _log_test_order(orders)
+            assert orders.update_order_status(order_id, "PROCESSING", "payment received", "Admin") == "NEW"
+            assert orders.update_order_status(order_id, "COMPLETED", "delivered", "Admin") == "PROCESSING"
+            assert orders.update_order_status("ORD_MISSING", "COMPLETED") is None
+
+            details = orders.get_order_details(order_id)
+            assert details["status"] == "COMPLETED"
+            assert details["processed_by"] == "Admin"
+            assert details["admin_notes"].count("\n") == 1
+            assert details["admin_notes"].endswith("] delivered")
+            assert [(e["old_status"], e["new_status"], e["actor"], e["note"]) for e in details["history"]] == [
+                (None, "NEW", details["customer_phone"], None),
+                ("NEW", "PROCESSING", "Admin", "payment received"),
+                ("PROCESSING", "COMPLETED", "Admin", "delivered"),
+            ]
+
+            stats = orders.get_order_statistics()
+            assert stats["completed_orders"] == 1
+            assert stats["total_revenue"] == 2799.97
+        finally:
+            orders.close()
+
+
+def test_legacy_workbook_and_journal_are_imported():
+    """An old orders.xlsx and its unsaved journal entries end up in a new store"""
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy = os.path.join(tmp, "orders.xlsx")
+        wb = Workbook()
+        wb.active.append(ORDER_HEADERS)
+        wb.active.append(["ORD_OLD", "2025-01-02 10:00:00", 263700000001, "Old Customer", "LAPTOP",
+                          999.0, "USD", "COMPLETED", "CAT", "1 laptop", "[]", None, None, None, None, None])
+        wb.save(legacy)
+        with open(os.path.join(tmp, "orders.journal.jsonl"), "w") as f:
+            f.write(json.dumps({"op": "insert", "row": ["ORD_JOURNALED", "2025-01-03 09:00:00", "263700000002",
+                                                        "New Customer", "REPAIR", 50, "USD", "NEW", "CAT", "repair",
+                                                        "[]", "", "", "", "", ""]}) + "\n")
+            f.write(json.dumps({"op": "update", "order_id": "ORD_JOURNALED", "status": "PROCESSING",
+                                "note": "on it", "processed_by": "Admin",
+                                "processing_timestamp": "2025-01-03 09:05:00"}) + "\n")
+
+        orders = _new_logger(tmp, legacy_file=legacy)
+        try:
+            assert orders.get_order_details("ORD_OLD")["customer_phone"] == "263700000001"
+            journaled = orders.get_order_details("ORD_JOURNALED")
+            assert journaled["status"] == "PROCESSING"
+            assert journaled["admin_notes"] == "[2025-01-03 09:05] on it"
+            assert not os.path.exists(orders.journal_path)
+            assert orders.get_order_statistics()["total_revenue"] == 999.0
+        finally:
+            orders.close()
+
+
+def test_alog_order_returns_order_id():
+    """The awaitable variant logs through the executor and returns the new ID"""
+    with tempfile.TemporaryDirectory() as tmp:
+        orders = _new_logger(tmp)
+        try:
+            order_id = asyncio.run(orders.alog_order(
+                customer_phone="263711475883",
+                customer_name="Test Customer",
+                order_type="LAPTOP",
+                total_amount=1299.99,
+                catalog_id="TEST_CATALOG_001",
+                order_text="1 laptop",
+                products_data=test_products[:1],
+            ))
+            assert order_id.startswith("ORD")
+            assert orders.get_order_details(order_id)["order_type"] == "LAPTOP"
+        finally:
+            orders.close()
+
+
+def test_concurrent_claims_of_one_order_have_one_winner():
+    """Two admins moving the same NEW order to PROCESSING: exactly one update applies"""
+    with tempfile.TemporaryDirectory() as tmp:
+        orders = _new_logger(tmp)
+        try:
+            order_id = _log_test_order(orders)
+            results = []
+            barrier = threading.Barrier(4)
+
+            def claim(admin):
+                barrier.wait()
+                results.append(orders.update_order_status(order_id, "PROCESSING", f"claimed by {admin}",
+                                                          admin, expected_status="NEW"))
+
+            threads = [threading.Thread(target=claim, args=(f"Admin{i}",)) for i in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            assert sorted(results, key=str) == ["NEW", None, None, None]
+            details = orders.get_order_details(order_id)
+            assert details["status"] == "PROCESSING"
+            assert details["admin_notes"].count("claimed by") == 1
+            assert details["processed_by"] in details["admin_notes"]
+        finally:
+            orders.close()
+
+
+def test_order_ids_sort_in_creation_order_across_workers():
+    """Same-second orders never collide, a clock step back keeps IDs increasing, and workers differ"""
+    now = [datetime(2025, 10, 17, 12, 0, 0)]
+    first, second = OrderIdGenerator(1, clock=lambda: now[0]), OrderIdGenerator(2, clock=lambda: now[0])
+    ids = [first.next_id() for _ in range(1500)]
+    now[0] -= timedelta(minutes=5)
+    ids.append(first.next_id())
+    assert ids == sorted(ids) and len(set(ids)) == len(ids)
+    assert ids[0] == "ORD20251017120000001000"
+    assert ids[1000].startswith("ORD20251017120001")  # sequence overflow borrows the next second
+    assert second.next_id() not in ids
+
+    with tempfile.TemporaryDirectory() as tmp:
+        workers = [_new_logger(tmp), _new_logger(tmp)]
+        try:
+            assert workers[0]._ids.worker_id != workers[1]._ids.worker_id
+            order_ids = [_log_test_order(workers[i % 2]) for i in range(10)]
+            assert len(set(order_ids)) == 10
+            assert [o["order_id"] for o in workers[0].get_recent_orders(10)] == sorted(order_ids, reverse=True)
+        finally:
+            for orders in workers:
+                orders.close()
+
+
+def test_orders_between_uses_order_id_range():
+    """Time-window queries are answered from the order_id range, including pre-existing ID formats"""
+    with tempfile.TemporaryDirectory() as tmp:
+        orders = _new_logger(tmp)
+        try:
+            orders.store.insert_many([
+                ["ORD202501010900000001", "2025-01-01 09:00:00", "263700000001", "Old", "LAPTOP", 10, "USD", "NEW"],
+                ["ORD202501020900000002", "2025-01-02 09:00:00", "263700000002", "Old", "LAPTOP", 20, "USD", "NEW"],
+            ])
+            order_id = _log_test_order(orders)
+            window = orders.get_orders_between(datetime(2025, 1, 2), datetime(2025, 1, 3))
+            assert [o["order_id"] for o in window] == ["ORD202501020900000002"]
+            today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+            window = orders.get_orders_between(today, today + timedelta(days=1))
+            assert [o["order_id"] for o in window] == [order_id]
+        finally:
+            orders.close()
+
+
+def test_status_queues_pop_oldest_new_order():
+    """Process-next pops NEW orders oldest first, each to one admin, straight off the status index"""
+    with tempfile.TemporaryDirectory() as tmp:
+        orders = _new_logger(tmp)
+        try:
+            order_ids = [_log_test_order(orders, amount=i) for i in range(6)]
+            assert orders.update_order_status(order_ids[1], "COMPLETED")
+            assert orders.update_order_status(order_ids[4], "CANCELLED")
+
+            newest = orders.get_orders_by_status("NEW", limit=2, newest_first=True)
+            assert [o["order_id"] for o in newest] == [order_ids[5], order_ids[3]]
+            pending = orders.get_orders_in_statuses(["NEW", "PROCESSING", "CANCELLED"], 3)
+            assert [o["order_id"] for o in pending] == [order_ids[0], order_ids[2], order_ids[3]]
+
+            plan = orders.store._conn().execute(
+                "EXPLAIN QUERY PLAN SELECT order_id FROM orders WHERE status = 'NEW' ORDER BY order_id LIMIT 1"
+            ).fetchall()
+            assert "idx_orders_status_queue" in str(plan) and "TEMP B-TREE" not in str(plan)
+
+            claimed = []
+            threads = [threading.Thread(target=lambda: claimed.append(orders.claim_next_order("Admin")))
+                       for _ in range(5)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            claimed_ids = sorted(o["order_id"] for o in claimed if o)
+            assert claimed_ids == [order_ids[0], order_ids[2], order_ids[3], order_ids[5]]
+            assert all(o["status"] == "PROCESSING" for o in claimed if o)
+            assert orders.count_orders("NEW") == 0
+            assert orders.claim_next_order("Admin") is None
+        finally:
+            orders.close()
+
+
+def test_status_counters_follow_writes_and_reconcile_on_open():
+    """Dashboard counters track every insert and transition, and a restart repairs any drift"""
+    with tempfile.TemporaryDirectory() as tmp:
+        orders = _new_logger(tmp)
+        try:
+            order_ids = [_log_test_order(orders, amount=100.0 + i) for i in range(5)]
+            orders.update_order_status(order_ids[0], "COMPLETED")
+            orders.update_order_status(order_ids[1], "COMPLETED")
+            orders.update_order_status(order_ids[1], "CANCELLED")  # completed revenue is taken back
+            orders.update_order_status(order_ids[2], "COMPLETED", expected_status="PROCESSING")  # no-op
+            orders.claim_next_order("Admin")
+
+            stats = orders.get_order_statistics()
+            assert stats == {
+                "total_orders": 5, "new_orders": 2, "processing_orders": 1, "completed_orders": 1,
+                "cancelled_orders": 1, "total_revenue": 100.0, "average_order_value": 100.0,
+            }
+            assert not orders.store.reconcile_totals()
+
+            conn = orders.store._conn()
+            with conn:
+                conn.execute("UPDATE order_status_totals SET count = 42 WHERE status = 'NEW'")
+        finally:
+            orders.close()
+
+        restarted = _new_logger(tmp)
+        try:
+            assert restarted.get_order_statistics()["new_orders"] == 2
+        finally:
+            restarted.close()
+
+
+def test_search_uses_trigram_index_and_follows_updates():
+    """Substring search over ID, phone, name and status comes from the index and sees status changes"""
+    with tempfile.TemporaryDirectory() as tmp:
+        orders = _new_logger(tmp)
+        try:
+            first = _log_test_order(orders, phone="263711475883")
+            second = orders.log_order(
+                customer_phone="263772220001", customer_name='Tendai "TJ" Moyo', order_type="LAPTOP",
+                total_amount=10, catalog_id="CAT", order_text="x", products_data=[],
+            )
+            assert orders.store.search_indexed
+
+            assert [o["order_id"] for o in orders.search_orders("75883")] == [first]
+            assert [o["order_id"] for o in orders.search_orders("tendai")] == [second]
+            assert [o["order_id"] for o in orders.search_orders('"tj"', "name")] == [second]
+            assert [o["order_id"] for o in orders.search_orders("new")] == [second, first]
+            assert orders.search_orders("tendai", "phone") == []
+            assert [o["order_id"] for o in orders.search_orders("63", "phone", limit=1)] == [second]  # short: scan
+
+            orders.update_order_status(first, "COMPLETED")
+            assert [o["order_id"] for o in orders.search_orders("complete", "status")] == [first]
+            assert [o["order_id"] for o in orders.search_orders("new", "status")] == [second]
+
+            plan = orders.store._conn().execute(
+                "EXPLAIN QUERY PLAN SELECT rowid FROM order_search WHERE order_search MATCH 'tendai'"
+            ).fetchall()
+            assert "VIRTUAL TABLE INDEX" in str(plan)
+        finally:
+            orders.close()
+
+
+def test_export_orders_workbook_uses_conditional_status_colours():
+    """The xlsx export filters through the store and colours statuses with conditional formats"""
+    with tempfile.TemporaryDirectory() as tmp:
+        orders = _new_logger(tmp)
+        cwd = os.getcwd()
+        os.chdir(tmp)
+        try:
+            orders.store.insert_many([
+                ["ORD202501010900000001", "2025-01-01 09:00:00", "263700000001", "Ann", "LAPTOP", 10, "USD", "COMPLETED"],
+                ["ORD202502010900000002", "2025-02-01 09:00:00", "263700000002", "Ben", "LAPTOP", 20, "USD", "CANCELLED"],
+                ["ORD202502020900000003", "2025-02-02 09:00:00", "263700000003", "Cat", "REPAIR", 30, "USD", "COMPLETED"],
+            ])
+            path = orders.export_orders({"date": "2025-02"})
+            ws = load_workbook(path).active
+            assert [row[0] for row in ws.iter_rows(min_row=2, values_only=True)] == [
+                "ORD202502010900000002", "ORD202502020900000003"]
+            assert ws["H2"].fill.fill_type is None
+            rules = {str(cf.sqref): [rule.formula for rule in cf.rules] for cf in ws.conditional_formatting}
+            assert rules == {"H2:H3": [['"COMPLETED"'], ['"CANCELLED"']]}
+            assert ws.column_dimensions["P"].width == 15
+
+            path = orders.export_orders({"status": "COMPLETED", "customer": "ann"})
+            assert [row[0] for row in load_workbook(path).active.iter_rows(min_row=2, values_only=True)] == [
+                "ORD202501010900000001"]
+
+            headers = [f"col{i}" for i in range(30)]
+            write_orders_workbook("wide.xlsx", [list(range(30))], headers)
+            assert load_workbook("wide.xlsx").active["AD1"].value == "col29"
+        finally:
+            os.chdir(cwd)
+            orders.close()
+
+
+def test_line_items_answer_product_sales_and_are_backfilled():
+    """log_order writes one line item per product; older databases get them rebuilt on open"""
+    with tempfile.TemporaryDirectory() as tmp:
+        orders = _new_logger(tmp)
+        try:
+            first = _log_test_order(orders)
+            _log_test_order(orders)
+            orders.update_order_status(first, "COMPLETED")
+
+            sales = orders.get_product_sales()
+            assert [(p["retailer_id"], p["units"], p["orders"]) for p in sales] == [
+                ("LAPTOP_GAMING_001", 4, 2), ("REPAIR_SCREEN_001", 2, 2)]
+            assert round(sales[0]["revenue"], 2) == 5199.96
+            completed = orders.get_product_sales(statuses=["COMPLETED"], order_by="units", limit=1)
+            assert [(p["retailer_id"], p["units"]) for p in completed] == [("LAPTOP_GAMING_001", 2)]
+            assert orders.get_product_sales(end=datetime(2020, 1, 1)) == []
+
+            plan = orders.store._conn().execute(
+                "EXPLAIN QUERY PLAN SELECT SUM(quantity) FROM order_items WHERE retailer_id = ? AND ts >= ?",
+                ("LAPTOP_GAMING_001", 0),
+            ).fetchall()
+            assert "idx_order_items_retailer" in str(plan)
+
+            conn = orders.store._conn()
+            with conn:
+                conn.execute("DELETE FROM order_items")
+            conn.execute("PRAGMA user_version = 0")
+        finally:
+            orders.close()
+
+        reopened = _new_logger(tmp)
+        try:
+            assert [p["units"] for p in reopened.get_product_sales()] == [4, 2]
+        finally:
+            reopened.close()
+
+
+def test_order_analytics_report_is_memoized_until_next_write():
+    """Week-over-week, mix and top products come from one snapshot, extended only after an order write"""
+    with tempfile.TemporaryDirectory() as tmp:
+        orders = _new_logger(tmp)
+        try:
+            laptop = {"title": "Gaming Laptop Pro", "quantity": 1, "price": 1000.0, "item_total": 1000.0,
+                      "retailer_id": "LAPTOP_GAMING_001"}
+            repair = {"title": "Screen Repair", "quantity": 3, "price": 50.0, "item_total": 150.0,
+                      "retailer_id": "REPAIR_SCREEN_001"}
+            now = datetime.now()
+            this_week, last_week = now - timedelta(days=2), now - timedelta(days=9)
+            orders.store.insert_many([
+                ["ORD1", this_week, "1", "A", "LAPTOP", 1000, "USD", "NEW", "", "", json.dumps([laptop])],
+                ["ORD2", this_week, "2", "B", "MIXED", 1150, "USD", "COMPLETED", "", "", json.dumps([laptop, repair])],
+                ["ORD3", last_week, "3", "C", "REPAIR", 150, "USD", "NEW", "", "", json.dumps([repair])],
+                ["ORD4", this_week, "4", "D", "LAPTOP", 1000, "USD", "CANCELLED", "", "", json.dumps([laptop])],
+            ])
+
+            loads = []
+            rows = orders.store.analytics_rows
+            orders.store.analytics_rows = lambda after_id: (loads.append(after_id), rows(after_id))[1]
+
+            report = orders.get_order_analytics()
+            assert report["this_week"] == {"orders": 2, "revenue": 2150.0}
+            assert report["last_week"] == {"orders": 1, "revenue": 150.0}
+            assert report["orders_change_pct"] == 100.0
+            assert report["order_mix"]["LAPTOP"] == {"orders": 1, "share": 33.3}
+            assert [p["retailer_id"] for p in report["top_by_revenue"]] == ["LAPTOP_GAMING_001", "REPAIR_SCREEN_001"]
+            assert [(p["retailer_id"], p["units"]) for p in report["top_by_units"]] == [
+                ("REPAIR_SCREEN_001", 6), ("LAPTOP_GAMING_001", 2)]
+
+            assert orders.get_order_analytics() is report
+            assert loads == [0]
+
+            # A status change re-reads only the cancelled set; a new order is appended by row id
+            orders.update_order_status("ORD1", "CANCELLED")
+            assert orders.get_order_analytics()["this_week"] == {"orders": 1, "revenue": 1150.0}
+            orders.store.insert(["ORD5", now, "5", "E", "REPAIR", 150, "USD", "NEW", "", "", json.dumps([repair])])
+            report = orders.get_order_analytics()
+            assert report["this_week"] == {"orders": 2, "revenue": 1300.0}
+            assert report["top_by_units"][0] == {"retailer_id": "REPAIR_SCREEN_001", "title": "Screen Repair",
+                                                 "units": 9, "revenue": 450.0}
+            assert loads == [0, 4, 4]
+        finally:
+            orders.close()
+
+
+def test_order_analytics_start_on_an_empty_store():
+    """A report built before the first order still picks up orders written afterwards"""
+    with tempfile.TemporaryDirectory() as tmp:
+        orders = _new_logger(tmp)
+        try:
+            assert orders.get_order_analytics()["total_orders"] == 0
+            _log_test_order(orders)
+            report = orders.get_order_analytics()
+            assert "error" not in report
+            assert report["this_week"]["orders"] == 1
+            assert report["top_by_units"][0]["retailer_id"] == "LAPTOP_GAMING_001"
+        finally:
+            orders.close()
+
+
+def test_range_statistics_come_from_daily_prefix_sums():
+    """Any date range is answered from per-day totals kept by writes and status changes"""
+    with tempfile.TemporaryDirectory() as tmp:
+        orders = _new_logger(tmp)
+        try:
+            day = datetime(2025, 10, 1, 12, 0)
+            orders.store.insert_many([
+                ["ORD1", day, "1", "A", "LAPTOP", 100, "USD", "COMPLETED", "", "", ""],
+                ["ORD2", day + timedelta(hours=11), "2", "B", "LAPTOP", 50, "USD", "NEW", "", "", ""],
+                ["ORD3", day + timedelta(days=2), "3", "C", "REPAIR", 30, "USD", "COMPLETED", "", "", ""],
+                ["ORD4", day + timedelta(days=9), "4", "D", "REPAIR", 20, "USD", "CANCELLED", "", "", ""],
+            ])
+            first, last = day.date(), day.date() + timedelta(days=9)
+
+            stats = orders.get_range_statistics(first, last)
+            assert stats == {"start": "2025-10-01", "end": "2025-10-10", "days": 10, "orders": 4,
+                             "completed_orders": 2, "completed_revenue": 130.0, "average_order_value": 65.0}
+            assert orders.get_range_statistics(first, first)["orders"] == 2
+            assert orders.get_range_statistics(first + timedelta(days=1), first + timedelta(days=1))["orders"] == 0
+            assert orders.get_range_statistics(datetime(2020, 1, 1), datetime(2030, 1, 1))["orders"] == 4
+            assert "error" in orders.get_range_statistics(last, first)
+
+            orders.update_order_status("ORD2", "COMPLETED")
+            orders.update_order_status("ORD3", "CANCELLED")
+            stats = orders.get_range_statistics(first, first + timedelta(days=2))
+            assert (stats["completed_orders"], stats["completed_revenue"]) == (2, 150.0)
+
+            conn = orders.store._conn()
+            with conn:
+                conn.execute("DELETE FROM order_daily_totals")
+            conn.execute("PRAGMA user_version = 1")
+        finally:
+            orders.close()
+
+        reopened = _new_logger(tmp)
+        try:
+            assert reopened.get_range_statistics(first, last)["completed_revenue"] == 150.0
+        finally:
+            reopened.close()
+
+
+def test_order_events_give_time_in_status_and_are_backfilled():
+    """Transitions add up time spent in the previous status; older databases get creation events on open"""
+    with tempfile.TemporaryDirectory() as tmp:
+        orders = _new_logger(tmp)
+        try:
+            placed = datetime(2025, 10, 1, 9, 0)
+            orders.store.insert_many([
+                ["ORD1", placed, "1", "A", "LAPTOP", 100, "USD", "NEW", "", "", ""],
+                ["ORD2", placed, "2", "B", "LAPTOP", 100, "USD", "NEW", "", "", ""],
+            ])
+            store = orders.store
+            assert store.update_status("ORD1", "PROCESSING", processed_by="A1", at=placed + timedelta(minutes=10)) == "NEW"
+            assert store.update_status("ORD1", "PROCESSING", "called customer", at=placed + timedelta(minutes=30))
+            assert store.update_status("ORD1", "COMPLETED", at=placed + timedelta(hours=2)) == "PROCESSING"
+            assert store.claim_next("NEW", "PROCESSING", processed_by="A2", at=placed + timedelta(minutes=30)) == "ORD2"
+            assert store.update_status("ORD2", "COMPLETED", expected_status="NEW") is None
+
+            durations = {(d["from_status"], d["to_status"]): d for d in orders.get_status_durations()}
+            assert durations[("NEW", "PROCESSING")]["transitions"] == 2
+            assert durations[("NEW", "PROCESSING")]["average_seconds"] == 20 * 60
+            # The note in between does not restart the clock
+            assert durations[("PROCESSING", "COMPLETED")]["average_seconds"] == 110 * 60
+
+            conn = store._conn()
+            with conn:
+                conn.execute("DELETE FROM order_events WHERE order_id = 'ORD2'")
+            conn.execute("PRAGMA user_version = 2")
+        finally:
+            orders.close()
+
+        reopened = _new_logger(tmp)
+        try:
+            assert [(e["old_status"], e["new_status"]) for e in reopened.get_order_history("ORD2")] == [
+                (None, "PROCESSING")]
+            assert len(reopened.get_order_history("ORD1")) == 4
+        finally:
+            reopened.close()
+
+
+def test_export_orders_in_compressed_format():
+    """Orders can be exported as gzip CSV instead of a styled workbook"""
+    with tempfile.TemporaryDirectory() as tmp:
+        orders = _new_logger(tmp)
+        cwd = os.getcwd()
+        os.chdir(tmp)
+        try:
+            order_id = _log_test_order(orders)
+            path = orders.export_orders(output_format="csv.gz")
+            assert path.endswith(".csv.gz")
+            with gzip.open(path, "rt") as f:
+                lines = f.read().splitlines()
+            assert lines[0].startswith("order_id,timestamp")
+            assert lines[1].startswith(order_id)
+            assert os.path.exists(path + ".summary.json")
+        finally:
+            os.chdir(cwd)
+            orders.close()
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")